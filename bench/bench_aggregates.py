@@ -0,0 +1,139 @@
+"""
+Benchmark: costo del resumen por proveedor/mes/CUIT según el tamaño de la cuenta.
+
+    python bench/bench_aggregates.py [--sizes 10,1000,10000] [--ddb-latency 0.005]
+
+Compara recorrer todas las facturas del usuario (GSI_User_Group) y sumar en
+Python con leer los agregados precalculados (view=summary). Después edita
+facturas con invoice-updater y verifica con tools/rebuild_aggregates.py que
+los agregados mantenidos incrementalmente no se desvían.
+
+Al final hace fallar el ADD de los agregados durante una edición: la edición
+se responde igual, el error se cuenta en `aggregate_errors` y el rebuild del
+usuario corrige el desvío (los agregados son best-effort, ver
+lambda_runtime.aggregates).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "tools"))
+
+from bench_export import populate  # noqa: E402
+from loader import load_lambda, quiet  # noqa: E402
+from stubs import FakeClientError, FakeDynamoDB  # noqa: E402
+import rebuild_aggregates  # noqa: E402
+
+
+def legacy_summary(report, username):
+    """Query paginada de todas las facturas del usuario + suma en Python."""
+    from boto3.dynamodb.conditions import Key
+
+    table = report.dynamodb.Table(report.TABLE)
+    totals = {}
+    kwargs = {"IndexName": report.INDEX_NAME, "KeyConditionExpression": Key("userId").eq(username)}
+    while True:
+        response = table.query(**kwargs)
+        for item in response.get("Items", []):
+            data = item.get("data", {})
+            for key in (data.get("proveedor"), data.get("fecha", "")[:7], data.get("cuit")):
+                totals[key] = totals.get(key, 0) + float(data.get("total") or 0)
+        if not response.get("LastEvaluatedKey"):
+            return totals
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def edit_event(file_key, updates, username="user-1"):
+    return {
+        "requestContext": {"authorizer": {"jwt": {"claims": {"cognito:username": username}}}},
+        "body": json.dumps({"file_key": file_key, "updates": updates}),
+    }
+
+
+def check_failed_update():
+    """El ADD de los agregados falla después de escribir la edición: se reporta y el rebuild lo corrige."""
+    dynamodb = FakeDynamoDB()
+    table = dynamodb.Table("InvoiceJobs")
+    populate(table, 10)
+    rebuild_aggregates.rebuild(table, write=True)
+    updater = load_lambda("lambda-invoice-updater", env={"METRICS_ENABLED": "true"}, dynamodb=dynamodb)
+    update_item = table.update_item
+
+    def failing_update(Key, **kwargs):
+        if Key["PK"].startswith("AGG#"):
+            raise FakeClientError("ProvisionedThroughputExceededException")
+        return update_item(Key=Key, **kwargs)
+
+    table.update_item = failing_update
+    out = io.StringIO()
+    with quiet(), contextlib.redirect_stdout(out):
+        status = updater.handler(
+            edit_event("user-1/000000_factura.pdf", {"total": "1.25", "proveedor": "OTRO S.A."}), None
+        )["statusCode"]
+    table.update_item = update_item
+    _, drift = rebuild_aggregates.rebuild(table, "user-1", write=True)
+    _, differences = rebuild_aggregates.rebuild(table)
+    emf = [json.loads(line) for line in out.getvalue().splitlines() if line.startswith("{")]
+    return {
+        "check": "failed_aggregate_update",
+        "status": status,
+        "edit_written": table.items[("user-1/000000_factura.pdf", "META#1")]["data"]["total"] == "1.25",
+        "aggregate_errors": sum(doc.get("aggregate_errors", 0) for doc in emf),
+        "drift_before_rebuild": len(drift),
+        "drift_after_rebuild": len(differences),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,1000,10000")
+    parser.add_argument("--ddb-latency", type=float, default=0.005)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--edits", type=int, default=20)
+    args = parser.parse_args()
+
+    for count in (int(c) for c in args.sizes.split(",")):
+        dynamodb = FakeDynamoDB(latency=args.ddb_latency)
+        table = dynamodb.Table("InvoiceJobs")
+        populate(table, count)
+        # Las facturas se cargan sin pasar por database-writer: el rebuild arma los agregados iniciales
+        rebuild_aggregates.rebuild(table, write=True)
+        report = load_lambda("lambda-report-generator", dynamodb=dynamodb)
+        updater = load_lambda("lambda-invoice-updater", dynamodb=dynamodb)
+        event = {"queryStringParameters": {"username": "user-1", "view": "summary"}}
+        with quiet():
+            result = {
+                "invoices": count,
+                "legacy_scan_ms": timed(lambda: legacy_summary(report, "user-1"), args.repeat),
+                "summary_ms": timed(lambda: report.handler(event, None), args.repeat),
+            }
+            for i in range(min(args.edits, count)):
+                updater.handler(edit_event(
+                    f"user-1/{i:06d}_factura.pdf",
+                    {"total": f"{i}.25", "proveedor": f"PROVEEDOR {i % 3}", "fecha": "2025-04-01"},
+                ), None)
+        _, differences = rebuild_aggregates.rebuild(table)
+        result["drifted_after_edits"] = len(differences)
+        print(json.dumps(result))
+
+    print(json.dumps(check_failed_update()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark: ZIP de muchos PDFs con pdf-downloader (POST /download/bundle).
+
+    python bench/bench_bundle.py [--files 10,100,1000] [--size-kb 150] [--s3-latency 0.02]
+
+Sube --files PDFs de --size-kb al stand-in de S3 (cada GET paga
+--s3-latency) y pide el bundle por file_keys. Compara con armar el ZIP en
+memoria (BytesIO + put_object), lo que hacía falta sin streaming: ahí la
+memoria crece con la cantidad de archivos, con multipart queda acotada a una
+parte y a los PDFs que se están descargando. Reporta pico de memoria
+(tracemalloc), tiempo y requests a S3.
+
+Con 100 archivos además verifica el contenido del ZIP, el bundle por filtro
+de fechas, el PDF que ya no está en S3 (missing), que una factura de otro
+usuario devuelva 404 sin escribir nada y que `username` en el query string o
+en el body no reemplace al usuario del JWT.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loader import load_lambda, quiet  # noqa: E402
+from stubs import FakeDynamoDB, FakeS3  # noqa: E402
+from lambda_runtime import invoice_keys  # noqa: E402
+
+USER = "user-1"
+BUCKET = "facturas"
+
+
+def populate(s3, table, count, size_kb, user=USER):
+    rng = random.Random(count)
+    # Pocos contenidos distintos, para que los PDFs no llenen la memoria del bench
+    blobs = [b"%PDF-1.4\n" + rng.randbytes(size_kb * 1024) for _ in range(16)]
+    keys = []
+    for i in range(count):
+        key = f"{user}/{i:06d}_factura.pdf"
+        s3.objects[(BUCKET, key)] = blobs[i % len(blobs)]
+        data = {"proveedor": "PROVEEDOR S.A.", "fecha": f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}"}
+        table.store({"PK": key, "SK": "META#1", "file_key": key, "userId": user,
+                     **invoice_keys.access_keys(user, key, data), "data": data})
+        keys.append(key)
+    return keys
+
+
+def call(module, body, user=USER, **event_fields):
+    event = {"requestContext": {"authorizer": {"jwt": {"claims": {"sub": user}}}}, "body": json.dumps(body), **event_fields}
+    with quiet():
+        response = module.handler(event, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def in_memory_zip(s3, keys):
+    """Lo mismo sin streaming: el ZIP entero en memoria y un put_object."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for key in keys:
+            archive.writestr(key.split("/", 1)[-1], s3.get_object(Bucket=BUCKET, Key=key)["Body"].read())
+    s3.put_object(Bucket=BUCKET, Key=f"exports/{USER}/facturas.zip", Body=buffer.getvalue())
+    return buffer.tell()
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(args, count):
+    for mode in ("in_memory", "bundle"):
+        s3 = FakeS3(latency=args.s3_latency, discard_parts=True)
+        dynamodb = FakeDynamoDB()
+        module = load_lambda("lamda-pdf-downloader", s3=s3, dynamodb=dynamodb)
+        keys = populate(s3, dynamodb.Table(module.TABLE), count, args.size_kb)
+        if mode == "in_memory":
+            size, elapsed, peak = measure(lambda: in_memory_zip(s3, keys))
+            status = 200
+        else:
+            (status, body), elapsed, peak = measure(lambda: call(module, {"file_keys": keys}))
+            size = body.get("bytes")
+        print(json.dumps({
+            "files": count,
+            "mode": mode,
+            "status": status,
+            "zip_mb": round(size / 1024 / 1024, 1),
+            "peak_mb": round(peak / 1024 / 1024, 1),
+            "elapsed_s": round(elapsed, 2),
+            "s3_requests": s3.calls,
+        }))
+
+
+def check(args):
+    s3 = FakeS3()
+    dynamodb = FakeDynamoDB()
+    module = load_lambda("lamda-pdf-downloader", s3=s3, dynamodb=dynamodb)
+    table = dynamodb.Table(module.TABLE)
+    keys = populate(s3, table, 100, 20)
+    foreign = populate(s3, table, 1, 20, user="user-2")
+
+    status, body = call(module, {"file_keys": keys})
+    archive = zipfile.ZipFile(io.BytesIO(s3.objects[(BUCKET, body["file_key"])]))
+    same_content = all(
+        archive.read(key.split("/", 1)[-1]) == s3.objects[(BUCKET, key)] for key in keys
+    )
+
+    # Enero a marzo: los meses 1, 2 y 3 de populate
+    by_date_status, by_date = call(module, {"from": "2025-01", "to": "2025-03"})
+
+    del s3.objects[(BUCKET, keys[0])]
+    missing_status, with_missing = call(module, {"file_keys": keys[:5]})
+
+    uploads_before = s3.calls
+    foreign_status, rejected = call(module, {"file_keys": keys[1:3] + foreign})
+    # username en el query string o en el body no reemplaza al usuario del JWT
+    override = {"queryStringParameters": {"username": "user-2"}}
+    override_status, _ = call(module, {"file_keys": foreign, "username": "user-2"}, **override)
+    _, override_by_date = call(module, {"from": "2025-01", "to": "2025-12"}, user="user-2", username=USER, **override)
+
+    print(json.dumps({
+        "status": status,
+        "entries": len(archive.namelist()),
+        "crc_ok": archive.testzip() is None,
+        "same_content": same_content,
+        "under_exports": body["file_key"].startswith(f"exports/{USER}/"),
+        "by_date": [by_date_status, by_date["files"], sum(i % 12 < 3 for i in range(len(keys)))],
+        "missing": [missing_status, with_missing["files"], with_missing["missing"] == [keys[0]]],
+        "foreign_status": foreign_status,
+        "foreign_listed": rejected.get("file_keys") == foreign,
+        "foreign_s3_requests": s3.calls - uploads_before,
+        "username_override": [override_status, override_by_date.get("files")],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", default="10,100,1000")
+    parser.add_argument("--size-kb", type=int, default=150)
+    parser.add_argument("--s3-latency", type=float, default=0.02)
+    args = parser.parse_args()
+    check(args)
+    for count in (int(n) for n in args.files.split(",")):
+        run(args, count)
+
+
+if __name__ == "__main__":
+    main()
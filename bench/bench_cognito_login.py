@@ -0,0 +1,134 @@
+"""
+Benchmark: latencia del callback de login de lambda-cognito-hook contra un
+Cognito local (bench/cognito_stub.py).
+
+    python bench/bench_cognito_login.py [--logins 20] [--handshake-ms 30]
+
+Compara el camino anterior (requests.post sin sesión: una conexión nueva por
+login, ID token decodificado sin verificar) con el handler actual: sesión
+HTTP compartida y verificación RS256 con el JWKS cacheado. También comprueba
+que se rechacen tokens adulterados, mal formados, vencidos o de otro cliente y que una
+rotación de claves provoque una sola relectura del JWKS.
+Los tokens los firma el stand-in una vez por clave, así la medición no
+incluye el costo de firmar.
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cognito_stub import FakeCognito, RSAKey, make_jwt  # noqa: E402
+from loader import load_lambda, quiet  # noqa: E402
+
+CLIENT_ID = "local-client"
+USER_POOL_ID = "us-east-1_local"
+ISSUER = f"https://cognito-idp.us-east-1.amazonaws.com/{USER_POOL_ID}"
+EVENT = {"queryStringParameters": {"code": "auth-code", "state": "s"}}
+
+
+def legacy_login(token_url):
+    """Lo que hacía el handler antes: requests.post suelto y decode sin verificar."""
+    import requests
+
+    response = requests.post(token_url, data={"grant_type": "authorization_code", "code": "auth-code"})
+    payload = response.json()["id_token"].split(".")[1]
+    return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+
+
+def timed(fn, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def check(hook, cognito):
+    """Casos de verificación: devuelve {caso: status code}."""
+    results = {}
+    valid = cognito.id_token()
+    header, payload, signature = valid.split(".")
+    claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    forged_payload = base64.urlsafe_b64encode(json.dumps({**claims, "sub": "admin"}).encode()).rstrip(b"=").decode()
+    cases = {
+        "tampered": f"{header}.{forged_payload}.{signature}",
+        "expired": cognito.id_token(exp=int(time.time()) - 3600),
+        "wrong_audience": cognito.id_token(aud="other-client"),
+        "access_token": cognito.id_token(token_use="access"),
+        # JSON válido que no es un objeto, o kid que no es string: 401, no 500
+        "non_object_header": f"{_b64(1)}.{payload}.{signature}",
+        "non_object_claims": make_jwt(cognito.signing_key, []),
+        "list_kid": f"{_b64({'alg': 'RS256', 'kid': []})}.{payload}.{signature}",
+    }
+    for name, token in cases.items():
+        results[name] = _status_with_token(hook, cognito, token)
+    jwks_before = cognito.jwks_requests
+    cognito.rotate_key()
+    results["rotated_key"] = hook.handler(EVENT, None)["statusCode"]
+    results["jwks_refetches_on_rotation"] = cognito.jwks_requests - jwks_before
+    results["unknown_key"] = _status_with_token(hook, cognito, make_jwt(RSAKey("unknown-kid", seed=99), claims))
+    return results
+
+
+def _b64(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b"=").decode()
+
+
+def _status_with_token(hook, cognito, token):
+    original = cognito.issued_id_token
+    cognito.issued_id_token = lambda: token
+    try:
+        return hook.handler(EVENT, None)["statusCode"]
+    finally:
+        cognito.issued_id_token = original
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--handshake-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    cognito = FakeCognito(ISSUER, CLIENT_ID, handshake_latency=args.handshake_ms / 1000)
+    base_url = cognito.start()
+    try:
+        hook = load_lambda("lambda-cognito-hook", env={
+            "COGNITO_CLIENT_ID": CLIENT_ID,
+            "COGNITO_REDIRECT_URI": "https://api.local/auth/callback",
+            "COGNITO_DOMAIN": "factutable",
+            "COGNITO_USER_POOL_ID": USER_POOL_ID,
+            "SPA_URL": "https://spa.local",
+            "AWS_REGION": "us-east-1",
+            "COGNITO_TOKEN_URL": f"{base_url}/oauth2/token",
+            "COGNITO_JWKS_URL": f"{base_url}/{USER_POOL_ID}/.well-known/jwks.json",
+        })
+        legacy = timed(lambda: legacy_login(f"{base_url}/oauth2/token"), args.logins)
+        connections_before = cognito.connections
+        with quiet():
+            first = timed(lambda: hook.handler(EVENT, None), 1)
+            warm = timed(lambda: hook.handler(EVENT, None), args.logins - 1)
+            statuses = {hook.handler(EVENT, None)["statusCode"]}
+            checks = check(hook, cognito)
+        print(json.dumps({
+            "logins": args.logins,
+            "handshake_ms": args.handshake_ms,
+            "legacy_median_ms": round(statistics.median(legacy), 2),
+            "first_login_ms": round(first[0], 2),
+            "warm_median_ms": round(statistics.median(warm), 2),
+            "handler_connections": cognito.connections - connections_before,
+            "jwks_fetches": hook.jwks.fetches,
+            "valid_login_status": sorted(statuses),
+        }))
+        print(json.dumps(checks))
+    finally:
+        cognito.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark: cold start y warm start de cada lambda de src/.
+
+    python bench/bench_cold_start.py [--functions lambda-report-generator,...] [--runs 5]
+
+Cada corrida es un proceso nuevo (como un contenedor nuevo de Lambda) que mide:
+- import_ms: import del main.py, lo que Lambda cobra en la fase de init.
+- clients_ms: creación de los clientes/resources de boto3 del módulo, que con
+  lambda_runtime ocurre recién en la primera invocación que los usa.
+- first_invoke_ms / warm_invoke_ms: primera y segunda invocación con los
+  stand-ins de bench/stubs.py (sin red).
+- heavy_modules: dependencias pesadas ya importadas después del import.
+Se reporta la mediana de las corridas.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY_MODULES = ("boto3", "botocore", "PyPDF2", "requests")
+
+COGNITO_ENV = {
+    "COGNITO_CLIENT_ID": "client",
+    "COGNITO_REDIRECT_URI": "https://api.local/auth/callback",
+    "COGNITO_DOMAIN": "factutable",
+    "COGNITO_USER_POOL_ID": "us-east-1_local",
+    "SPA_URL": "https://spa.local",
+}
+
+
+def _api_event(**query):
+    return {"queryStringParameters": {"username": "user-1", **query}}
+
+
+def fixtures(directory):
+    """Devuelve (patches, event) para invocar la lambda contra stand-ins."""
+    from bench_export import populate
+    from pdfgen import make_invoice_pdf
+    from stubs import FakeDynamoDB, FakeS3, FakeSQS
+
+    dynamodb = FakeDynamoDB()
+    populate(dynamodb.Table("InvoiceJobs"), 50)
+    s3 = FakeS3()
+    claims = {"requestContext": {"authorizer": {"jwt": {"claims": {"sub": "user-1"}}}}}
+    if directory == "lambda-database-writer":
+        etag = s3.put_object(Bucket="facturas", Key="user-1/x_factura.pdf", Body=make_invoice_pdf(seed=1))["ETag"]
+        body = json.dumps({"bucket": "facturas", "key": "user-1/x_factura.pdf", "userId": "user-1", "etag": etag})
+        return {"s3": s3, "dynamodb": dynamodb}, {"Records": [{"messageId": "m-1", "body": body, "eventSource": "aws:sqs"}]}
+    if directory == "lambda-invoice-processor":
+        s3.put_object(Bucket="facturas", Key="user-1/x.pdf", Body=make_invoice_pdf(seed=1))
+        record = {"eventSource": "aws:s3", "s3": {"bucket": {"name": "facturas"}, "object": {"key": "user-1/x.pdf", "eTag": "e"}}}
+        return {"sqs": FakeSQS(), "s3": s3}, {"Records": [record]}
+    if directory == "lambda-invoice-updater":
+        body = json.dumps({"file_key": "user-1/000001_factura.pdf", "updates": {"total": "10.00"}})
+        return {"dynamodb": dynamodb}, {"body": body}
+    if directory == "lambda-export-csv":
+        return {"dynamodb": dynamodb, "s3": s3}, _api_event()
+    if directory in ("lambda-invoice-getter", "lambda-report-generator"):
+        return {"dynamodb": dynamodb}, _api_event()
+    if directory == "lambda-invoice-search":
+        from lambda_runtime import text_index
+
+        table = dynamodb.Table("InvoiceJobs")
+        for i in range(50):
+            key = f"user-1/{i:06d}_factura.pdf"
+            for posting in text_index.postings("user-1", key, text_index.terms(f"Distribuidora Norte item {i}")):
+                table.store(posting)
+        return {"dynamodb": dynamodb}, _api_event(q="distrib* norte")
+    if directory == "lambda-presigned-url-generator":
+        return {"s3": s3}, {**claims, "body": json.dumps({"fileName": "factura"})}
+    if directory == "lamda-pdf-downloader":
+        return {"s3": s3}, {"file_key": "user-1/000001_factura.pdf"}
+    if directory == "lambda-cognito-hook":
+        # Sin code el handler sólo redirige a la SPA: mide el costo fijo
+        return {}, {"queryStringParameters": {}}
+    raise ValueError(directory)
+
+
+def _lazy_attributes(module):
+    try:
+        from lambda_runtime.aws import _Lazy
+    except ImportError:
+        return []
+    return [value for value in vars(module).values() if isinstance(value, _Lazy)]
+
+
+def child(directory):
+    """Corre en un proceso nuevo: import, creación de clientes e invocaciones."""
+    import importlib.util
+
+    from loader import DEFAULT_ENV, SRC_DIR, quiet
+
+    os.environ.update({**DEFAULT_ENV, **COGNITO_ENV})
+    path = os.path.join(SRC_DIR, directory)
+    sys.path.insert(0, path)
+
+    start = time.perf_counter()
+    spec = importlib.util.spec_from_file_location("handler_main", os.path.join(path, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    import_ms = (time.perf_counter() - start) * 1000
+    heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    start = time.perf_counter()
+    for lazy in _lazy_attributes(module):
+        lazy.get()
+    clients_ms = (time.perf_counter() - start) * 1000
+
+    patches, event = fixtures(directory)
+    for attribute, value in patches.items():
+        setattr(module, attribute, value)
+    timings = []
+    with quiet():
+        for _ in range(2):
+            start = time.perf_counter()
+            module.handler(event, None)
+            timings.append((time.perf_counter() - start) * 1000)
+    print(json.dumps({
+        "import_ms": import_ms,
+        "clients_ms": clients_ms,
+        "first_invoke_ms": timings[0],
+        "warm_invoke_ms": timings[1],
+        "heavy_modules": heavy,
+    }))
+
+
+def run(directory, runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", directory],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    result = {"function": directory}
+    for field in ("import_ms", "clients_ms", "first_invoke_ms", "warm_invoke_ms"):
+        result[field] = round(statistics.median(sample[field] for sample in samples), 2)
+    result["heavy_modules"] = samples[-1]["heavy_modules"]
+    return result
+
+
+def main():
+    sys.path.insert(0, BENCH_DIR)
+    from loader import SRC_DIR
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+    functions = args.functions.split(",") if args.functions else sorted(
+        name for name in os.listdir(SRC_DIR)
+        if os.path.isfile(os.path.join(SRC_DIR, name, "main.py"))
+    )
+    for directory in functions:
+        print(json.dumps(run(directory, args.runs)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: GET condicional (ETag / If-None-Match) en invoice-getter y report-generator.
+
+    python bench/bench_conditional_get.py [--sizes 100,1000,5000] [--ddb-latency 0.005]
+
+Simula un usuario que vuelve a la SPA: la primera visita trae el listado
+(limit=1000), el reporte completo y el resumen con 200 + ETag; la segunda
+manda If-None-Match y debe recibir 304. Se comparan latencia, llamadas a
+DynamoDB y bytes de respuesta. Después se edita una factura con
+invoice-data-updater y se verifica que el ETag viejo deja de valer (y que
+durante ETAG_SETTLE_SECONDS no se emite ETag).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "tools"))
+
+from bench_export import populate  # noqa: E402
+from loader import load_lambda, quiet  # noqa: E402
+from stubs import FakeDynamoDB  # noqa: E402
+from lambda_runtime import etags  # noqa: E402
+import rebuild_aggregates  # noqa: E402
+
+USER = "user-1"
+ENDPOINTS = {
+    "list": ("lambda-invoice-getter", {"limit": "1000"}),
+    "report": ("lambda-report-generator", {}),
+    "summary": ("lambda-report-generator", {"view": "summary"}),
+}
+
+
+def api_event(query, if_none_match=None):
+    event = {
+        "requestContext": {"authorizer": {"jwt": {"claims": {"cognito:username": USER}}}},
+        "queryStringParameters": query or None,
+        "headers": {},
+    }
+    if if_none_match:
+        event["headers"]["if-none-match"] = if_none_match
+    return event
+
+
+def measure(module, table, event, repeat):
+    samples, calls = [], table.calls
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = module.handler(event, None)
+        samples.append((time.perf_counter() - start) * 1000)
+    return response, {
+        "status": response["statusCode"],
+        "ms": round(statistics.median(samples), 2),
+        "ddb_calls": (table.calls - calls) // repeat,
+        "bytes": len(response.get("body") or ""),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000,5000")
+    parser.add_argument("--ddb-latency", type=float, default=0.005)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for count in (int(c) for c in args.sizes.split(",")):
+        dynamodb = FakeDynamoDB(latency=args.ddb_latency)
+        table = dynamodb.Table("InvoiceJobs")
+        populate(table, count)
+        rebuild_aggregates.rebuild(table, write=True)
+        modules = {name: load_lambda(directory, dynamodb=dynamodb) for name, (directory, _) in ENDPOINTS.items()}
+        updater = load_lambda("lambda-invoice-updater", dynamodb=dynamodb)
+        # Las facturas cargadas recién: se deja pasar la ventana de asentamiento
+        etags.SETTLE_SECONDS = 0
+
+        result = {"invoices": count}
+        with quiet():
+            cached = {}
+            for name, (_, query) in ENDPOINTS.items():
+                response, first = measure(modules[name], table, api_event(query), args.repeat)
+                cached[name] = response["headers"]["ETag"]
+                _, revalidated = measure(modules[name], table, api_event(query, cached[name]), args.repeat)
+                result[name] = {"full": first, "if_none_match": revalidated}
+
+            # Una edición invalida los ETags; dentro de la ventana no se emite ninguno
+            etags.SETTLE_SECONDS = 60
+            updater.handler({
+                "requestContext": {"authorizer": {"jwt": {"claims": {"cognito:username": USER}}}},
+                "body": json.dumps({"file_key": f"{USER}/{0:06d}_factura.pdf", "updates": {"total": "1.00"}}),
+            }, None)
+            settling = modules["summary"].handler(api_event({"view": "summary"}, cached["summary"]), None)
+            etags.SETTLE_SECONDS = 0
+            after_edit = {
+                name: modules[name].handler(api_event(query, cached[name]), None)["statusCode"]
+                for name, (_, query) in ENDPOINTS.items()
+            }
+        result["settling_response"] = {"status": settling["statusCode"], "etag": "ETag" in settling.get("headers", {})}
+        result["status_after_edit"] = after_edit
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark: filtros por fecha, proveedor y CUIT como key conditions vs traer
+todas las facturas del usuario y filtrar en Python.
+
+    python bench/bench_date_range.py [--invoices 10000] [--ddb-latency 0.002] [--migrate-invoices 2000]
+
+Carga --invoices facturas de un usuario repartidas en 2024-2025 entre 20
+proveedores, con el formato viejo (groupKey "group_key" y la mitad de las
+fechas en dd/mm/aaaa), y las migra con tools/migrate_access_keys.py. Para
+cada filtro compara items leídos, llamadas y latencia de las dos estrategias
+y verifica que export y el listado de report-generator (que paginan todo)
+devuelvan las mismas facturas.
+
+Después mide la migración sobre --migrate-invoices facturas con 1 y 8
+segmentos de scan y verifica que los agregados queden sin desvío.
+"""
+import argparse
+import base64
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "tools"))
+
+from loader import load_lambda, quiet  # noqa: E402
+from stubs import FakeDynamoDB  # noqa: E402
+from lambda_runtime import etags, invoice_keys  # noqa: E402
+import migrate_access_keys  # noqa: E402
+import rebuild_aggregates  # noqa: E402
+
+USER = "user-1"
+SUPPLIERS = [(f"PROVEEDOR {n:02d} S.A.", f"30-{71000000 + n:08d}-{n % 10}") for n in range(20)]
+
+
+def populate_legacy(table, count, seed=1):
+    """Facturas como las escribía database-writer antes de invoice_keys."""
+    rng = random.Random(seed)
+    for i in range(count):
+        key = f"{USER}/{i:06d}_factura.pdf"
+        day, month, year = rng.randint(1, 28), rng.randint(1, 12), rng.choice((2024, 2025))
+        proveedor, cuit = rng.choice(SUPPLIERS)
+        table.store({
+            "PK": key, "SK": "META#1", "file_key": key, "userId": USER, "groupKey": "group_key",
+            "data": {
+                "fecha": f"{year}-{month:02d}-{day:02d}" if i % 2 else f"{day:02d}/{month:02d}/{year}",
+                "proveedor": proveedor,
+                "cuit": cuit,
+                "total": f"{rng.randint(100, 90000)}.00",
+            },
+        })
+    rebuild_aggregates.rebuild(table, write=True)
+
+
+def matches(data, filters):
+    fecha = invoice_keys.normalize_date(data.get("fecha")) or ""
+    if filters.get("from") and not fecha >= filters["from"]:
+        return False
+    if filters.get("to") and not fecha[:len(filters["to"])] <= filters["to"]:
+        return False
+    if filters.get("supplier") and invoice_keys.normalize_supplier(data.get("proveedor")) != filters["supplier"]:
+        return False
+    if filters.get("cuit") and invoice_keys.normalize_cuit(data.get("cuit")) != filters["cuit"]:
+        return False
+    return True
+
+
+def read_all(table, kwargs):
+    """Pagina la query; devuelve (items, items leídos, llamadas, ms)."""
+    kwargs = dict(kwargs)
+    items, read, calls = [], 0, 0
+    start = time.perf_counter()
+    while True:
+        response = table.query(**kwargs)
+        calls += 1
+        read += response.get("ScannedCount", response["Count"])
+        items.extend(response["Items"])
+        if not response.get("LastEvaluatedKey"):
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    return items, read, calls, round((time.perf_counter() - start) * 1000, 1)
+
+
+def exported_rows(export, params):
+    with quiet():
+        response = export.handler({"queryStringParameters": {"username": USER, **params}}, None)
+    return list(csv.DictReader(io.StringIO(base64.b64decode(response["body"]).decode("utf-8"))))
+
+
+def compare_filters(args):
+    dynamodb = FakeDynamoDB(latency=args.ddb_latency)
+    table = dynamodb.Table("InvoiceJobs")
+    populate_legacy(table, args.invoices)
+    with quiet():
+        summary = migrate_access_keys.migrate(table, segments=8, write=True)
+    print(json.dumps({"invoices": args.invoices, "migration": summary}))
+
+    export = load_lambda("lambda-export-csv", dynamodb=dynamodb)
+    report = load_lambda("lambda-report-generator", dynamodb=dynamodb)
+    etags.SETTLE_SECONDS = 0
+    proveedor, cuit = SUPPLIERS[3]
+    cases = {
+        # Sin filtros: más de una página de la query (el listado tiene que leerlas todas)
+        "all": {},
+        "month": {"from": "2025-03", "to": "2025-03"},
+        "quarter": {"from": "2025-01-01", "to": "2025-03-31"},
+        "supplier": {"supplier": proveedor.lower()},
+        "supplier_month": {"supplier": proveedor, "from": "2025-03", "to": "2025-03"},
+        "cuit_year": {"cuit": cuit.replace("-", ""), "from": "2024", "to": "2024"},
+    }
+    everything = invoice_keys.query_kwargs(USER)
+    for name, params in cases.items():
+        filters = invoice_keys.parse_filters(params)
+        all_items, scan_read, scan_calls, scan_ms = read_all(table, everything)
+        expected = sorted(item["file_key"] for item in all_items if matches(item["data"], filters))
+        found, key_read, key_calls, key_ms = read_all(table, invoice_keys.query_kwargs(USER, filters))
+        rows = exported_rows(export, params)
+        with quiet():
+            listed = json.loads(report.handler({"queryStringParameters": {"username": USER, **params}}, None)["body"])
+        print(json.dumps({
+            "filter": name,
+            "matches": len(expected),
+            "python_filter": {"items_read": scan_read, "ddb_calls": scan_calls, "ms": scan_ms},
+            "key_condition": {"items_read": key_read, "ddb_calls": key_calls, "ms": key_ms},
+            "same_result": sorted(item["file_key"] for item in found) == expected,
+            "export_rows": len(rows) == len(expected),
+            "report_rows": len(listed["facturas"]) == len(expected),
+            "sorted_by_date": [row["fecha"] for row in rows] == sorted(row["fecha"] for row in rows),
+        }))
+
+
+def measure_migration(args):
+    for segments in (1, 8):
+        dynamodb = FakeDynamoDB(latency=args.ddb_latency)
+        table = dynamodb.Table("InvoiceJobs")
+        populate_legacy(table, args.migrate_invoices)
+        with quiet():
+            dry_run = migrate_access_keys.migrate(table, segments, write=False)
+            applied = migrate_access_keys.migrate(table, segments, write=True)
+            again = migrate_access_keys.migrate(table, segments, write=False)
+        _, differences = rebuild_aggregates.rebuild(table)
+        print(json.dumps({
+            "segments": segments,
+            "dry_run_changed": dry_run["changed"],
+            "updated": applied["updated"],
+            "conflicts": applied["conflicts"],
+            "invoices_per_s": applied["invoices_per_s"],
+            "pending_after": again["changed"],
+            "aggregate_drift": len(differences),
+        }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=10000)
+    parser.add_argument("--migrate-invoices", type=int, default=2000)
+    parser.add_argument("--ddb-latency", type=float, default=0.002)
+    args = parser.parse_args()
+    compare_filters(args)
+    measure_migration(args)
+
+
+if __name__ == "__main__":
+    main()
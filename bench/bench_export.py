@@ -0,0 +1,103 @@
+"""
+Benchmark: memoria y tiempo del export CSV inline vs streaming a S3 (mode=url).
+
+    python bench/bench_export.py [--sizes 1000,10000,50000]
+
+El modo inline arma el CSV completo (y su base64) en memoria; el modo url lo
+escribe por partes con multipart upload, así el pico de memoria no depende de
+la cantidad de facturas.
+"""
+import argparse
+import base64
+import gzip
+import json
+import os
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loader import load_lambda  # noqa: E402
+from stubs import FakeDynamoDB, FakeS3  # noqa: E402
+from lambda_runtime import invoice_keys  # noqa: E402
+
+
+def populate(table, count, username="user-1"):
+    for i in range(count):
+        key = f"{username}/{i:06d}_factura.pdf"
+        data = {
+            "fecha": "2025-03-05",
+            "proveedor": "DISTRIBUIDORA NORTE S.A.",
+            "total": f"{1000 + i}.50",
+            "cuit": "30-71234567-1",
+            "file_size": Decimal(18000 + i),
+            "text_length": Decimal(900),
+        }
+        table.store({
+            "PK": key,
+            "SK": "META#1",
+            "file_key": key,
+            "userId": username,
+            **invoice_keys.access_keys(username, key, data),
+            "data": data,
+        })
+
+
+def measure(export, mode, gzip_enabled, s3):
+    query = {"username": "user-1", "mode": mode}
+    if gzip_enabled:
+        query["gzip"] = "true"
+    # Precalienta el índice ordenado del stand-in para no medir su memoria
+    export.dynamodb.Table(export.TABLE).query(**export.invoice_keys.query_kwargs("user-1", user_index=export.INDEX_NAME))
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = export.handler({"queryStringParameters": query}, None)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if mode == "inline":
+        size = len(response["body"])
+    else:
+        body = json.loads(response["body"])
+        size = s3.sizes[(export.EXPORT_BUCKET, body["file_key"])]
+    return {
+        "mode": mode + ("+gzip" if gzip_enabled else ""),
+        "elapsed_s": round(elapsed, 3),
+        "peak_mb": round(peak / 1024 / 1024, 2),
+        "output_mb": round(size / 1024 / 1024, 2),
+    }
+
+
+def check_output():
+    """Verifica que el export por S3 (plano y gzip) tenga el mismo contenido que el inline."""
+    dynamodb = FakeDynamoDB()
+    s3 = FakeS3()
+    populate(dynamodb.Table("InvoiceJobs"), 2500)
+    export = load_lambda("lambda-export-csv", dynamodb=dynamodb, s3=s3)
+    query = {"username": "user-1"}
+    inline = base64.b64decode(export.handler({"queryStringParameters": query}, None)["body"])
+    for extra in ({"mode": "url"}, {"mode": "url", "gzip": "true"}):
+        body = json.loads(export.handler({"queryStringParameters": {**query, **extra}}, None)["body"])
+        stored = s3.objects[(export.EXPORT_BUCKET, body["file_key"])]
+        assert (gzip.decompress(stored) if body["compressed"] else stored) == inline
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    args = parser.parse_args()
+
+    check_output()
+    for count in (int(c) for c in args.sizes.split(",")):
+        dynamodb = FakeDynamoDB()
+        s3 = FakeS3(discard_parts=True)
+        populate(dynamodb.Table("InvoiceJobs"), count)
+        export = load_lambda("lambda-export-csv", dynamodb=dynamodb, s3=s3)
+        for mode, gzip_enabled in (("inline", False), ("url", False), ("url", True)):
+            print(json.dumps({"invoices": count, **measure(export, mode, gzip_enabled, s3)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark: export CSV (plano y con gzip) vs format=parquet para una cuenta grande.
+
+    python bench/bench_export_parquet.py [--invoices 100000] [--runs 3]
+
+Carga --invoices facturas variadas (20 proveedores, fechas de dos años,
+algunas sin fecha ni CUIT), las exporta con mode=url en cada formato y mide
+tiempo, pico de memoria y tamaño del archivo. Después mide la carga del lado
+del consumidor con pyarrow (el lector que usan pandas, Polars, DuckDB, etc.):
+pyarrow.csv.read_csv tiene que parsear el texto e inferir tipos, mientras que
+el Parquet trae date32, decimal(18, 2) e int64 ya tipados. Verifica que las
+filas del Parquet coincidan con las del CSV.
+
+Requiere pyarrow instalado localmente (sólo para leer; la lambda no lo usa).
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pyarrow.csv  # noqa: E402
+import pyarrow.parquet  # noqa: E402
+
+from loader import load_lambda, quiet  # noqa: E402
+from stubs import FakeDynamoDB, FakeS3  # noqa: E402
+from lambda_runtime import invoice_keys  # noqa: E402
+
+USER = "user-1"
+SUPPLIERS = [(f"PROVEEDOR {n:02d} S.A.", f"30-{71000000 + n:08d}-{n % 10}") for n in range(20)]
+FORMATS = [("csv", False), ("csv", True), ("parquet", False)]
+
+
+def populate(table, count, seed=1):
+    rng = random.Random(seed)
+    for i in range(count):
+        key = f"{USER}/{i:06d}_factura.pdf"
+        proveedor, cuit = rng.choice(SUPPLIERS)
+        data = {
+            "proveedor": proveedor,
+            "total": f"{rng.randint(100, 900000)}.{rng.randint(0, 99):02d}",
+            "file_size": Decimal(rng.randint(12000, 400000)),
+            "text_length": Decimal(rng.randint(400, 6000)),
+        }
+        if i % 50:
+            data["fecha"] = f"{rng.choice((2024, 2025))}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        if i % 7:
+            data["cuit"] = cuit
+        table.store({"PK": key, "SK": "META#1", "file_key": key, "userId": USER,
+                     **invoice_keys.access_keys(USER, key, data), "data": data})
+
+
+def export(module, s3, export_format, gzip_enabled):
+    query = {"username": USER, "mode": "url", "format": export_format}
+    if gzip_enabled:
+        query["gzip"] = "true"
+    tracemalloc.start()
+    start = time.perf_counter()
+    with quiet():
+        response = module.handler({"queryStringParameters": query}, None)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    body = json.loads(response["body"])
+    return s3.objects[(module.EXPORT_BUCKET, body["file_key"])], elapsed, peak
+
+
+def load(content, export_format, gzip_enabled):
+    if export_format == "parquet":
+        return pyarrow.parquet.read_table(io.BytesIO(content))
+    if gzip_enabled:
+        content = gzip.decompress(content)
+    return pyarrow.csv.read_csv(io.BytesIO(content))
+
+
+def best_of(runs, fn):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    s3 = FakeS3()
+    dynamodb = FakeDynamoDB()
+    module = load_lambda("lambda-export-csv", s3=s3, dynamodb=dynamodb)
+    table = dynamodb.Table(module.TABLE)
+    populate(table, args.invoices)
+    # Precalienta el índice ordenado del stand-in para no medir su memoria
+    table.query(**invoice_keys.query_kwargs(USER, user_index=module.INDEX_NAME))
+
+    tables = {}
+    for export_format, gzip_enabled in FORMATS:
+        content, elapsed, peak = export(module, s3, export_format, gzip_enabled)
+        loaded, load_s = best_of(args.runs, lambda: load(content, export_format, gzip_enabled))
+        tables[(export_format, gzip_enabled)] = loaded
+        result = {
+            "format": export_format + ("+gzip" if gzip_enabled else ""),
+            "rows": loaded.num_rows,
+            "export_s": round(elapsed, 2),
+            "export_peak_mb": round(peak / 1024 / 1024, 1),
+            "file_kb": round(len(content) / 1024, 1),
+            "load_ms": round(load_s * 1000, 1),
+            "types": {field.name: str(field.type) for field in loaded.schema},
+        }
+        if export_format == "parquet":
+            metadata = pyarrow.parquet.ParquetFile(io.BytesIO(content)).metadata
+            result["row_groups"] = metadata.num_row_groups
+            result["column_kb"] = {
+                metadata.schema.column(c).name: round(sum(
+                    metadata.row_group(r).column(c).total_compressed_size for r in range(metadata.num_row_groups)
+                ) / 1024, 1)
+                for c in range(metadata.num_columns)
+            }
+            # Sólo las columnas del CSV: Parquet lee nada más esos column chunks
+            _, pruned_s = best_of(args.runs, lambda: pyarrow.parquet.read_table(io.BytesIO(content), columns=module.CSV_FIELDS))
+            result["load_csv_columns_ms"] = round(pruned_s * 1000, 1)
+        print(json.dumps(result))
+
+    csv_rows = tables[("csv", False)].to_pylist()
+    parquet_rows = tables[("parquet", False)].to_pylist()
+
+    def normalized(row):
+        return (
+            str(row["fecha"]) if row["fecha"] is not None else None,
+            row["proveedor"],
+            f"{Decimal(str(row['total'])):.2f}" if row["total"] is not None else None,
+            row["cuit"] or None,  # pyarrow.csv lee la celda vacía como ""
+        )
+
+    print(json.dumps({
+        "same_rows": [normalized(row) for row in csv_rows] == [normalized(row) for row in parquet_rows],
+        "file_keys": sum(row["file_key"] is not None for row in parquet_rows),
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark: extracción completa vs early exit sobre un corpus de PDFs multipágina.
+
+    python bench/bench_extraction.py [--docs 20] [--pages 1,5,20,50]
+
+Reporta latencia media por documento y pico de memoria (tracemalloc) de cada modo.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loader import load_lambda  # noqa: E402
+from pdfgen import make_invoice_pdf  # noqa: E402
+
+
+def measure(writer, corpus, mode):
+    tracemalloc.start()
+    start = time.perf_counter()
+    pages_read = 0
+    for pdf in corpus:
+        result = writer.extraction.extract_text(
+            io.BytesIO(pdf),
+            mode=mode,
+            stop_when=writer._fields_found_tracker(),
+            max_pages=None,
+        )
+        pages_read += result.pages_read
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "mode": mode,
+        "ms_per_doc": round(elapsed * 1000 / len(corpus), 2),
+        "pages_read": pages_read,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pages", default="1,5,20,50")
+    args = parser.parse_args()
+
+    writer = load_lambda("lambda-database-writer")
+    for pages in (int(p) for p in args.pages.split(",")):
+        corpus = [make_invoice_pdf(seed=i, pages=pages) for i in range(args.docs)]
+        for mode in (writer.extraction.MODE_FULL, writer.extraction.MODE_EARLY_EXIT):
+            print(json.dumps({"pages": pages, **measure(writer, corpus, mode)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Benchmark: entregas repetidas de SQS en database-writer (ver idempotency.py).
+
+    python bench/bench_idempotency.py [--invoices 200] [--s3-latency 0.02] [--ddb-latency 0.005]
+
+Entrega --invoices mensajes (de a 10, como el event source mapping) y después
+los mismos mensajes otra vez, con el registro de idempotencia activado y
+desactivado. Compara requests a S3, llamadas a DynamoDB y tiempo de la
+entrega repetida: con el registro sólo se lee un item por mensaje (un
+BatchGetItem por batch), sin descargar ni parsear.
+
+Además verifica:
+
+- un mensaje entregado mientras otra invocación tiene el lease vuelve en
+  batchItemFailures, y un lease vencido se retoma;
+- una edición hecha con invoice-updater sobrevive a la entrega repetida, a
+  una subida nueva del mismo PDF (otro ETag) y a tools/reprocess_uploads.py
+  --force --apply;
+- los agregados no se desvían (tools/rebuild_aggregates.py), tampoco
+  cuando los postings del índice quedan sin escribir y el mensaje se
+  reintenta, también en la invocación directa.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "tools"))
+
+from loader import load_lambda, quiet, sqs_event  # noqa: E402
+from pdfgen import make_invoice_pdf  # noqa: E402
+from stubs import FakeDynamoDB, FakeS3  # noqa: E402
+import rebuild_aggregates  # noqa: E402
+import reprocess_uploads  # noqa: E402
+
+BUCKET = "facturas"
+USER = "user-1"
+BATCH = 10
+
+
+def setup(args, enabled=True):
+    s3 = FakeS3(latency=args.s3_latency)
+    dynamodb = FakeDynamoDB(latency=args.ddb_latency)
+    writer = load_lambda(
+        "lambda-database-writer",
+        env={"METRICS_ENABLED": "false", "IDEMPOTENCY_ENABLED": "true" if enabled else "false"},
+        s3=s3, dynamodb=dynamodb,
+    )
+    bodies = []
+    for i in range(args.invoices):
+        key = f"{USER}/{i:05d}_factura.pdf"
+        etag = s3.put_object(Bucket=BUCKET, Key=key, Body=make_invoice_pdf(seed=i))["ETag"]
+        bodies.append(json.dumps({"bucket": BUCKET, "key": key, "userId": USER, "etag": etag}))
+    return s3, dynamodb, writer, bodies
+
+
+def deliver(writer, bodies):
+    failures = []
+    with quiet():
+        for offset in range(0, len(bodies), BATCH):
+            response = writer.handler(sqs_event(bodies[offset:offset + BATCH]), None)
+            failures.extend(response["batchItemFailures"])
+    return failures
+
+
+def measure(s3, dynamodb, table, fn):
+    """Requests a S3 y llamadas a DynamoDB (de tabla y batch) durante fn()."""
+    s3_before, ddb_before = s3.calls, table.calls + dynamodb.calls
+    start = time.perf_counter()
+    result = fn()
+    return result, {
+        "s3_requests": s3.calls - s3_before,
+        "ddb_calls": table.calls + dynamodb.calls - ddb_before,
+        "elapsed_s": round(time.perf_counter() - start, 3),
+    }
+
+
+def run(args):
+    for enabled in (False, True):
+        s3, dynamodb, writer, bodies = setup(args, enabled)
+        table = dynamodb.Table(writer.TABLE)
+        first_failures, first = measure(s3, dynamodb, table, lambda: deliver(writer, bodies))
+        repeat_failures, repeat = measure(s3, dynamodb, table, lambda: deliver(writer, bodies))
+        print(json.dumps({
+            "invoices": args.invoices,
+            "idempotency": enabled,
+            "first": first,
+            "duplicate": repeat,
+            "failures": len(first_failures) + len(repeat_failures),
+        }))
+
+
+def edit(updater, key, updates):
+    event = {
+        "requestContext": {"authorizer": {"jwt": {"claims": {"cognito:username": USER}}}},
+        "body": json.dumps({"file_key": key, "updates": updates}),
+    }
+    with quiet():
+        return updater.handler(event, None)["statusCode"]
+
+
+def check(args):
+    s3, dynamodb, writer, bodies = setup(argparse.Namespace(**{**vars(args), "invoices": 20}))
+    table = dynamodb.Table(writer.TABLE)
+    updater = load_lambda("lambda-invoice-updater", dynamodb=dynamodb)
+    deliver(writer, bodies)
+
+    # Redelivery mientras otra invocación tiene el lease: no se procesa, se reintenta
+    message = json.loads(bodies[0])
+    processed_key = writer.processed.key_for(message["key"], message["etag"])
+    table.delete_item(Key={"PK": processed_key[0], "SK": processed_key[1]})
+    lease = writer.processed.acquire(table, processed_key)
+    s3_before = s3.calls
+    busy = deliver(writer, bodies[:1])
+    busy_s3 = s3.calls - s3_before
+    lease_after_busy = table.items[processed_key].get("lease")
+
+    # Lease vencido (la invocación anterior murió): se retoma y se completa
+    table.items[processed_key]["leaseExpiresAt"] = int(time.time()) - 1
+    taken_over = deliver(writer, bodies[:1])
+    record = table.items.get(processed_key, {})
+
+    # Edición del usuario: no la pisa ni la redelivery, ni el PDF subido de nuevo, ni el reproceso forzado
+    key = message["key"]
+    edited_status = edit(updater, key, {"proveedor": "EDITADO S.A.", "total": "123.45"})
+    version = int(table.items[(key, "META#1")]["version"])
+    deliver(writer, bodies[:1])
+    after_redelivery = dict(table.items[(key, "META#1")]["data"])
+    etag = s3.put_object(Bucket=BUCKET, Key=key, Body=make_invoice_pdf(seed=0))["ETag"]
+    deliver(writer, [json.dumps({**message, "etag": etag})])
+    after_upload = table.items[(key, "META#1")]
+    with quiet() as out:
+        summary = reprocess_uploads.reprocess(writer, BUCKET, out=out, log=out, force=True, apply=True)
+    after_reprocess = table.items[(key, "META#1")]
+    _, differences = rebuild_aggregates.rebuild(table)
+
+    def kept(item):
+        return item["data"].get("proveedor") == "EDITADO S.A." and item["data"].get("total") == "123.45"
+
+    print(json.dumps({
+        "busy_in_failures": [failure["itemIdentifier"] for failure in busy] == ["msg-0"],
+        "busy_s3_requests": busy_s3,
+        "busy_lease_kept": lease_after_busy == lease,
+        "expired_taken_over": not taken_over and record.get("status") == "COMPLETED",
+        "edited_status": edited_status,
+        "edits_kept": [kept({"data": after_redelivery}), kept(after_upload), kept(after_reprocess)],
+        "version_kept": int(after_reprocess.get("version", 0)) == version,
+        "reprocess_failed": summary.get("failed", 0),
+        "aggregate_drift": len(differences),
+    }))
+
+
+def check_postings_retry(args):
+    """Postings que quedan en UnprocessedItems: la factura cuenta en los agregados y el reintento los escribe."""
+    s3, dynamodb, writer, bodies = setup(argparse.Namespace(**{**vars(args), "invoices": 10}))
+    table = dynamodb.Table(writer.TABLE)
+    batch_write_item = dynamodb.batch_write_item
+
+    def drop_postings(RequestItems, **kwargs):
+        kept = {name: [r for r in requests if not r["PutRequest"]["Item"]["PK"].startswith("IDX#")]
+                for name, requests in RequestItems.items()}
+        response = batch_write_item(RequestItems=kept, **kwargs)
+        dropped = {name: [r for r in requests if r["PutRequest"]["Item"]["PK"].startswith("IDX#")]
+                   for name, requests in RequestItems.items()}
+        return {"UnprocessedItems": {name: requests for name, requests in dropped.items() if requests}}
+
+    dynamodb.batch_write_item = drop_postings
+    first = deliver(writer, bodies)
+    _, drift_before_retry = rebuild_aggregates.rebuild(table)
+    # Invocación directa (sin SQS): error reintentable y sin registro COMPLETED
+    direct = json.loads(bodies[-1])
+    direct_key = f"{USER}/directa_factura.pdf"
+    direct["key"] = direct_key
+    direct["etag"] = s3.put_object(Bucket=BUCKET, Key=direct_key, Body=make_invoice_pdf(seed=99))["ETag"]
+    with quiet():
+        direct_status = writer.handler(direct, None)["statusCode"]
+    direct_completed = writer.processed.key_for(direct_key, direct["etag"]) in table.items
+    dynamodb.batch_write_item = batch_write_item
+    retry = deliver(writer, bodies)
+    with quiet():
+        direct_retry_status = writer.handler(direct, None)["statusCode"]
+    _, differences = rebuild_aggregates.rebuild(table)
+    postings = sum(1 for pk, _ in table.items if pk.startswith("IDX#"))
+    direct_postings = sum(1 for item in table.items.values()
+                          if str(item["PK"]).startswith("IDX#") and item.get("file_key") == direct_key)
+    print(json.dumps({
+        "postings_retried": len(first) == len(bodies) and not retry,
+        "direct_status": [direct_status, direct_retry_status],
+        "direct_completed_before_retry": direct_completed,
+        "direct_postings_after_retry": direct_postings,
+        "drift_before_retry": len(drift_before_retry),
+        "postings_after_retry": postings,
+        "aggregate_drift": len(differences),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=200)
+    parser.add_argument("--s3-latency", type=float, default=0.02)
+    parser.add_argument("--ddb-latency", type=float, default=0.005)
+    args = parser.parse_args()
+    check(args)
+    check_postings_retry(args)
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
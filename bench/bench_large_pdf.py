@@ -0,0 +1,134 @@
+"""
+Benchmark: memoria pico de database-writer según el tamaño del PDF.
+
+    python bench/bench_large_pdf.py [--sizes-mb 1,10,50,100] [--page-mb 2]
+
+Cada medición corre en un proceso nuevo que procesa una sola factura
+"escaneada" (bench/pdfgen.write_scanned_pdf: texto en la página 1 y páginas
+de imagen de --page-mb MB). El CUIT generado no valida, así que la extracción
+recorre todas las páginas (hasta MAX_PDF_PAGES): el peor caso. El objeto de S3
+vive en un archivo en disco y el stand-in lo copia por bloques, así la memoria
+medida es sólo la de la lambda.
+
+- in_memory: SPOOL_THRESHOLD_BYTES infinito, descarga completa a BytesIO
+  (el comportamiento anterior).
+- spooled: configuración por defecto, los PDFs grandes van a /tmp.
+
+Reporta el aumento del RSS pico (ru_maxrss) durante la invocación. También
+verifica los rechazos 413 por tamaño (MAX_PDF_BYTES) y por páginas
+(MAX_PAGE_COUNT).
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+MB = 1024 * 1024
+MODES = {
+    "in_memory": {"SPOOL_THRESHOLD_BYTES": str(2 ** 62)},
+    "spooled": {},
+}
+
+
+def child(args):
+    from loader import load_lambda, quiet
+    from pdfgen import write_scanned_pdf
+    from stubs import FakeClientError, FakeDynamoDB, FakeS3
+
+    class DiskS3(FakeS3):
+        """S3 con los objetos en archivos, copiados por bloques como una descarga real."""
+
+        def __init__(self, paths):
+            super().__init__()
+            self.paths = paths
+
+        def head_object(self, Bucket, Key, **kwargs):
+            self._call()
+            if Key not in self.paths:
+                raise FakeClientError("404")
+            return {"ContentLength": os.path.getsize(self.paths[Key])}
+
+        def download_fileobj(self, Bucket, Key, Fileobj, **kwargs):
+            self._call()
+            with open(self.paths[Key], "rb") as source:
+                shutil.copyfileobj(source, Fileobj, 1 * MB)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(workdir, "factura.pdf")
+        image_pages = max(1, round(args.size_mb / args.page_mb))
+        with open(path, "wb") as out:
+            write_scanned_pdf(out, image_pages, int(args.size_mb * MB / image_pages), seed=1)
+        size = os.path.getsize(path)
+
+        env = {**MODES[args.mode], "MAX_PDF_BYTES": str(args.max_bytes or 2 ** 62), "CACHE_ENABLED": "false"}
+        if args.max_page_count:
+            env["MAX_PAGE_COUNT"] = str(args.max_page_count)
+        s3 = DiskS3({"user-1/factura.pdf": path})
+        writer = load_lambda("lambda-database-writer", env=env, s3=s3, dynamodb=FakeDynamoDB())
+        # PyPDF2 y s3transfer se importan de forma diferida: se cargan antes de medir
+        writer.extraction.PyPDF2.PdfReader
+        import boto3.s3.transfer  # noqa: F401
+
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        with quiet():
+            response = writer.handler({"bucket": "facturas", "key": "user-1/factura.pdf", "userId": "user-1"}, None)
+        elapsed = time.perf_counter() - start
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        body = json.loads(response["body"])
+        print(json.dumps({
+            "mode": args.mode,
+            "file_mb": round(size / MB, 1),
+            "status": response["statusCode"],
+            "peak_rss_increase_mb": round((peak - before) / 1024, 1),
+            "seconds": round(elapsed, 2),
+            "total": body.get("total"),
+            "error": body.get("error"),
+        }))
+    finally:
+        shutil.rmtree(workdir)
+
+
+def run_child(mode, size_mb, args, **extra):
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--mode", mode,
+               "--size-mb", str(size_mb), "--page-mb", str(args.page_mb)]
+    for name, value in extra.items():
+        command += [f"--{name.replace('_', '-')}", str(value)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", default="1,10,50,100")
+    parser.add_argument("--page-mb", type=float, default=2)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", default="spooled", help=argparse.SUPPRESS)
+    parser.add_argument("--size-mb", type=float, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--max-bytes", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--max-page-count", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    for size_mb in (float(s) for s in args.sizes_mb.split(",")):
+        for mode in MODES:
+            print(json.dumps(run_child(mode, size_mb, args)))
+    # Rechazos con status 413 antes de extraer texto
+    print(json.dumps({"check": "max_bytes", **run_child("spooled", 10, args, max_bytes=5 * MB)}))
+    print(json.dumps({"check": "max_page_count", **run_child("spooled", 10, args, max_page_count=3)}))
+
+
+if __name__ == "__main__":
+    main()
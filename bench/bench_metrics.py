@@ -0,0 +1,107 @@
+"""
+Verificación local de las métricas EMF (lambda_runtime.metrics) de cada lambda.
+
+    python bench/bench_metrics.py [--functions ...] [--overhead-runs 2000]
+
+Invoca cada handler contra los stand-ins, captura la línea EMF que emite y
+comprueba que sea un documento válido (namespace, dimensiones Function y
+Outcome, cada métrica declarada presente y numérica, como mucho 100 valores).
+Imprime las métricas de cada función y el overhead por invocación con las
+métricas activas vs METRICS_ENABLED=false.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_cold_start import COGNITO_ENV, fixtures  # noqa: E402
+from loader import SRC_DIR, load_lambda, quiet  # noqa: E402
+
+UNITS = {"Milliseconds", "Count", "Bytes"}
+
+
+def validate(line):
+    """Devuelve la lista de problemas del documento EMF (vacía si es válido)."""
+    doc = json.loads(line)
+    problems = []
+    directives = doc.get("_aws", {}).get("CloudWatchMetrics") or []
+    if not isinstance(doc.get("_aws", {}).get("Timestamp"), int):
+        problems.append("Timestamp faltante")
+    for directive in directives:
+        if not directive.get("Namespace"):
+            problems.append("Namespace faltante")
+        for dimension_set in directive.get("Dimensions", []):
+            for dimension in dimension_set:
+                if not isinstance(doc.get(dimension), str):
+                    problems.append(f"dimensión {dimension} faltante")
+        for metric in directive.get("Metrics", []):
+            value = doc.get(metric["Name"])
+            values = value if isinstance(value, list) else [value]
+            if not values or len(values) > 100 or not all(isinstance(v, (int, float)) for v in values):
+                problems.append(f"valor inválido para {metric['Name']}")
+            if metric.get("Unit") not in UNITS:
+                problems.append(f"unidad inválida para {metric['Name']}")
+    if not directives:
+        problems.append("sin CloudWatchMetrics")
+    return problems
+
+
+def invoke(directory):
+    patches, event = fixtures(directory)
+    module = load_lambda(directory, env=COGNITO_ENV, **patches)
+    lines = []
+    module.metrics.emit = lines.append
+    with quiet():
+        module.handler(event, None)
+    return module, event, lines
+
+
+def overhead(directory, runs):
+    module, event, _ = invoke(directory)
+    module.metrics.emit = lambda line: None
+    timings = {}
+    with quiet():
+        for enabled in (False, True, False, True):
+            module.metrics.enabled = enabled
+            start = time.perf_counter()
+            for _ in range(runs):
+                module.handler(event, None)
+            timings[enabled] = (time.perf_counter() - start) / runs * 1e6
+    return {"disabled_us": round(timings[False], 1), "enabled_us": round(timings[True], 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions")
+    parser.add_argument("--overhead-runs", type=int, default=2000)
+    parser.add_argument("--overhead-function", default="lambda-report-generator")
+    args = parser.parse_args()
+
+    functions = args.functions.split(",") if args.functions else sorted(
+        name for name in os.listdir(SRC_DIR)
+        if os.path.isfile(os.path.join(SRC_DIR, name, "main.py"))
+    )
+    invalid = 0
+    for directory in functions:
+        _, _, lines = invoke(directory)
+        problems = validate(lines[0]) if len(lines) == 1 else [f"{len(lines)} líneas EMF (se esperaba 1)"]
+        invalid += bool(problems)
+        doc = json.loads(lines[0]) if lines else {}
+        metrics = [m["Name"] for d in doc.get("_aws", {}).get("CloudWatchMetrics", []) for m in d["Metrics"]]
+        print(json.dumps({
+            "function": directory,
+            "emf_function": doc.get("Function"),
+            "outcome": doc.get("Outcome"),
+            "metrics": {name: doc[name] for name in metrics},
+            "problems": problems,
+        }, ensure_ascii=False))
+    print(json.dumps({"overhead": args.overhead_function, **overhead(args.overhead_function, args.overhead_runs)}))
+    if invalid:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
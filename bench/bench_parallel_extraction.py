@@ -0,0 +1,175 @@
+"""
+Benchmark: extracción de texto en serie vs repartida entre procesos.
+
+    python bench/bench_parallel_extraction.py [--pages 1,10,100] [--processes 1,2,4] [--repeat 3]
+
+Para cada documento (bench/pdfgen.make_invoice_pdf con N páginas) mide la
+extracción completa con 1..P procesos, desde memoria (BytesIO) y desde un
+archivo temporal como el que usa database-writer para PDFs grandes, y
+verifica que el texto sea idéntico al de la extracción en serie. El límite
+de procesos simultáneos (uno por vCPU en Lambda) se levanta para poder medir
+más procesos que vCPUs; `cpus` indica cuántas tiene la máquina, y con menos
+vCPUs que procesos sólo se mide el overhead del fork.
+
+También simula un hijo trabado después del fork: con --hang-timeout la
+extracción tiene que cortar, matar los hijos y devolver el texto en serie.
+Verifica que early_exit con varios procesos corte igual que en serie (sin
+extraer más de un bloque de páginas de más) y que database-writer, con un
+batch de SQS, haga el fork de los PDFs grandes recién sin su pool de threads
+corriendo.
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loader import load_lambda, quiet, sqs_event  # noqa: E402
+from pdfgen import make_invoice_pdf  # noqa: E402
+from stubs import FakeDynamoDB, FakeS3  # noqa: E402
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, round(statistics.median(samples), 1)
+
+
+def _hang(reader, start, stop, conn):
+    """Hijo que no responde nunca, como uno trabado en un lock heredado del fork."""
+    time.sleep(3600)
+
+
+def check_hang(extraction, timeout):
+    pdf = make_invoice_pdf(seed=40, pages=40)
+    serial = extraction.extract_text(io.BytesIO(pdf), mode=extraction.MODE_FULL)
+    extract_range, extraction._extract_range = extraction._extract_range, _hang
+    try:
+        start = time.perf_counter()
+        extracted = extraction.extract_text(
+            io.BytesIO(pdf), mode=extraction.MODE_FULL, processes=2, min_parallel_pages=2, parallel_timeout=timeout,
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        extraction._extract_range = extract_range
+    children = [child.pid for child in extraction.multiprocessing.active_children()]
+    print(json.dumps({
+        "check": "hung_child",
+        "elapsed_s": round(elapsed, 2),
+        "processes_used": extracted.processes,
+        "same_text": extracted.text == serial.text,
+        "children_left": len(children),
+    }))
+
+
+def _record_parallel(extraction, calls):
+    """Envuelve _parallel_page_texts para anotar cada fork: páginas y otros threads vivos."""
+    parallel = extraction._parallel_page_texts
+
+    def recorded(reader, start, stop, *args, **kwargs):
+        others = [thread.name for thread in threading.enumerate() if thread is not threading.current_thread()]
+        texts, used = parallel(reader, start, stop, *args, **kwargs)
+        if used > 1:
+            calls.append({"pages": stop - start, "other_threads": others})
+        return texts, used
+
+    extraction._parallel_page_texts = recorded
+    return parallel
+
+
+def check_early_exit(extraction):
+    pdf = make_invoice_pdf(seed=100, pages=100)
+
+    def stop_at(page):
+        seen = []
+        return lambda text: seen.append(text) or len(seen) >= page
+
+    serial = extraction.extract_text(io.BytesIO(pdf), stop_when=stop_at(5))
+    calls = []
+    parallel = _record_parallel(extraction, calls)
+    try:
+        extracted = extraction.extract_text(io.BytesIO(pdf), stop_when=stop_at(5), processes=4, min_parallel_pages=2)
+    finally:
+        extraction._parallel_page_texts = parallel
+    print(json.dumps({
+        "check": "early_exit_parallel",
+        "pages_read": [extracted.pages_read, serial.pages_read],
+        "same_text": extracted.text == serial.text,
+        # Primera página en serie más un bloque de processes * MIN_PAGES_PER_PROCESS
+        "pages_extracted": 1 + sum(call["pages"] for call in calls),
+        "max_pages_extracted": 1 + 4 * extraction.MIN_PAGES_PER_PROCESS,
+    }))
+
+
+def check_writer_batch():
+    """Un batch con un PDF grande y varios chicos: el fork ocurre sin otros threads vivos."""
+    s3 = FakeS3()
+    writer = load_lambda("lambda-database-writer", s3=s3, dynamodb=FakeDynamoDB(),
+                         EXTRACTION_PROCESSES=2, PARALLEL_MIN_PAGES=2, EXTRACTION_MODE="full")
+    bodies = []
+    for i, pages in enumerate((40, 1, 1, 1)):
+        key = f"user-1/f{i}_factura.pdf"
+        etag = s3.put_object(Bucket="facturas", Key=key, Body=make_invoice_pdf(seed=i, pages=pages))["ETag"]
+        bodies.append(json.dumps({"bucket": "facturas", "key": key, "userId": "user-1", "etag": etag}))
+    calls = []
+    _record_parallel(writer.extraction, calls)
+    with quiet():
+        failures = writer.handler(sqs_event(bodies), None)["batchItemFailures"]
+    print(json.dumps({
+        "check": "writer_fork_outside_pool",
+        "failures": len(failures),
+        "invoices": sum(1 for pk, sk in writer.dynamodb.Table(writer.TABLE).items if sk == "META#1"),
+        "forks": len(calls),
+        "other_threads_at_fork": sorted({name for call in calls for name in call["other_threads"]}),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", default="1,10,100")
+    parser.add_argument("--processes", default="1,2,4")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--hang-timeout", type=float, default=1.0)
+    args = parser.parse_args()
+
+    writer = load_lambda("lambda-database-writer")
+    extraction = writer.extraction
+    counts = [int(p) for p in args.processes.split(",")]
+    extraction._process_slots = threading.BoundedSemaphore(max(counts))
+    check_hang(extraction, args.hang_timeout)
+    check_early_exit(extraction)
+    check_writer_batch()
+
+    for pages in (int(p) for p in args.pages.split(",")):
+        pdf = make_invoice_pdf(seed=pages, pages=pages)
+        spool = tempfile.TemporaryFile()
+        spool.write(pdf)
+        sources = {"memory": lambda: io.BytesIO(pdf), "tmp_file": lambda: (spool.seek(0), spool)[1]}
+        result = {"pages": pages, "cpus": extraction.available_cpus()}
+        for source, open_stream in sources.items():
+            baseline = None
+            for processes in counts:
+                extracted, ms = timed(lambda: extraction.extract_text(
+                    open_stream(), mode=extraction.MODE_FULL, processes=processes, min_parallel_pages=2,
+                ), args.repeat)
+                baseline = baseline or extracted.text
+                result[f"{source}_p{processes}"] = {
+                    "ms": ms,
+                    "processes_used": extracted.processes,
+                    "same_text": extracted.text == baseline,
+                }
+        spool.close()
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark y suite de precisión del parser de facturas de database-writer.
+
+    python bench/bench_parser.py [--invoices 5000] [--repeat 5] [--check]
+
+1. Casos golden (bench/golden/invoice_texts.jsonl): texto -> campos esperados.
+   Con --check el script termina con código 1 si alguno falla.
+2. Corpus generado con formatos variados y valores conocidos: precisión por
+   campo y microsegundos por factura del parser actual vs el de 4 regex original.
+   Se repite sin las etiquetas de fecha y CUIT ("labels": "sin fecha/cuit"):
+   ahí el parser actual hace una segunda búsqueda por cada campo que le
+   falta, y es más lento que el original a cambio de validar los valores.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loader import load_lambda  # noqa: E402
+from pdfgen import PROVEEDORES  # noqa: E402
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "invoice_texts.jsonl")
+FIELDS = ("total", "fecha", "cuit", "proveedor")
+
+
+def legacy_parse(text):
+    """Parser original (4 re.search sin precompilar), como referencia."""
+    data = {}
+    match_total = re.search(r"(total|importe)\D+([\d.,]+)", text, re.IGNORECASE)
+    if match_total:
+        data["total"] = match_total.group(2).replace(",", ".")
+    match_date = re.search(r"(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})", text)
+    if match_date:
+        data["fecha"] = match_date.group(1)
+    match_cuit = re.search(r"(?:CUIT|C.U.I.T)\D*(\d{2}-\d{8}-\d)", text, re.IGNORECASE)
+    if match_cuit:
+        data["cuit"] = match_cuit.group(1)
+    match_prov = re.search(r"(?:razón social|proveedor|empresa):?\s*([A-ZÁÉÍÓÚÑ ]+)", text, re.IGNORECASE)
+    if match_prov:
+        data["proveedor"] = match_prov.group(1).strip()
+    return data
+
+
+def _cuit(rng):
+    weights = (5, 4, 3, 2, 7, 6, 5, 4, 3, 2)
+    while True:
+        digits = rng.choice(["20", "23", "27", "30", "33"]) + f"{rng.randint(0, 99999999):08d}"
+        check = 11 - sum(int(d) * w for d, w in zip(digits, weights)) % 11
+        check = 0 if check == 11 else check
+        if check != 10:
+            return f"{digits[:2]}-{digits[2:]}-{check}"
+
+
+def _ar_amount(cents):
+    integer = f"{cents // 100:,}".replace(",", ".")
+    return f"{integer},{cents % 100:02d}"
+
+
+def generate_invoice(rng):
+    """Devuelve (texto, campos esperados) con variaciones de formato."""
+    proveedor = rng.choice(PROVEEDORES) + rng.choice(["", " S.A.", " SRL"])
+    cuit = _cuit(rng)
+    day, month, year = rng.randint(1, 28), rng.randint(1, 12), rng.randint(2020, 2025)
+    fecha_fmt = rng.choice([f"{day:02d}/{month:02d}/{year}", f"{day}-{month}-{year % 100:02d}", f"{day:02d}/{month:02d}/{year % 100:02d}"])
+    subtotal = rng.randint(1000, 50000000)
+    total = subtotal + subtotal * 21 // 100
+    label_prov = rng.choice(["Proveedor:", "Razón Social:", "Empresa:"])
+    label_cuit = rng.choice(["CUIT:", "C.U.I.T.:", "CUIT Nro"])
+    label_total = rng.choice(["Total:", "Importe Total:", "TOTAL $"])
+
+    lines = [
+        "FACTURA " + rng.choice("ABC"),
+        f"Punto de venta: 0001 Comprobante: {rng.randint(1, 99999):08d}",
+        f"{label_prov} {proveedor}",
+        f"{label_cuit} {cuit}",
+        f"Fecha de emisión: {fecha_fmt}",
+    ]
+    for n in range(rng.randint(1, 15)):
+        lines.append(f"{rng.randint(1, 20)} x Articulo {n + 1} {_ar_amount(rng.randint(100, 900000))}")
+    lines.append(f"Subtotal: {_ar_amount(subtotal)}")
+    lines.append(f"IVA 21%: {_ar_amount(subtotal * 21 // 100)}")
+    lines.append(f"{label_total} {_ar_amount(total)}")
+    expected = {
+        "total": f"{total // 100}.{total % 100:02d}",
+        "fecha": f"{year}-{month:02d}-{day:02d}",
+        "cuit": cuit,
+        "proveedor": proveedor,
+    }
+    return "\n".join(lines) + "\n", expected
+
+
+def accuracy(parse, corpus, repeat=1):
+    hits = {field: 0 for field in FIELDS}
+    # Mejor de `repeat` corridas: la máquina del bench tiene ruido
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [parse(text) for text, _ in corpus]
+        elapsed = min(elapsed, time.perf_counter() - start)
+    for result, (_, expected) in zip(results, corpus):
+        for field in FIELDS:
+            hits[field] += result.get(field) == expected[field]
+    return {
+        "us_per_invoice": round(elapsed * 1e6 / len(corpus), 1),
+        **{f"acc_{field}": round(hits[field] / len(corpus), 4) for field in FIELDS},
+    }
+
+
+def strip_labels(corpus):
+    """El mismo corpus sin las etiquetas de fecha y CUIT (los valores quedan sueltos en el texto)."""
+    stripped = []
+    for text, expected in corpus:
+        text = re.sub(r"(?im)^fecha[^\d\n]*", "Emitida el ", text)
+        text = re.sub(r"(?im)^c\.?\s?u\.?\s?i\.?\s?t\.?[^\d\n]*", "Nro. ", text)
+        stripped.append((text, expected))
+    return stripped
+
+
+def run_golden(parse):
+    failed = 0
+    for line in open(GOLDEN, encoding="utf-8"):
+        case = json.loads(line)
+        got = parse(case["text"])
+        if got != case["expected"]:
+            failed += 1
+            print(json.dumps({"golden": case["name"], "expected": case["expected"], "got": got}, ensure_ascii=False))
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    writer = load_lambda("lambda-database-writer")
+    failed = run_golden(writer.parse_invoice_text)
+    print(json.dumps({"golden_failures": failed}))
+
+    rng = random.Random(args.seed)
+    corpus = [generate_invoice(rng) for _ in range(args.invoices)]
+    for labels, texts in (("todas", corpus), ("sin fecha/cuit", strip_labels(corpus))):
+        print(json.dumps({"parser": "legacy", "labels": labels, **accuracy(legacy_parse, texts, args.repeat)}, ensure_ascii=False))
+        print(json.dumps({"parser": f"v{writer.invoice_parser.PARSER_VERSION}", "labels": labels,
+                          **accuracy(writer.parse_invoice_text, texts, args.repeat)}, ensure_ascii=False))
+
+    if args.check and failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Load test local del pipeline completo, sin desplegar production/:
+
+    upload (presigned-url-generator + PUT a S3) -> invoice-processor -> SQS
+    -> database-writer -> DynamoDB -> invoice-getter / report-generator
+
+    python bench/bench_pipeline.py [--invoices 500] [--users 5] [--concurrency 8] [--writers 4]
+
+Todos los handlers corren en proceso contra los stand-ins de bench/stubs.py,
+con una latencia configurable por servicio. Cada worker de upload y de
+database-writer carga su propia copia del módulo, como contenedores separados
+de Lambda. El corpus son PDFs generados (bench/pdfgen.py) de 1 a varias
+páginas. Reporta p50/p95/p99 por etapa, la latencia de punta a punta por
+factura (inicio del upload -> fila escrita) y las facturas por segundo.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loader import load_lambda, quiet, sqs_event  # noqa: E402
+from pdfgen import make_invoice_pdf  # noqa: E402
+from stubs import FakeDynamoDB, FakeS3, FakeSQS  # noqa: E402
+
+BUCKET = "facturas"
+MAX_RECEIVES = 5  # después de esto el mensaje iría a la DLQ
+
+
+class Recorder:
+    """Latencias (ms) por etapa, seguro para usar desde varios threads."""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, ms):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(ms)
+
+    def time(self, stage, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.add(stage, (time.perf_counter() - start) * 1000)
+
+    def summary(self):
+        return {stage: percentiles(values) for stage, values in self.samples.items()}
+
+
+def percentiles(values):
+    values = sorted(values)
+    if len(values) == 1:
+        p50 = p95 = p99 = values[0]
+    else:
+        cuts = statistics.quantiles(values, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    return {"count": len(values), "p50_ms": round(p50, 2), "p95_ms": round(p95, 2), "p99_ms": round(p99, 2)}
+
+
+def build_corpus(count, pages, seed):
+    """PDFs del corpus; la cantidad de páginas de cada uno sale de la distribución `pages`."""
+    rng = random.Random(seed)
+    return [make_invoice_pdf(seed=seed + i, pages=rng.choice(pages)) for i in range(count)]
+
+
+class Pipeline:
+    def __init__(self, args):
+        self.args = args
+        self.s3 = FakeS3(latency=args.s3_latency)
+        self.sqs = FakeSQS(latency=args.sqs_latency)
+        self.dynamodb = FakeDynamoDB(latency=args.ddb_latency)
+        self.recorder = Recorder()
+        self.started_at = {}
+        self.written_at = {}
+        self.dropped = []
+        self.receives = {}
+        self.uploads_done = threading.Event()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _container(self, directory, **patches):
+        """Una instancia del módulo por thread y lambda (un contenedor de Lambda cada uno)."""
+        containers = getattr(self._local, "containers", None)
+        if containers is None:
+            containers = self._local.containers = {}
+        if directory not in containers:
+            containers[directory] = load_lambda(directory, **patches)
+        return containers[directory]
+
+    # --- etapa 1: upload + invoice-processor ---
+    def upload(self, index, user, pdf):
+        presign = self._container("lambda-presigned-url-generator", s3=self.s3)
+        processor = self._container("lambda-invoice-processor", s3=self.s3, sqs=self.sqs)
+        event = {
+            "requestContext": {"authorizer": {"jwt": {"claims": {"sub": user}}}},
+            "body": json.dumps({"fileName": f"factura{index}"}),
+        }
+        start = time.perf_counter()
+        response = self.recorder.time("presign", presign.handler, event, None)
+        key = f"{user}/{json.loads(response['body'])['file_key']}"
+        with self._lock:
+            self.started_at[key] = start
+        etag = self.recorder.time("s3_put", lambda: self.s3.put_object(Bucket=BUCKET, Key=key, Body=pdf)["ETag"])
+        record = {
+            "eventSource": "aws:s3",
+            "s3": {"bucket": {"name": BUCKET}, "object": {"key": key, "size": len(pdf), "eTag": etag}},
+        }
+        self.recorder.time("invoice_processor", processor.handler, {"Records": [record]}, None)
+
+    # --- etapa 2: event source mapping SQS -> database-writer ---
+    def writer_loop(self):
+        writer = self._container("lambda-database-writer", s3=self.s3, dynamodb=self.dynamodb)
+        while True:
+            messages = self.sqs.receive_batch(self.args.sqs_batch)
+            if not messages:
+                if self.uploads_done.is_set() and not self.sqs.messages:
+                    return
+                time.sleep(0.001)
+                continue
+            event = sqs_event([message["body"] for message in messages])
+            result = self.recorder.time("database_writer", writer.handler, event, None)
+            failed = {failure["itemIdentifier"] for failure in result.get("batchItemFailures", [])}
+            retry = []
+            now = time.perf_counter()
+            for index, message in enumerate(messages):
+                key = json.loads(message["body"])["key"]
+                if f"msg-{index}" not in failed:
+                    with self._lock:
+                        self.written_at.setdefault(key, now)
+                    continue
+                with self._lock:
+                    receives = self.receives[key] = self.receives.get(key, 0) + 1
+                    if receives >= MAX_RECEIVES:
+                        self.dropped.append(key)
+                        continue
+                retry.append(message)
+            if retry:
+                self.sqs.requeue(retry)
+
+    # --- etapa 3: lecturas de la API ---
+    def read_user(self, user, keys):
+        getter = self._container("lambda-invoice-getter", dynamodb=self.dynamodb)
+        report = self._container("lambda-report-generator", dynamodb=self.dynamodb)
+        query = {"username": user}
+        while True:
+            response = self.recorder.time("invoice_getter", getter.handler, {"queryStringParameters": query}, None)
+            next_token = json.loads(response["body"]).get("next_token")
+            if not next_token:
+                break
+            query = {"username": user, "next_token": next_token}
+        for key in keys:
+            self.recorder.time("report_single", report.handler, {"queryStringParameters": {"username": user, "file_key": key}}, None)
+        self.recorder.time("report_summary", report.handler, {"queryStringParameters": {"username": user, "view": "summary"}}, None)
+
+    def run(self, corpus):
+        args = self.args
+        users = [f"user-{n}" for n in range(args.users)]
+        start = time.perf_counter()
+        with quiet(), ThreadPoolExecutor(max_workers=args.writers) as writers:
+            writer_futures = [writers.submit(self.writer_loop) for _ in range(args.writers)]
+            with ThreadPoolExecutor(max_workers=args.concurrency) as uploads:
+                futures = [
+                    uploads.submit(self.upload, index, users[index % len(users)], pdf)
+                    for index, pdf in enumerate(corpus)
+                ]
+                for future in futures:
+                    future.result()
+            self.uploads_done.set()
+            for future in writer_futures:
+                future.result()
+        ingest_s = time.perf_counter() - start
+
+        keys_by_user = {}
+        for key in self.written_at:
+            keys_by_user.setdefault(key.split("/", 1)[0], []).append(key)
+        read_start = time.perf_counter()
+        with quiet(), ThreadPoolExecutor(max_workers=args.concurrency) as readers:
+            for future in [
+                readers.submit(self.read_user, user, keys[:args.reads_per_user])
+                for user, keys in keys_by_user.items()
+            ]:
+                future.result()
+        read_s = time.perf_counter() - read_start
+
+        end_to_end = [(self.written_at[key] - self.started_at[key]) * 1000 for key in self.written_at]
+        return {
+            "invoices": len(corpus),
+            "written": len(self.written_at),
+            "dropped": len(self.dropped),
+            "concurrency": args.concurrency,
+            "writers": args.writers,
+            "ingest_s": round(ingest_s, 2),
+            "invoices_per_s": round(len(self.written_at) / ingest_s, 1),
+            "reads_s": round(read_s, 2),
+            "end_to_end": percentiles(end_to_end) if end_to_end else None,
+            "stages": self.recorder.summary(),
+            "calls": {"s3": self.s3.calls, "sqs": self.sqs.calls, "dynamodb_batch": self.dynamodb.calls},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=500)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8, help="uploads/lecturas en paralelo")
+    parser.add_argument("--writers", type=int, default=4, help="invocaciones concurrentes de database-writer")
+    parser.add_argument("--sqs-batch", type=int, default=10, help="batch_size del event source mapping")
+    parser.add_argument("--pages", default="1,1,1,2,5", help="distribución de páginas por PDF")
+    parser.add_argument("--reads-per-user", type=int, default=20)
+    parser.add_argument("--s3-latency", type=float, default=0.01)
+    parser.add_argument("--sqs-latency", type=float, default=0.005)
+    parser.add_argument("--ddb-latency", type=float, default=0.005)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.invoices, [int(p) for p in args.pages.split(",")], args.seed)
+    print(json.dumps(Pipeline(args).run(corpus), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: encolado de invoice-processor para eventos de S3 de 1, 10 y 100 records.
+
+    python bench/bench_processor_fanout.py [--records 1,10,100] [--sqs-latency 0.01]
+
+Compara el camino anterior (un cliente de SQS por invocación y un
+send_message por record) con SendMessageBatch de a 10 más la validación
+previa (tamaño del evento + GET por rango de la firma %PDF). Un 10 % de los
+objetos son inválidos (vacíos o no PDF) y no deberían llegar a la cola.
+
+Con --fail-rate las entradas de SendMessageBatch fallan con esa
+probabilidad; las que siguen sin encolarse después de los reintentos hacen
+que el handler levante EnqueueError (S3 lo invoca en forma asíncrona, así
+Lambda reintenta el evento).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loader import load_lambda, quiet  # noqa: E402
+from pdfgen import make_invoice_pdf  # noqa: E402
+from stubs import FakeS3, FakeSQS  # noqa: E402
+
+BUCKET = "facturas"
+
+
+def s3_event(s3, count):
+    records = []
+    pdf = make_invoice_pdf(seed=1)
+    for i in range(count):
+        key = f"user-1/{i:05d}_factura.pdf"
+        if i % 10 == 9:
+            body = b"" if i % 20 == 19 else b"<html>no es un pdf</html>" * 10
+        else:
+            body = pdf
+        s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+        records.append({
+            "eventSource": "aws:s3",
+            "s3": {"bucket": {"name": BUCKET}, "object": {"key": key, "size": len(body), "eTag": f"etag-{i}"}},
+        })
+    return {"Records": records}
+
+
+def legacy_enqueue(event, sqs, client_latency):
+    """Lo que hacía el handler antes: cliente nuevo y un send_message por record."""
+    time.sleep(client_latency)
+    for record in event["Records"]:
+        sqs.send_message(QueueUrl="https://sqs.local/queue", MessageBody=json.dumps({"key": record["s3"]["object"]["key"]}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", default="1,10,100")
+    parser.add_argument("--sqs-latency", type=float, default=0.01)
+    parser.add_argument("--s3-latency", type=float, default=0.01)
+    # Crear un cliente de boto3 cuesta decenas de ms (ver bench_cold_start.py)
+    parser.add_argument("--client-latency", type=float, default=0.05)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    for count in (int(c) for c in args.records.split(",")):
+        s3 = FakeS3(latency=args.s3_latency)
+        event = s3_event(s3, count)
+
+        legacy_sqs = FakeSQS(latency=args.sqs_latency)
+        start = time.perf_counter()
+        legacy_enqueue(event, legacy_sqs, args.client_latency)
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        sqs = FakeSQS(latency=args.sqs_latency, fail_rate=args.fail_rate)
+        processor = load_lambda("lambda-invoice-processor", sqs=sqs, s3=s3)
+        s3.calls = 0
+        start = time.perf_counter()
+        failed = []
+        with quiet():
+            try:
+                body = json.loads(processor.handler(event, None)["body"])
+            except processor.EnqueueError as e:
+                body, failed = {}, e.failed
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        print(json.dumps({
+            "records": count,
+            "legacy_sqs_calls": legacy_sqs.calls,
+            "legacy_ms": round(legacy_ms, 1),
+            "sqs_calls": sqs.calls,
+            "s3_range_gets": s3.calls,
+            "enqueue_ms": round(elapsed_ms, 1),
+            "enqueued": len(sqs.messages),
+            "rejected": len(body.get("rejected_files", [])),
+            "failed": len(failed),
+            "raised": bool(failed),
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: latencia del reporte de una factura (file_key) según el tamaño de la cuenta.
+
+    python bench/bench_report_lookup.py [--sizes 10,1000,10000] [--ddb-latency 0.005]
+
+Compara el camino anterior (query de todas las facturas del usuario por
+GSI_User_Group, página por página, y filtro en Python) con el GetItem directo
+sobre PK/SK, y con un BatchGetItem de 50 facturas.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_export import populate  # noqa: E402
+from loader import load_lambda, quiet  # noqa: E402
+from stubs import FakeDynamoDB  # noqa: E402
+
+
+def legacy_lookup(report, username, file_key):
+    """Query paginada de todo el usuario + filtro en Python."""
+    from boto3.dynamodb.conditions import Key
+
+    table = report.dynamodb.Table(report.TABLE)
+    kwargs = {"IndexName": report.INDEX_NAME, "KeyConditionExpression": Key("userId").eq(username)}
+    while True:
+        response = table.query(**kwargs)
+        for item in response.get("Items", []):
+            if item.get("file_key") == file_key:
+                return item
+        if not response.get("LastEvaluatedKey"):
+            return None
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,1000,10000")
+    parser.add_argument("--ddb-latency", type=float, default=0.005)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for count in (int(c) for c in args.sizes.split(",")):
+        dynamodb = FakeDynamoDB(latency=args.ddb_latency)
+        populate(dynamodb.Table("InvoiceJobs"), count)
+        report = load_lambda("lambda-report-generator", dynamodb=dynamodb)
+        # La última factura es el peor caso para el filtro en Python
+        target = f"user-1/{count - 1:06d}_factura.pdf"
+        batch = ",".join(f"user-1/{i:06d}_factura.pdf" for i in range(0, count, max(1, count // 50)))
+        event = {"queryStringParameters": {"username": "user-1", "file_key": target}}
+        batch_event = {"queryStringParameters": {"username": "user-1", "file_keys": batch}}
+        with quiet():
+            result = {
+                "invoices": count,
+                "legacy_query_ms": timed(lambda: legacy_lookup(report, "user-1", target), args.repeat),
+                "get_item_ms": timed(lambda: report.handler(event, None), args.repeat),
+                "batch_get_50_ms": timed(lambda: report.handler(batch_event, None), args.repeat),
+            }
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
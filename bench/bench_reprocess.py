@@ -0,0 +1,148 @@
+"""
+Benchmark: reprocesamiento de los PDFs ya subidos con tools/reprocess_uploads.py.
+
+    python bench/bench_reprocess.py [--invoices 400] [--s3-latency 0.02] [--ddb-latency 0.005]
+
+Sube --invoices PDFs de 4 usuarios, los procesa con database-writer y después
+"envejece" un tercio de las facturas (sin proveedor ni CUIT, como las dejaba
+un parser anterior), con los agregados recalculados. Sobre esa tabla mide:
+
+- dry-run: cuántas facturas cambiarían, sin escribir nada;
+- --apply con 1 y 8 workers (facturas por segundo), y con --user;
+- --max-writes-per-second: escrituras por segundo con y sin límite;
+- una corrida que se corta después del tercer batch y se retoma con el
+  checkpoint.
+
+Cada corrida con --apply se verifica con otro dry-run (no queda nada por
+cambiar) y con rebuild_aggregates (agregados sin desvío).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "tools"))
+
+from loader import load_lambda, quiet, sqs_event  # noqa: E402
+from pdfgen import make_invoice_pdf  # noqa: E402
+from stubs import FakeDynamoDB, FakeS3  # noqa: E402
+from lambda_runtime import invoice_keys  # noqa: E402
+import rebuild_aggregates  # noqa: E402
+import reprocess_uploads  # noqa: E402
+
+BUCKET = "facturas"
+USERS = [f"user-{n}" for n in range(1, 5)]
+
+
+def setup(args):
+    s3 = FakeS3(latency=args.s3_latency)
+    dynamodb = FakeDynamoDB(latency=args.ddb_latency)
+    writer = load_lambda("lambda-database-writer", env={"METRICS_ENABLED": "false"}, s3=s3, dynamodb=dynamodb)
+    bodies = []
+    for i in range(args.invoices):
+        user = USERS[i % len(USERS)]
+        key = f"{user}/{i:05d}_factura.pdf"
+        etag = s3.put_object(Bucket=BUCKET, Key=key, Body=make_invoice_pdf(seed=i))["ETag"]
+        bodies.append(json.dumps({"bucket": BUCKET, "key": key, "userId": user, "etag": etag}))
+    # Objetos que no son facturas: no se tienen que listar
+    s3.put_object(Bucket=BUCKET, Key="exports/user-1/export.csv", Body=b"fecha,total\n")
+    s3.put_object(Bucket=BUCKET, Key="sin-usuario.pdf", Body=make_invoice_pdf(seed=0))
+    with quiet():
+        for offset in range(0, len(bodies), 50):
+            writer.handler(sqs_event(bodies[offset:offset + 50]), None)
+
+    table = dynamodb.Table(writer.TABLE)
+    stale = 0
+    for (pk, sk), item in list(table.items.items()):
+        if sk != "META#1" or int(pk.split("/")[1][:5]) % 3:
+            continue
+        data = {name: value for name, value in item["data"].items() if name not in ("proveedor", "cuit")}
+        table.store({**{name: value for name, value in item.items() if name not in invoice_keys.KEY_FIELDS},
+                     **invoice_keys.access_keys(item["userId"], pk, data), "data": data})
+        stale += 1
+    rebuild_aggregates.rebuild(table, write=True)
+    return writer, table, stale
+
+
+def run(writer, **kwargs):
+    with quiet() as out:
+        summary = reprocess_uploads.reprocess(writer, BUCKET, out=out, log=out, **kwargs)
+    return summary
+
+
+def verify(writer, table):
+    pending = run(writer, force=True)["changed"]
+    _, differences = rebuild_aggregates.rebuild(table)
+    return {"pending_after": pending, "aggregate_drift": len(differences)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=400)
+    parser.add_argument("--s3-latency", type=float, default=0.02)
+    parser.add_argument("--ddb-latency", type=float, default=0.005)
+    args = parser.parse_args()
+    workdir = tempfile.mkdtemp()
+
+    writer, table, stale = setup(args)
+    before = {key: dict(item) for key, item in table.items.items()}
+    dry_run = run(writer, force=True)
+    print(json.dumps({
+        "mode": "dry_run", "stale": stale, "invoices": dry_run["invoices"], "changed": dry_run["changed"],
+        "ddb_writes": dry_run["ddb_writes"], "table_unchanged": table.items == before,
+        "invoices_per_s": dry_run["invoices_per_s"],
+    }))
+
+    for workers in (1, 8):
+        writer, table, _ = setup(args)
+        summary = run(writer, workers=workers, force=True, apply=True,
+                      checkpoint_path=os.path.join(workdir, f"workers-{workers}.json"))
+        print(json.dumps({"mode": "apply", "workers": workers, "invoices": summary["invoices"],
+                          "failed": summary["failed"], "invoices_per_s": summary["invoices_per_s"], **verify(writer, table)}))
+
+    writer, table, _ = setup(args)
+    summary = run(writer, user="user-2", force=True, apply=True, checkpoint_path=os.path.join(workdir, "user.json"))
+    print(json.dumps({"mode": "apply", "user": "user-2", "invoices": summary["invoices"],
+                      "expected": sum(1 for i in range(args.invoices) if USERS[i % len(USERS)] == "user-2")}))
+
+    for rate in (None, 1000):
+        writer, table, _ = setup(args)
+        summary = run(writer, force=True, apply=True, max_writes_per_second=rate,
+                      checkpoint_path=os.path.join(workdir, f"rate-{rate}.json"))
+        print(json.dumps({"mode": "apply", "max_writes_per_second": rate, "ddb_writes": summary["ddb_writes"],
+                          "writes_per_s": round(summary["ddb_writes"] / summary["seconds"], 1),
+                          "invoices_per_s": summary["invoices_per_s"]}))
+
+    # Corte después de escribir el tercer batch, antes de guardar su checkpoint
+    writer, table, _ = setup(args)
+    checkpoint = os.path.join(workdir, "interrupted.json")
+    handler, calls = writer.handler, []
+
+    def interrupted(event, context):
+        calls.append(len(event["Records"]))
+        response = handler(event, context)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return response
+
+    writer.handler = interrupted
+    try:
+        run(writer, force=True, apply=True, checkpoint_path=checkpoint)
+    except KeyboardInterrupt:
+        pass
+    first = len(calls)
+    resumed = run(writer, force=True, apply=True, checkpoint_path=checkpoint)
+    again = run(writer, force=True, apply=True, checkpoint_path=checkpoint)
+    writer.handler = handler
+    print(json.dumps({
+        "mode": "resume", "batches_before_cut": first, "batches_after": len(calls) - first,
+        "invoices_resumed": resumed["invoices"], "total_invoices": resumed["total_invoices"],
+        "rerun_after_done": again["invoices"], **verify(writer, table),
+    }))
+
+
+if __name__ == "__main__":
+    main()
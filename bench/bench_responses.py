@@ -0,0 +1,186 @@
+"""
+Benchmark: serialización y compresión negociada de las respuestas JSON.
+
+    python bench/bench_responses.py [--sizes 10,100,1000,5000] [--runs 20] [--mbps 5]
+
+Arma el listado de report-generator (facturas con Decimal, como las devuelve
+DynamoDB) con --sizes facturas y compara:
+
+- serialización: json.dumps después de convert_decimal recursivo (lo que
+  hacía invoice-data-updater) y json.dumps con default (report-generator)
+  contra el encoder de lambda_runtime.responses (una pasada, compacto);
+- bytes en la red sin compresión, con gzip y con brotli (si está instalado),
+  el tiempo de comprimir y el de transferir a --mbps (red móvil).
+
+Después llama a report-generator e invoice-data-getter con y sin
+Accept-Encoding y verifica que el body descomprimido sea el mismo JSON y que
+las respuestas chicas no se compriman.
+"""
+import argparse
+import base64
+import gzip
+import json
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loader import load_lambda, quiet  # noqa: E402
+from stubs import FakeDynamoDB  # noqa: E402
+from lambda_runtime import invoice_keys, responses  # noqa: E402
+
+USER = "user-1"
+SUPPLIERS = [(f"PROVEEDOR {n:02d} S.R.L.", f"30-{71000000 + n * 7919:08d}-{n % 10}") for n in range(40)]
+
+
+def populate(table, count, seed=1):
+    rng = random.Random(seed)
+    for i in range(count):
+        key = f"{USER}/{rng.getrandbits(64):016x}_factura_{i:05d}.pdf"
+        proveedor, cuit = rng.choice(SUPPLIERS)
+        data = {
+            "fecha": f"{rng.choice((2024, 2025))}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "proveedor": proveedor,
+            "total": f"{rng.randint(100, 900000)}.{rng.randint(0, 99):02d}",
+            "cuit": cuit,
+            "file_size": Decimal(rng.randint(12000, 400000)),
+            "text_length": Decimal(rng.randint(400, 6000)),
+        }
+        table.store({"PK": key, "SK": "META#1", "file_key": key, "userId": USER,
+                     **invoice_keys.access_keys(USER, key, data), "data": data})
+
+
+def convert_decimal(obj):
+    """El recorrido que hacía invoice-data-updater antes de json.dumps."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, dict):
+        return {k: convert_decimal(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [convert_decimal(item) for item in obj]
+    return obj
+
+
+def _default_str(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError
+
+
+SERIALIZERS = {
+    "convert_decimal+dumps": lambda payload: json.dumps(convert_decimal(payload)),
+    "dumps_default": lambda payload: json.dumps(payload, ensure_ascii=False, default=_default_str),
+    "responses.dumps": lambda payload: responses.dumps(payload),
+    "responses.dumps_float": lambda payload: responses.dumps(payload, decimal=float),
+}
+
+
+def best_ms(runs, fn):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def event(query=None, accept_encoding=None):
+    headers = {"accept-encoding": accept_encoding} if accept_encoding else {}
+    return {
+        "requestContext": {"authorizer": {"jwt": {"claims": {"cognito:username": USER}}}},
+        "queryStringParameters": query,
+        "headers": headers,
+    }
+
+
+def decoded(response):
+    body = response["body"]
+    if not response.get("isBase64Encoded"):
+        return body.encode("utf-8")
+    raw = base64.b64decode(body)
+    if response["headers"].get("Content-Encoding") == "br":
+        return responses.brotli.decompress(raw)
+    return gzip.decompress(raw)
+
+
+def run(args, count):
+    dynamodb = FakeDynamoDB()
+    report = load_lambda("lambda-report-generator", dynamodb=dynamodb)
+    populate(dynamodb.Table(report.TABLE), count)
+    table = dynamodb.Table(report.TABLE)
+    items, query_kwargs = [], invoice_keys.query_kwargs(USER, user_index=report.INDEX_NAME)
+    while True:
+        page = table.query(**query_kwargs)
+        items.extend(page["Items"])
+        if not page.get("LastEvaluatedKey"):
+            break
+        query_kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+    payload = {
+        "username": USER,
+        "facturas": [
+            {name: item["data"].get(name) for name in ("fecha", "total", "proveedor", "cuit", "text_length", "file_size")}
+            for item in items
+        ],
+    }
+
+    serialize_ms = {}
+    for name, serializer in SERIALIZERS.items():
+        _, serialize_ms[name] = best_ms(args.runs, lambda: serializer(payload))
+    raw = responses.dumps(payload).encode("utf-8")
+    wire = {"identity": len(raw)}
+    compress_ms = {}
+    encodings = ["gzip"] + (["br"] if responses.brotli is not None else [])
+    for encoding in encodings:
+        compressed, compress_ms[encoding] = best_ms(args.runs, lambda: responses.compress(raw, encoding))
+        wire[encoding] = len(compressed)
+    print(json.dumps({
+        "invoices": count,
+        "serialize_ms": {name: round(ms, 3) for name, ms in serialize_ms.items()},
+        "legacy_bytes": len(json.dumps(payload, default=_default_str).encode("utf-8")),
+        "wire_bytes": wire,
+        "compress_ms": {name: round(ms, 3) for name, ms in compress_ms.items()},
+        "transfer_ms": {name: round(size * 8 / (args.mbps * 1000), 1) for name, size in wire.items()},
+    }))
+
+
+def check():
+    dynamodb = FakeDynamoDB()
+    report = load_lambda("lambda-report-generator", dynamodb=dynamodb)
+    getter = load_lambda("lambda-invoice-getter", dynamodb=dynamodb)
+    populate(dynamodb.Table(report.TABLE), 300)
+    results = {}
+    for name, module, query in (("report", report, None), ("list", getter, {"limit": "300"}), ("single", getter, {"limit": "1"})):
+        with quiet():
+            plain = module.handler(event(query), None)
+            by_encoding = {
+                accept: module.handler(event(query, accept), None)
+                for accept in ("gzip", "br;q=1.0, gzip;q=0.8", "gzip;q=0, identity")
+            }
+        results[name] = {
+            accept: response["headers"].get("Content-Encoding")
+            for accept, response in by_encoding.items()
+        }
+        results[name]["same_json"] = all(
+            json.loads(decoded(response)) == json.loads(plain["body"]) for response in by_encoding.values()
+        )
+        results[name]["vary"] = all(response["headers"].get("Vary") == "Accept-Encoding" for response in by_encoding.values())
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,100,1000,5000")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--mbps", type=float, default=5)
+    args = parser.parse_args()
+    check()
+    for count in (int(n) for n in args.sizes.split(",")):
+        run(args, count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Benchmark: búsqueda por texto con el índice invertido vs volver a extraer los PDFs.
+
+    python bench/bench_search.py [--invoices 10000] [--ddb-latency 0.005] [--sample 100]
+
+Carga --invoices facturas de un usuario con sus postings (text_index, como los
+escribe database-writer) y mide invoice-search con términos raros y comunes,
+varias palabras, CUIT y prefijos. Cada resultado se compara con una búsqueda
+por fuerza bruta sobre los textos. La alternativa sin índice (descargar y
+extraer cada PDF) se estima extrayendo --sample PDFs y extrapolando.
+
+El stand-in de DynamoDB recorre todos los items en cada query; acá la tabla
+resuelve begins_with sobre la partición del índice con búsqueda binaria, como
+DynamoDB con el sort key, así la latencia medida es la de la lambda más
+--ddb-latency por llamada.
+
+Al final procesa unas facturas con database-writer (incluido un hit del cache
+de extracción) y verifica que invoice-search las encuentre y que el texto
+quede comprimido en S3, y que al reprocesar una factura con otro texto
+se borren los postings de los términos que ya no tiene.
+"""
+import argparse
+import bisect
+import copy
+import gzip
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loader import load_lambda, quiet, sqs_event  # noqa: E402
+from pdfgen import PROVEEDORES, invoice_lines, make_invoice_pdf, make_pdf  # noqa: E402
+from stubs import FakeDynamoDB, FakeS3, FakeTable  # noqa: E402
+from lambda_runtime import etags, text_index  # noqa: E402
+
+USER = "user-1"
+BUCKET = "facturas"
+
+
+class IndexedTable(FakeTable):
+    """FakeTable que resuelve las queries al índice con bisect sobre los SK ordenados."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._partitions = {}
+
+    def store(self, item):
+        super().store(item)
+        self._partitions.pop(item["PK"], None)
+
+    def discard(self, key):
+        super().discard(key)
+        self._partitions.pop(key["PK"], None)
+
+    def _sorted_keys(self, pk):
+        if pk not in self._partitions:
+            self._partitions[pk] = sorted(sk for (hash_key, sk) in self.items if hash_key == pk)
+        return self._partitions[pk]
+
+    def query(self, KeyConditionExpression, IndexName=None, Limit=None, ExclusiveStartKey=None, **kwargs):
+        values = KeyConditionExpression.get_expression()["values"]
+        pk_condition, sk_condition = (value.get_expression() for value in values) if len(values) == 2 else (None, None)
+        if IndexName or not sk_condition or sk_condition["operator"] != "begins_with":
+            return super().query(KeyConditionExpression, IndexName, Limit, ExclusiveStartKey, **kwargs)
+        self._call()
+        pk, prefix = pk_condition["values"][1], sk_condition["values"][1]
+        keys = self._sorted_keys(pk)
+        start = bisect.bisect_right(keys, ExclusiveStartKey["SK"]) if ExclusiveStartKey else bisect.bisect_left(keys, prefix)
+        page = self.page_size if Limit is None else min(Limit, self.page_size)
+        found = []
+        for sk in keys[start:start + page + 1]:
+            if not sk.startswith(prefix):
+                break
+            found.append(self.items[(pk, sk)])
+        response = {}
+        if len(found) > page:
+            found = found[:page]
+            response["LastEvaluatedKey"] = {"PK": pk, "SK": found[-1]["SK"]}
+        projection = kwargs.get("ProjectionExpression")
+        if projection:
+            fields = [field.strip() for field in projection.split(",")]
+            found = [{field: item[field] for field in fields if field in item} for item in found]
+        response["Items"] = copy.deepcopy(found)
+        response["Count"] = len(found)
+        return response
+
+
+class IndexedDynamoDB(FakeDynamoDB):
+    def Table(self, name):
+        if name not in self.tables:
+            self.tables[name] = IndexedTable(name, latency=self.latency)
+        return self.tables[name]
+
+
+def vocabulary(rng, size=2000):
+    syllables = ["ca", "fe", "to", "mar", "lin", "ga", "ro", "sen", "pa", "dor", "ti", "lu", "ve", "cion", "al"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def invoice_text(rng, words, weights):
+    """Texto de una factura: encabezado de pdfgen más productos con frecuencia tipo Zipf."""
+    lines = invoice_lines(rng)
+    lines += [f"Producto {' '.join(rng.choices(words, weights, k=2))}" for _ in range(8)]
+    return lines
+
+
+def api_event(q, user=USER, **query):
+    return {
+        "requestContext": {"authorizer": {"jwt": {"claims": {"cognito:username": user}}}},
+        "queryStringParameters": {"q": q, **query},
+        "headers": {},
+    }
+
+
+def brute_force(texts, q):
+    """Claves que matchean la consulta recorriendo todos los textos."""
+    parsed = text_index.parse_query(q)
+    found = []
+    for key, text in texts.items():
+        invoice_terms = set(text_index.terms(text, limit=0))
+        if all(term in invoice_terms if not is_prefix else any(t.startswith(term) for t in invoice_terms)
+               for term, is_prefix in parsed):
+            found.append(key)
+    return sorted(found)
+
+
+def populate(table, count, seed=1):
+    rng = random.Random(seed)
+    words = vocabulary(rng)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    texts = {}
+    for i in range(count):
+        key = f"{USER}/{i:06d}_factura.pdf"
+        text = "\n".join(invoice_text(rng, words, weights))
+        texts[key] = text
+        table.store({
+            "PK": key, "SK": "META#1", "file_key": key, "userId": USER, "groupKey": "group_key",
+            "data": {"text_key": f"text/{key}.txt.gz", "text_length": len(text)},
+        })
+        for posting in text_index.postings(USER, key, text_index.terms(text)):
+            table.store(posting)
+    return texts, words
+
+
+def reextract_ms_per_invoice(sample):
+    """ms por factura de extraer y tokenizar el PDF (lo que costaría buscar sin índice)."""
+    writer = load_lambda("lambda-database-writer")
+    extraction = writer.extraction
+    pdfs = [make_invoice_pdf(seed=i) for i in range(sample)]
+    start = time.perf_counter()
+    for pdf in pdfs:
+        text_index.terms(extraction.extract_text(io.BytesIO(pdf), mode=extraction.MODE_FULL).text)
+    return (time.perf_counter() - start) * 1000 / sample
+
+
+def check_writer():
+    """database-writer guarda el texto e indexa; invoice-search encuentra las facturas."""
+    s3 = FakeS3()
+    dynamodb = IndexedDynamoDB()
+    writer = load_lambda("lambda-database-writer", s3=s3, dynamodb=dynamodb)
+    search = load_lambda("lambda-invoice-search", dynamodb=dynamodb)
+    bodies = []
+    expected = {}
+    for i in range(20):
+        key = f"{USER}/w{i:03d}_factura.pdf"
+        rng = random.Random(i)
+        lines = invoice_lines(rng)
+        proveedor = lines[1].split(": ", 1)[1]
+        expected.setdefault(proveedor, []).append(key)
+        pdf = make_pdf([lines])
+        etag = s3.put_object(Bucket=BUCKET, Key=key, Body=pdf)["ETag"]
+        bodies.append(json.dumps({"bucket": BUCKET, "key": key, "userId": USER, "etag": etag}))
+    # Mismo PDF que w000 subido por otro usuario: hit del cache de extracción en un segundo batch
+    copy_user = "user-2"
+    copy_key = f"{copy_user}/copia_factura.pdf"
+    pdf = s3.objects[(BUCKET, f"{USER}/w000_factura.pdf")]
+    etag = s3.put_object(Bucket=BUCKET, Key=copy_key, Body=pdf)["ETag"]
+    with quiet():
+        failures = writer.handler(sqs_event(bodies), None)["batchItemFailures"]
+        failures += writer.handler(sqs_event([json.dumps({"bucket": BUCKET, "key": copy_key, "userId": copy_user, "etag": etag})]), None)["batchItemFailures"]
+    copy_proveedor = invoice_lines(random.Random(0))[1].split(": ", 1)[1]
+
+    etags.SETTLE_SECONDS = 0
+    found_ok = True
+    for proveedor, keys in expected.items():
+        with quiet():
+            body = json.loads(search.handler(api_event(proveedor), None)["body"])
+        found_ok &= sorted(f["file_key"] for f in body["facturas"]) == sorted(keys)
+    with quiet():
+        body = json.loads(search.handler(api_event(copy_proveedor, user=copy_user), None)["body"])
+    found_ok &= [f["file_key"] for f in body["facturas"]] == [copy_key]
+    # El hit no copia el text_key del otro usuario: el texto queda bajo su propio file_key
+    copy_text_key = dynamodb.Table(writer.TABLE).items[(copy_key, "META#1")]["data"].get("text_key")
+
+    # Reproceso con otro contenido (SQS y directo): los postings de los términos viejos se borran
+    table = dynamodb.Table(writer.TABLE)
+    reindexed = {}
+    for i, direct in ((1, False), (2, True)):
+        key = f"{USER}/w{i:03d}_factura.pdf"
+        old_terms = set(table.items[(key, text_index.TERMS_SK)]["terms"])
+        lines = invoice_lines(random.Random(100 + i))
+        etag = s3.put_object(Bucket=BUCKET, Key=key, Body=make_pdf([lines]))["ETag"]
+        message = {"bucket": BUCKET, "key": key, "userId": USER, "etag": etag}
+        with quiet():
+            if direct:
+                status = writer.handler(message, None)["statusCode"]
+            else:
+                status = 200 if not writer.handler(sqs_event([json.dumps(message)]), None)["batchItemFailures"] else 500
+        new_terms = set(table.items[(key, text_index.TERMS_SK)]["terms"])
+        indexed = {sk.split("#", 1)[0] for (pk, sk), item in table.items.items()
+                   if pk.startswith(text_index.INDEX_PREFIX) and item["file_key"] == key}
+        gone = sorted(old_terms - new_terms)[0]
+        with quiet():
+            body = json.loads(search.handler(api_event(gone), None)["body"])
+        reindexed["direct" if direct else "sqs"] = [
+            status, indexed == new_terms, key not in [f["file_key"] for f in body["facturas"]],
+        ]
+
+    text_objects = {key: body for (bucket, key), body in s3.objects.items() if key.startswith(writer.TEXT_PREFIX)}
+    raw = sum(len(gzip.decompress(body)) for body in text_objects.values())
+    return {
+        "check": "writer",
+        "failures": len(failures),
+        "texts_stored": len(text_objects),
+        "text_gzip_ratio": round(sum(len(body) for body in text_objects.values()) / raw, 2),
+        "search_finds_written": found_ok,
+        "reindex_drops_stale": reindexed,
+        "cache_hit_own_text": copy_text_key == f"{writer.TEXT_PREFIX}{copy_key}.txt.gz" and (BUCKET, copy_text_key) in s3.objects,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=10000)
+    parser.add_argument("--ddb-latency", type=float, default=0.005)
+    parser.add_argument("--sample", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    dynamodb = IndexedDynamoDB(latency=args.ddb_latency)
+    table = dynamodb.Table("InvoiceJobs")
+    texts, words = populate(table, args.invoices)
+    postings = len(table.items) - len(texts)
+    partitions = {}
+    for pk, _sk in table.items:
+        if pk.startswith(text_index.INDEX_PREFIX):
+            partitions[pk] = partitions.get(pk, 0) + 1
+    search = load_lambda("lambda-invoice-search", dynamodb=dynamodb)
+    etags.SETTLE_SECONDS = 0
+
+    cuit = next(iter(texts.values())).splitlines()[2].split(": ", 1)[1]
+    queries = {
+        "rare_term": words[-1],
+        "common_term": words[0],
+        "supplier": PROVEEDORES[1].lower(),
+        "two_words": f"{words[0]} {words[1]}",
+        "cuit": cuit,
+        "prefix": words[3][:4] + "*",
+        "broad_prefix": "ar*",
+    }
+    per_invoice_ms = reextract_ms_per_invoice(args.sample)
+    print(json.dumps({
+        "invoices": args.invoices,
+        "postings": postings,
+        "postings_per_invoice": round(postings / args.invoices, 1),
+        "index_partitions": len(partitions),
+        "largest_partition_share": round(max(partitions.values()) / postings, 2),
+        "reextract_estimate_s": round(per_invoice_ms * args.invoices / 1000, 1),
+    }))
+
+    for name, q in queries.items():
+        samples = []
+        calls = table.calls + dynamodb.calls
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            with quiet():
+                response = search.handler(api_event(q, limit="50"), None)
+            samples.append((time.perf_counter() - start) * 1000)
+        body = json.loads(response["body"])
+        result = {
+            "query": name,
+            "q": q,
+            "status": response["statusCode"],
+            "ms": round(statistics.median(samples), 1),
+            "ddb_calls": (table.calls + dynamodb.calls - calls) // args.repeat,
+            "total": body["total"],
+            "truncated": body["truncated"],
+        }
+        if not body["truncated"]:
+            result["matches_brute_force"] = body["total"] == len(brute_force(texts, q))
+        print(json.dumps(result))
+
+    print(json.dumps(check_writer()))
+
+
+if __name__ == "__main__":
+    main()
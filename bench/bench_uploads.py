@@ -0,0 +1,171 @@
+"""
+Benchmark: subida de muchas facturas y de PDFs grandes con presigned-url-generator.
+
+    python bench/bench_uploads.py [--files 300] [--sizes-mb 10,50] [--api-latency 0.08] [--connection-mbps 50]
+
+Carpeta de --files facturas: un POST /uploads/presign por archivo vs un solo
+request con {"files": [...]}. Cada llamada a la API paga --api-latency de
+round trip (browser -> API Gateway -> lambda); el presign en sí es local.
+
+PDFs grandes: un solo POST contra multipart (action=start, PUT de cada parte
+a su presigned URL con 1, 4 y 8 en paralelo, action=complete). Cada conexión
+sube a --connection-mbps, como un browser limitado por el RTT de cada TCP.
+Reporta llamadas a la API, requests a S3 y tiempo, y verifica que el objeto
+armado sea idéntico al archivo y que un ETag incorrecto devuelva 400.
+
+Además verifica los límites: un POST de más de MAX_PDF_BYTES lo rechaza la
+policy, una parte más larga que la firmada también, y un fileName que no es
+string devuelve 400.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loader import load_lambda, quiet  # noqa: E402
+from stubs import FakeClientError, FakeS3  # noqa: E402
+
+USER = "user-1"
+
+
+class Api:
+    """Invoca el handler como API Gateway, sumando el round trip de red."""
+
+    def __init__(self, module, latency):
+        self.module = module
+        self.latency = latency
+        self.calls = 0
+
+    def post(self, body):
+        self.calls += 1
+        time.sleep(self.latency)
+        event = {"requestContext": {"authorizer": {"jwt": {"claims": {"sub": USER}}}}, "body": json.dumps(body)}
+        with quiet():
+            response = self.module.handler(event, None)
+        return response["statusCode"], json.loads(response["body"])
+
+
+def transfer(size, mbps):
+    """Tiempo de subir `size` bytes por una conexión."""
+    time.sleep(size * 8 / (mbps * 1_000_000))
+
+
+def folder(args):
+    for mode in ("one_per_file", "batch"):
+        s3 = FakeS3()
+        api = Api(load_lambda("lambda-presigned-url-generator", s3=s3), args.api_latency)
+        names = [f"factura_{i:04d}" for i in range(args.files)]
+        start = time.perf_counter()
+        if mode == "batch":
+            status, body = api.post({"files": [{"fileName": name} for name in names]})
+            uploads = body["uploads"]
+        else:
+            uploads = [api.post({"fileName": name})[1] for name in names]
+        elapsed = time.perf_counter() - start
+        keys = {upload["upload_url"]["fields"]["key"] for upload in uploads}
+        print(json.dumps({
+            "files": args.files,
+            "mode": mode,
+            "api_calls": api.calls,
+            "s3_requests": s3.calls,
+            "presign_s": round(elapsed, 2),
+            "distinct_keys": len(keys),
+            "all_under_user": all(key.startswith(f"{USER}/") for key in keys),
+        }))
+
+
+def large_file(args, size_mb):
+    content = os.urandom(size_mb * 1024 * 1024)
+
+    s3 = FakeS3()
+    api = Api(load_lambda("lambda-presigned-url-generator", s3=s3), args.api_latency)
+    start = time.perf_counter()
+    _, upload = api.post({"fileName": "escaneo"})
+    transfer(len(content), args.connection_mbps)
+    s3.post_presigned(upload["upload_url"], content)
+    print(json.dumps({
+        "size_mb": size_mb, "mode": "single_post", "api_calls": api.calls, "s3_requests": s3.calls,
+        "elapsed_s": round(time.perf_counter() - start, 2),
+    }))
+
+    for concurrency in (1, 4, 8):
+        s3 = FakeS3()
+        api = Api(load_lambda("lambda-presigned-url-generator", s3=s3), args.api_latency)
+        start = time.perf_counter()
+        _, started = api.post({"action": "start", "fileName": "escaneo", "size": len(content)})
+        part_size = started["part_size"]
+
+        def put(part):
+            body = content[(part["part_number"] - 1) * part_size:part["part_number"] * part_size]
+            transfer(len(body), args.connection_mbps)
+            return {"part_number": part["part_number"], "etag": s3.put_presigned(part["url"], body)}
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            parts = list(pool.map(put, started["parts"]))
+        wrong = [{**parts[0], "etag": '"0"'}] + parts[1:]
+        rejected, _ = api.post({"action": "complete", "file_key": started["file_key"], "upload_id": started["upload_id"], "parts": wrong})
+        status, _ = api.post({"action": "complete", "file_key": started["file_key"], "upload_id": started["upload_id"], "parts": parts})
+        elapsed = time.perf_counter() - start
+        key = f"{USER}/{started['file_key']}"
+        print(json.dumps({
+            "size_mb": size_mb,
+            "mode": "multipart",
+            "concurrency": concurrency,
+            "parts": len(parts),
+            "api_calls": api.calls - 1,  # sin el complete con ETag incorrecto
+            "s3_requests": s3.calls - 1,
+            "elapsed_s": round(elapsed - args.api_latency, 2),
+            "completed": status == 200,
+            "same_content": s3.objects.get(("facturas", key)) == content,
+            "bad_etag_status": rejected,
+        }))
+
+
+def rejected(upload):
+    try:
+        upload()
+    except FakeClientError as e:
+        return e.response["Error"]["Code"]
+    return None
+
+
+def check(args):
+    s3 = FakeS3()
+    module = load_lambda("lambda-presigned-url-generator", s3=s3, MAX_PDF_BYTES=1024 * 1024)
+    api = Api(module, 0)
+    _, upload = api.post({"fileName": "grande"})
+    _, started = api.post({"action": "start", "fileName": "grande", "size": 1000})
+    part = started["parts"][0]
+    print(json.dumps({
+        "check": "limits",
+        "post_over_max": rejected(lambda: s3.post_presigned(upload["upload_url"], b"x" * (1024 * 1024 + 1))),
+        "post_within_max": rejected(lambda: s3.post_presigned(upload["upload_url"], b"x" * 1000)),
+        "part_over_declared": rejected(lambda: s3.put_presigned(part["url"], b"x" * 1001)),
+        "part_as_declared": rejected(lambda: s3.put_presigned(part["url"], b"x" * 1000)),
+        "bad_file_name_status": [
+            api.post({"files": [{"fileName": 12}, {"fileName": {"a": 1}}]})[0],
+            api.post({"fileName": ["a"]})[0],
+            api.post({"action": "start", "fileName": 3, "size": 1000})[0],
+        ],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=300)
+    parser.add_argument("--sizes-mb", default="10,50")
+    parser.add_argument("--api-latency", type=float, default=0.08)
+    parser.add_argument("--connection-mbps", type=float, default=50)
+    args = parser.parse_args()
+    check(args)
+    folder(args)
+    for size_mb in (int(size) for size in args.sizes_mb.split(",")):
+        large_file(args, size_mb)
+
+
+if __name__ == "__main__":
+    main()
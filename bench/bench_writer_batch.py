@@ -0,0 +1,70 @@
+"""
+Benchmark: facturas por segundo de database-writer según el tamaño de batch de SQS.
+
+    python bench/bench_writer_batch.py [--total 200] [--s3-latency 0.02] [--ddb-latency 0.01]
+
+Con batch 1 cada factura paga una invocación completa (descarga + put_item);
+con batches más grandes las descargas se solapan en el pool de threads y las
+escrituras se agrupan en batch_write_item.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loader import load_lambda, quiet, sqs_event  # noqa: E402
+from pdfgen import make_invoice_pdf  # noqa: E402
+from stubs import FakeDynamoDB, FakeS3  # noqa: E402
+
+BUCKET = "facturas"
+
+
+def run(batch_size, total, s3_latency, ddb_latency):
+    s3 = FakeS3(latency=s3_latency)
+    dynamodb = FakeDynamoDB(latency=ddb_latency)
+    writer = load_lambda("lambda-database-writer", s3=s3, dynamodb=dynamodb)
+
+    bodies = []
+    for i in range(total):
+        key = f"user-1/{i:05d}_factura.pdf"
+        etag = s3.put_object(Bucket=BUCKET, Key=key, Body=make_invoice_pdf(seed=i))["ETag"]
+        bodies.append(json.dumps({"bucket": BUCKET, "key": key, "userId": "user-1", "etag": etag}))
+    s3.calls = 0
+
+    failures = 0
+    start = time.perf_counter()
+    with quiet():
+        for offset in range(0, total, batch_size):
+            result = writer.handler(sqs_event(bodies[offset:offset + batch_size]), None)
+            failures += len(result["batchItemFailures"])
+    elapsed = time.perf_counter() - start
+
+    written = sum(1 for (_pk, sk) in dynamodb.Table(writer.TABLE).items if sk == "META#1")
+    return {
+        "batch_size": batch_size,
+        "invocations": -(-total // batch_size),
+        "elapsed_s": round(elapsed, 3),
+        "invoices_per_s": round(total / elapsed, 1),
+        "written": written,
+        "failures": failures,
+        "ddb_batch_calls": dynamodb.calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--total", type=int, default=200)
+    parser.add_argument("--s3-latency", type=float, default=0.02)
+    parser.add_argument("--ddb-latency", type=float, default=0.01)
+    parser.add_argument("--batch-sizes", default="1,10,100")
+    args = parser.parse_args()
+
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        print(json.dumps(run(batch_size, args.total, args.s3_latency, args.ddb_latency)))
+
+
+if __name__ == "__main__":
+    main()
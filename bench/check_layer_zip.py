@@ -0,0 +1,65 @@
+"""
+Verificación de src/lambda-layer.zip contra las fuentes del layer.
+
+    python bench/check_layer_zip.py [--zip src/lambda-layer.zip]
+
+Comprueba que cada módulo de src/lambda-layer/python/lambda_runtime esté en
+el zip con el mismo contenido (y que el zip no traiga módulos que ya no
+existen) y que sigan las dependencias que el layer provee a las lambdas
+(DEPENDENCIES). Sale con código 1 si algo no coincide: correrlo antes de
+cada commit que toque el layer.
+"""
+import argparse
+import json
+import os
+import sys
+import zipfile
+
+LAYER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "lambda-layer")
+PACKAGE = "python/lambda_runtime/"
+# Paquetes que las lambdas importan del layer (requests para lambda-cognito-hook)
+DEPENDENCIES = ("requests", "urllib3", "idna", "certifi", "charset_normalizer")
+
+
+def check(zip_path):
+    """Devuelve la lista de problemas del zip (vacía si coincide con las fuentes)."""
+    problems = []
+    with zipfile.ZipFile(zip_path) as archive:
+        names = set(archive.namelist())
+        sources = set()
+        for root, dirs, files in os.walk(os.path.join(LAYER_DIR, PACKAGE)):
+            dirs[:] = [d for d in dirs if d != "__pycache__"]
+            for filename in files:
+                if not filename.endswith(".py"):
+                    continue
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, LAYER_DIR).replace(os.sep, "/")
+                sources.add(name)
+                if name not in names:
+                    problems.append(f"{name} falta en el zip")
+                    continue
+                with open(path, "rb") as f:
+                    if archive.read(name) != f.read():
+                        problems.append(f"{name} no coincide con la fuente")
+        for name in sorted(names):
+            if name.startswith(PACKAGE) and name.endswith(".py") and name not in sources:
+                problems.append(f"{name} está en el zip pero no en las fuentes")
+        for package in DEPENDENCIES:
+            if f"python/{package}/__init__.py" not in names:
+                problems.append(f"falta la dependencia {package}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--zip", default=os.path.join(os.path.dirname(LAYER_DIR), "lambda-layer.zip"))
+    args = parser.parse_args()
+
+    problems = check(args.zip)
+    print(json.dumps({"zip": os.path.relpath(args.zip), "problems": problems}, ensure_ascii=False))
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
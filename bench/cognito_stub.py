@@ -0,0 +1,178 @@
+"""
+Stand-in local de Cognito para lambda-cognito-hook: un servidor HTTP con
+/oauth2/token (intercambio de code por tokens) y /.well-known/jwks.json.
+
+Los ID tokens se firman con RS256 usando claves RSA generadas en Python puro.
+`handshake_latency` simula el costo de abrir una conexión nueva (el handshake
+TLS contra el dominio real), que se paga una vez por conexión y no por request.
+"""
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+import socket
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SHA256_DIGEST_INFO = bytes.fromhex("3031300d060960864801650304020105000420")
+
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _int_b64url(value):
+    return _b64url(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+def _is_probable_prime(n, rng, rounds=25):
+    if n < 4:
+        return n in (2, 3)
+    for p in (3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37):
+        if n % p == 0:
+            return n == p
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for _ in range(rounds):
+        x = pow(rng.randrange(2, n - 2), d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(s - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _prime(bits, rng):
+    while True:
+        candidate = rng.getrandbits(bits) | (1 << (bits - 1)) | 1
+        if _is_probable_prime(candidate, rng):
+            return candidate
+
+
+class RSAKey:
+    def __init__(self, kid, bits=2048, seed=None):
+        rng = random.Random(seed)
+        self.kid = kid
+        self.e = 65537
+        while True:
+            p, q = _prime(bits // 2, rng), _prime(bits // 2, rng)
+            phi = (p - 1) * (q - 1)
+            if p != q and phi % self.e:
+                break
+        self.n = p * q
+        self.d = pow(self.e, -1, phi)
+
+    def jwk(self):
+        return {"kty": "RSA", "alg": "RS256", "use": "sig", "kid": self.kid,
+                "n": _int_b64url(self.n), "e": _int_b64url(self.e)}
+
+    def sign(self, message):
+        size = (self.n.bit_length() + 7) // 8
+        digest_info = SHA256_DIGEST_INFO + hashlib.sha256(message).digest()
+        encoded = b"\x00\x01" + b"\xff" * (size - len(digest_info) - 3) + b"\x00" + digest_info
+        return pow(int.from_bytes(encoded, "big"), self.d, self.n).to_bytes(size, "big")
+
+
+def make_jwt(key, claims):
+    header = _b64url(json.dumps({"alg": "RS256", "kid": key.kid, "typ": "JWT"}).encode())
+    payload = _b64url(json.dumps(claims).encode())
+    signature = _b64url(key.sign(f"{header}.{payload}".encode("ascii")))
+    return f"{header}.{payload}.{signature}"
+
+
+class FakeCognito:
+    def __init__(self, issuer, client_id, handshake_latency=0.0, seed=0):
+        self.issuer = issuer
+        self.client_id = client_id
+        self.handshake_latency = handshake_latency
+        self.seed = seed
+        self.keys = [RSAKey("key-1", seed=seed)]
+        self.token_requests = 0
+        self.jwks_requests = 0
+        self.connections = 0
+        self.expires_in = 3600
+        self._server = None
+        self._lock = threading.Lock()
+        self._issued = {}
+
+    @property
+    def signing_key(self):
+        return self.keys[-1]
+
+    def rotate_key(self):
+        """Agrega una clave nueva y firma con ella (la anterior sigue publicada)."""
+        self.keys.append(RSAKey(f"key-{len(self.keys) + 1}", seed=self.seed + len(self.keys)))
+
+    def id_token(self, sub="user-1", **overrides):
+        now = int(time.time())
+        claims = {
+            "sub": sub, "email": f"{sub}@example.com", "aud": self.client_id, "iss": self.issuer,
+            "token_use": "id", "iat": now, "exp": now + self.expires_in,
+        }
+        claims.update(overrides)
+        return make_jwt(self.signing_key, claims)
+
+    def issued_id_token(self):
+        """ID token del endpoint /oauth2/token: se firma una vez por clave y se reutiliza."""
+        key = self.signing_key
+        token = self._issued.get(key.kid)
+        if token is None:
+            token = self._issued[key.kid] = self.id_token()
+        return token
+
+    def start(self):
+        cognito = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                with cognito._lock:
+                    cognito.connections += 1
+                time.sleep(cognito.handshake_latency)
+                super().setup()
+                # Headers y body salen en segmentos separados: sin esto el delayed ACK agrega ~40 ms
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.endswith("/.well-known/jwks.json"):
+                    cognito.jwks_requests += 1
+                    return self._send(200, {"keys": [key.jwk() for key in cognito.keys]})
+                self._send(404, {"error": "not_found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                cognito.token_requests += 1
+                self._send(200, {
+                    "access_token": "access", "refresh_token": "refresh", "token_type": "Bearer",
+                    "id_token": cognito.issued_id_token(), "expires_in": cognito.expires_in,
+                })
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,58 @@
+"""
+Carga el main.py de una lambda de src/ como módulo independiente, con las
+variables de entorno indicadas, y reemplaza sus clientes de AWS por stand-ins.
+"""
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+# Mismo contenido que python/ en lambda-layer.zip (lambda_runtime)
+LAYER_DIR = os.path.join(SRC_DIR, "lambda-layer", "python")
+if LAYER_DIR not in sys.path:
+    sys.path.insert(0, LAYER_DIR)
+
+DEFAULT_ENV = {
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "TABLE_NAME": "InvoiceJobs",
+    "INDEX_NAME": "GSI_User_Group",
+    "UPLOAD_BUCKET": "facturas",
+    "SQS_QUEUE_URL": "https://sqs.local/queue",
+}
+
+
+def load_lambda(directory, env=None, **patches):
+    """
+    `directory` es el nombre de la carpeta en src/ (p. ej. "lambda-database-writer").
+    Los kwargs reemplazan atributos del módulo (p. ej. s3=FakeS3()).
+    """
+    os.environ.update({**DEFAULT_ENV, **(env or {})})
+    path = os.path.join(SRC_DIR, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    name = "bench_" + directory.replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, os.path.join(path, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    for attribute, value in patches.items():
+        setattr(module, attribute, value)
+    return module
+
+
+def sqs_event(messages):
+    """Arma un evento de SQS a partir de una lista de bodies (str)."""
+    return {
+        "Records": [
+            {"messageId": f"msg-{i}", "body": body, "eventSource": "aws:sqs"}
+            for i, body in enumerate(messages)
+        ]
+    }
+
+
+def quiet():
+    """Silencia los print de los handlers mientras se mide."""
+    return contextlib.redirect_stdout(io.StringIO())
@@ -0,0 +1,137 @@
+"""
+Generador mínimo de PDFs de facturas para los benchmarks locales.
+Escribe el PDF a mano (sin dependencias) con una fuente Helvetica estándar
+para que PyPDF2 pueda extraer el texto.
+"""
+import random
+
+PROVEEDORES = ["AGRO SA", "DISTRIBUIDORA NORTE", "LOGISTICA DEL SUR", "PAPELERA CENTRAL", "SERVICIOS INTEGRALES"]
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages):
+    """Arma un PDF con una página por cada elemento de `pages` (lista de líneas)."""
+    objects = []
+    n_pages = len(pages)
+    font_id = 3 + 2 * n_pages
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(n_pages))
+
+    objects.append("<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {n_pages} >>")
+    for i, lines in enumerate(pages):
+        content_id = 4 + 2 * i
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        ops = ["BT", "/F1 11 Tf", "14 TL", "50 750 Td"]
+        for line in lines:
+            ops.append(f"({_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops)
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+def invoice_lines(rng, extra_items=10):
+    proveedor = rng.choice(PROVEEDORES)
+    fecha = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025"
+    cuit = f"30-{rng.randint(10000000, 99999999)}-{rng.randint(0, 9)}"
+    lines = [
+        "FACTURA A",
+        f"Proveedor: {proveedor}",
+        f"CUIT: {cuit}",
+        f"Fecha: {fecha}",
+    ]
+    subtotal = 0
+    for n in range(extra_items):
+        price = rng.randint(100, 5000)
+        subtotal += price
+        lines.append(f"Item {n + 1} articulo de prueba {price},00")
+    lines.append(f"Subtotal: {subtotal},00")
+    lines.append(f"Total: {round(subtotal * 1.21, 2)}")
+    return lines
+
+
+def make_invoice_pdf(seed=0, pages=1, extra_items=10):
+    """Factura con los datos en la primera página y páginas de detalle adicionales."""
+    rng = random.Random(seed)
+    body = [invoice_lines(rng, extra_items)]
+    for p in range(1, pages):
+        body.append([f"Detalle pagina {p + 1} linea {n} producto {rng.randint(1, 99999)}" for n in range(40)])
+    return make_pdf(body)
+
+
+def write_scanned_pdf(fileobj, image_pages, image_bytes, seed=0, chunk=1024 * 1024):
+    """
+    Escribe en `fileobj` una factura "escaneada" grande sin armarla en memoria:
+    la primera página tiene el texto de la factura y cada una de las
+    `image_pages` siguientes dibuja una imagen de `image_bytes` bytes (ruido).
+    """
+    rng = random.Random(seed)
+    n_pages = 1 + image_pages
+    font_id = 3 + 3 * n_pages
+    kids = " ".join(f"{3 + 3 * i} 0 R" for i in range(n_pages))
+    offsets = []
+    start = fileobj.tell()
+
+    def begin(number):
+        offsets.append(fileobj.tell() - start)
+        fileobj.write(f"{number} 0 obj\n".encode("latin-1"))
+
+    def obj(number, body):
+        begin(number)
+        fileobj.write(f"{body}\nendobj\n".encode("latin-1"))
+
+    fileobj.write(b"%PDF-1.4\n")
+    obj(1, "<< /Type /Catalog /Pages 2 0 R >>")
+    obj(2, f"<< /Type /Pages /Kids [{kids}] /Count {n_pages} >>")
+    for i in range(n_pages):
+        page_id, content_id, image_id = 3 + 3 * i, 4 + 3 * i, 5 + 3 * i
+        if i == 0:
+            ops = ["BT", "/F1 11 Tf", "14 TL", "50 750 Td"]
+            ops += [f"({_escape(line)}) Tj T*" for line in invoice_lines(rng)]
+            ops.append("ET")
+            resources = f"/Font << /F1 {font_id} 0 R >>"
+        else:
+            ops = ["q 612 0 0 792 0 0 cm /Im0 Do Q"]
+            resources = f"/XObject << /Im0 {image_id} 0 R >>"
+        stream = "\n".join(ops)
+        obj(page_id, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << {resources} >> /Contents {content_id} 0 R >>")
+        obj(content_id, f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        # Imagen en escala de grises; la página 1 no la usa pero se escribe igual para mantener la numeración
+        size = image_bytes if i else 1
+        width = 1024
+        begin(image_id)
+        fileobj.write(
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {-(-size // width)} "
+            f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Length {size} >>\nstream\n".encode("latin-1")
+        )
+        remaining = size
+        while remaining:
+            block = min(chunk, remaining)
+            fileobj.write(rng.randbytes(block))
+            remaining -= block
+        fileobj.write(b"\nendstream\nendobj\n")
+    obj(font_id, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    xref = fileobj.tell() - start
+    fileobj.write(f"xref\n0 {font_id + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    for offset in offsets:
+        fileobj.write(f"{offset:010d} 00000 n \n".encode("latin-1"))
+    fileobj.write(f"trailer\n<< /Size {font_id + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1"))
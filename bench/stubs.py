@@ -0,0 +1,556 @@
+"""
+Stand-ins en memoria de S3, SQS y DynamoDB para correr los handlers localmente.
+Sólo implementan la parte de la API que usan las lambdas de src/.
+`latency` simula el round trip de red de cada llamada (en segundos).
+"""
+import bisect
+import copy
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+
+def etag_of(body):
+    """ETag de S3 para un upload de una sola parte (MD5 del contenido)."""
+    return f'"{hashlib.md5(body).hexdigest()}"'
+
+
+def _sleep(latency):
+    if latency:
+        time.sleep(latency)
+
+
+class FakeS3:
+    """
+    Con discard_parts=True las partes de multipart uploads no se guardan (sólo
+    su tamaño), para que la memoria del stand-in no ensucie las mediciones.
+    """
+
+    def __init__(self, latency=0.0, discard_parts=False):
+        self.latency = latency
+        self.discard_parts = discard_parts
+        self.sizes = {}
+        self.objects = {}
+        self.modified = {}
+        self.uploads = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+        _sleep(self.latency)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._call()
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        elif hasattr(Body, "read"):
+            Body = Body.read()
+        self.objects[(Bucket, Key)] = bytes(Body)
+        self.modified[(Bucket, Key)] = datetime.now(timezone.utc)
+        return {"ETag": etag_of(Body)}
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        self._call()
+        if (Bucket, Key) not in self.objects:
+            raise FakeClientError("NoSuchKey")
+        body = self.objects[(Bucket, Key)]
+        if Range:
+            start, _, end = Range.replace("bytes=", "").partition("-")
+            body = body[int(start):int(end) + 1 if end else None]
+        return {"Body": io.BytesIO(body), "ContentLength": len(body)}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._call()
+        if (Bucket, Key) not in self.objects:
+            raise FakeClientError("404")
+        return {"ContentLength": len(self.objects[(Bucket, Key)]), "ETag": etag_of(self.objects[(Bucket, Key)])}
+
+    def list_objects_v2(self, Bucket, Prefix="", StartAfter="", ContinuationToken=None, MaxKeys=1000, **kwargs):
+        """Orden lexicográfico como S3; el ContinuationToken es la última clave devuelta."""
+        self._call()
+        after = ContinuationToken or StartAfter
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix) and key > after)
+        page = keys[:MaxKeys]
+        response = {
+            "Contents": [
+                {
+                    "Key": key,
+                    "Size": len(self.objects[(Bucket, key)]),
+                    "ETag": etag_of(self.objects[(Bucket, key)]),
+                    "LastModified": self.modified.get((Bucket, key)) or datetime.now(timezone.utc),
+                }
+                for key in page
+            ],
+            "KeyCount": len(page),
+            "IsTruncated": len(keys) > MaxKeys,
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = page[-1]
+        return response
+
+    def download_fileobj(self, Bucket, Key, Fileobj, **kwargs):
+        self._call()
+        Fileobj.write(self.objects[(Bucket, Key)])
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self._call()
+        upload_id = uuid.uuid4().hex
+        self.uploads[upload_id] = {"Bucket": Bucket, "Key": Key, "parts": {}, "etags": {}}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        self._call()
+        if UploadId not in self.uploads:
+            raise FakeClientError("NoSuchUpload")
+        body = bytes(Body)
+        self.uploads[UploadId]["parts"][PartNumber] = len(body) if self.discard_parts else body
+        self.uploads[UploadId]["etags"][PartNumber] = etag_of(body)
+        return {"ETag": etag_of(body)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self._call()
+        upload = self.uploads.get(UploadId)
+        if upload is None or (upload["Bucket"], upload["Key"]) != (Bucket, Key):
+            raise FakeClientError("NoSuchUpload")
+        for part in MultipartUpload["Parts"]:
+            if upload["etags"].get(part["PartNumber"]) != part["ETag"]:
+                raise FakeClientError("InvalidPart")
+        parts = [upload["parts"][part["PartNumber"]] for part in MultipartUpload["Parts"]]
+        sizes = [part if isinstance(part, int) else len(part) for part in parts]
+        for size in sizes[:-1]:
+            if size < 5 * 1024 * 1024:
+                raise FakeClientError("EntityTooSmall")
+        del self.uploads[UploadId]
+        self.sizes[(Bucket, Key)] = sum(sizes)
+        if not self.discard_parts:
+            self.objects[(Bucket, Key)] = b"".join(parts)
+        self.modified[(Bucket, Key)] = datetime.now(timezone.utc)
+        return {"ETag": f'"{uuid.uuid4().hex}-{len(parts)}"'}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self._call()
+        self.uploads.pop(UploadId, None)
+        return {}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn=3600, **kwargs):
+        extra = {name: value for name, value in Params.items() if name not in ("Bucket", "Key")}
+        query = urllib.parse.urlencode({"method": ClientMethod, "expires": ExpiresIn, **extra})
+        return f"https://{Params['Bucket']}.s3.local/{urllib.parse.quote(Params['Key'])}?{query}"
+
+    def put_presigned(self, url, body):
+        """
+        El PUT del browser a un URL de generate_presigned_url("upload_part"); devuelve
+        el header ETag. Si el URL se firmó con ContentLength, otro largo se rechaza.
+        """
+        parsed = urllib.parse.urlparse(url)
+        params = dict(urllib.parse.parse_qsl(parsed.query))
+        if "ContentLength" in params and int(params["ContentLength"]) != len(body):
+            raise FakeClientError("SignatureDoesNotMatch")
+        return self.upload_part(
+            Bucket=parsed.netloc.split(".s3.local")[0],
+            Key=urllib.parse.unquote(parsed.path[1:]),
+            UploadId=params["UploadId"],
+            PartNumber=int(params["PartNumber"]),
+            Body=body,
+        )["ETag"]
+
+    def generate_presigned_post(self, Bucket, Key, Fields=None, Conditions=None, ExpiresIn=3600, **kwargs):
+        # La policy va como JSON en un campo (en S3 va firmada en base64)
+        policy = json.dumps({"conditions": Conditions or []})
+        return {"url": f"https://{Bucket}.s3.local/", "fields": {"key": Key, "expires": str(ExpiresIn), "policy": policy}}
+
+    def post_presigned(self, presigned, body):
+        """El POST del browser con los campos de generate_presigned_post; aplica content-length-range."""
+        for condition in json.loads(presigned["fields"]["policy"])["conditions"]:
+            if isinstance(condition, list) and condition[0] == "content-length-range":
+                if not condition[1] <= len(body) <= condition[2]:
+                    raise FakeClientError("EntityTooLarge" if len(body) > condition[2] else "EntityTooSmall")
+        return self.put_object(Bucket=presigned["url"].split("//", 1)[1].split(".s3.local")[0],
+                               Key=presigned["fields"]["key"], Body=body)
+
+
+class FakeClientError(Exception):
+    """Como botocore.exceptions.ClientError: el código viene en e.response."""
+
+    def __init__(self, code, item=None):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+        if item is not None:
+            self.response["Item"] = item
+
+
+class FakeSQS:
+    """`fail_rate` hace fallar esa fracción de entradas de cada SendMessageBatch (reintentables)."""
+
+    def __init__(self, latency=0.0, fail_rate=0.0, seed=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.messages = []
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        self.calls += 1
+        _sleep(self.latency)
+        message_id = str(uuid.uuid4())
+        self.messages.append({"messageId": message_id, "body": MessageBody})
+        return {"MessageId": message_id}
+
+    def receive_batch(self, max_messages=10):
+        """Saca hasta N mensajes de la cola, como el event source mapping de Lambda."""
+        with self._lock:
+            batch, self.messages = self.messages[:max_messages], self.messages[max_messages:]
+        return batch
+
+    def requeue(self, messages):
+        """Devuelve a la cola los mensajes reportados en batchItemFailures."""
+        with self._lock:
+            self.messages.extend(messages)
+
+    def send_message_batch(self, QueueUrl, Entries, **kwargs):
+        with self._lock:
+            self.calls += 1
+        _sleep(self.latency)
+        if len(Entries) > 10:
+            raise ValueError("TooManyEntriesInBatchRequest")
+        successful, failed = [], []
+        for entry in Entries:
+            if self._random.random() < self.fail_rate:
+                failed.append({"Id": entry["Id"], "SenderFault": False, "Code": "InternalError"})
+                continue
+            message_id = str(uuid.uuid4())
+            with self._lock:
+                self.messages.append({"messageId": message_id, "body": entry["MessageBody"]})
+            successful.append({"Id": entry["Id"], "MessageId": message_id})
+        return {"Successful": successful, "Failed": failed}
+
+
+# Índices secundarios de production/locals.tf: nombre -> (hash key, range key)
+DEFAULT_INDEXES = {
+    "GSI_User_Group": ("userId", "groupKey"),
+    "GSI_User_Supplier": ("supplierKey", "groupKey"),
+    "GSI_User_Cuit": ("cuitKey", "groupKey"),
+    "GSI_InvoiceId": ("PK", "SK"),
+}
+
+
+class FakeTable:
+    def __init__(self, name, hash_key="PK", range_key="SK", latency=0.0, indexes=None):
+        self.name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.indexes = DEFAULT_INDEXES if indexes is None else indexes
+        # Sin Limit, DynamoDB corta cada página en 1 MB; acá se aproxima por cantidad de items
+        self.page_size = 1000
+        self._version = 0
+        self._query_cache = None
+        self.latency = latency
+        self.items = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _key(self, item):
+        return (item[self.hash_key], item.get(self.range_key))
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+        _sleep(self.latency)
+
+    def store(self, item):
+        """Guarda un item sin contar la llamada (también sirve para cargar datos de prueba)."""
+        with self._lock:
+            self.items[self._key(item)] = item
+            self._version += 1
+
+    def discard(self, key):
+        """Borra un item sin contar la llamada (DeleteRequest de batch_write_item)."""
+        with self._lock:
+            self.items.pop(self._key(key), None)
+            self._version += 1
+
+    def put_item(self, Item, ReturnValues=None, ConditionExpression=None, **kwargs):
+        self._call()
+        with self._lock:
+            previous = self.items.get(self._key(Item))
+            if ConditionExpression is not None and not _evaluate(ConditionExpression, previous or {}):
+                raise FakeClientError("ConditionalCheckFailedException")
+            self.items[self._key(Item)] = copy.deepcopy(Item)
+            self._version += 1
+        if ReturnValues == "ALL_OLD" and previous is not None:
+            return {"Attributes": previous}
+        return {}
+
+    def get_item(self, Key, **kwargs):
+        self._call()
+        item = self.items.get(self._key(Key))
+        return {"Item": copy.deepcopy(item)} if item is not None else {}
+
+    def query(self, KeyConditionExpression, IndexName=None, Limit=None, ExclusiveStartKey=None, **kwargs):
+        self._call()
+        key_names = [self.hash_key, self.range_key]
+        if IndexName:
+            key_names = list(self.indexes[IndexName]) + key_names
+
+        def sort_key(item):
+            return tuple(str(item.get(name, "")) for name in key_names[1:])
+
+        # Las páginas sucesivas de una misma query reutilizan el resultado ordenado
+        cache_key = (IndexName, _condition_key(KeyConditionExpression), self._version, len(self.items))
+        if self._query_cache and self._query_cache[0] == cache_key:
+            matches, sort_keys = self._query_cache[1]
+        else:
+            matches = [
+                item for item in self.items.values()
+                if all(name in item for name in key_names) and _evaluate(KeyConditionExpression, item)
+            ]
+            matches.sort(key=sort_key)
+            sort_keys = [sort_key(item) for item in matches]
+            self._query_cache = (cache_key, (matches, sort_keys))
+        start = bisect.bisect_right(sort_keys, sort_key(ExclusiveStartKey)) if ExclusiveStartKey else 0
+        matches = matches[start:]
+        response = {}
+        page = self.page_size if Limit is None else min(Limit, self.page_size)
+        if len(matches) > page:
+            matches = matches[:page]
+            last = matches[-1]
+            response["LastEvaluatedKey"] = {name: last[name] for name in key_names}
+        # Como en DynamoDB, FilterExpression se aplica después de leer la página
+        response["ScannedCount"] = len(matches)
+        if kwargs.get("FilterExpression") is not None:
+            matches = [item for item in matches if _evaluate(kwargs["FilterExpression"], item)]
+        projection = kwargs.get("ProjectionExpression")
+        if projection:
+            names = kwargs.get("ExpressionAttributeNames") or {}
+            fields = [names.get(field.strip(), field.strip()) for field in projection.split(",")]
+            matches = [{field: item[field] for field in fields if field in item} for item in matches]
+        response["Items"] = copy.deepcopy(matches)
+        response["Count"] = len(matches)
+        return response
+
+    def scan(self, Limit=None, ExclusiveStartKey=None, Segment=None, TotalSegments=None, **kwargs):
+        self._call()
+        keys = sorted(self.items, key=lambda key: tuple(str(part) for part in key))
+        if TotalSegments:
+            # Scan en paralelo: cada segmento ve una partición fija de las claves
+            keys = [key for key in keys if zlib.crc32(str(key[0]).encode("utf-8")) % TotalSegments == Segment]
+        if ExclusiveStartKey:
+            start_key = tuple(str(part) for part in self._key(ExclusiveStartKey))
+            keys = [key for key in keys if tuple(str(part) for part in key) > start_key]
+        page = self.page_size if Limit is None else min(Limit, self.page_size)
+        response = {}
+        if len(keys) > page:
+            keys = keys[:page]
+            response["LastEvaluatedKey"] = {self.hash_key: keys[-1][0], self.range_key: keys[-1][1]}
+        response["Items"] = [copy.deepcopy(self.items[key]) for key in keys]
+        response["Count"] = len(keys)
+        return response
+
+    def delete_item(self, Key, ConditionExpression=None, **kwargs):
+        self._call()
+        with self._lock:
+            if ConditionExpression is not None and not _evaluate(ConditionExpression, self.items.get(self._key(Key)) or {}):
+                raise FakeClientError("ConditionalCheckFailedException")
+            self.items.pop(self._key(Key), None)
+            self._version += 1
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues=None, ConditionExpression=None,
+                    ReturnValuesOnConditionCheckFailure=None, **kwargs):
+        self._call()
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        with self._lock:
+            previous = self.items.get(self._key(Key))
+            if ConditionExpression is not None and not _evaluate(ConditionExpression, previous or {}):
+                returned = copy.deepcopy(previous) if ReturnValuesOnConditionCheckFailure == "ALL_OLD" else None
+                raise FakeClientError("ConditionalCheckFailedException", returned)
+            item = copy.deepcopy(previous) if previous is not None else copy.deepcopy(Key)
+            _apply_update(item, UpdateExpression, names, values)
+            self.items[self._key(Key)] = item
+            self._version += 1
+        if ReturnValues == "ALL_NEW":
+            return {"Attributes": copy.deepcopy(item)}
+        if ReturnValues == "ALL_OLD" and previous is not None:
+            return {"Attributes": copy.deepcopy(previous)}
+        return {}
+
+
+class FakeDynamoDB:
+    """Equivalente a boto3.resource('dynamodb')."""
+
+    def __init__(self, latency=0.0, max_batch_accept=None):
+        self.latency = latency
+        self.tables = {}
+        self.calls = 0
+        # Si se define, cada batch_write_item acepta como máximo N items y
+        # devuelve el resto como UnprocessedItems (simula throttling).
+        self.max_batch_accept = max_batch_accept
+
+    def Table(self, name):
+        if name not in self.tables:
+            self.tables[name] = FakeTable(name, latency=self.latency)
+        return self.tables[name]
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        self.calls += 1
+        _sleep(self.latency)
+        unprocessed = {}
+        for table_name, requests in RequestItems.items():
+            if len(requests) > 25:
+                raise ValueError("Too many items requested for the BatchWriteItem call")
+            table = self.Table(table_name)
+            accepted = requests
+            if self.max_batch_accept is not None:
+                accepted = requests[:self.max_batch_accept]
+                if requests[self.max_batch_accept:]:
+                    unprocessed[table_name] = requests[self.max_batch_accept:]
+            for request in accepted:
+                if "DeleteRequest" in request:
+                    table.discard(request["DeleteRequest"]["Key"])
+                else:
+                    table.store(copy.deepcopy(request["PutRequest"]["Item"]))
+        return {"UnprocessedItems": unprocessed}
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        self.calls += 1
+        _sleep(self.latency)
+        responses = {}
+        for table_name, request in RequestItems.items():
+            if len(request["Keys"]) > 100:
+                raise ValueError("Too many items requested for the BatchGetItem call")
+            table = self.Table(table_name)
+            found = [table.items.get(table._key(key)) for key in request["Keys"]]
+            responses[table_name] = [copy.deepcopy(item) for item in found if item is not None]
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+
+def _resolve_path(path, names):
+    return [names.get(part, part) for part in path.strip().split(".")]
+
+
+def _get_path(item, parts):
+    for part in parts:
+        if not isinstance(item, dict) or part not in item:
+            return None
+        item = item[part]
+    return item
+
+
+def _set_path(item, parts, value):
+    for part in parts[:-1]:
+        item = item.setdefault(part, {})
+    item[parts[-1]] = value
+
+
+def _operand(item, token, names, values):
+    token = token.strip()
+    if token.startswith(":"):
+        return values[token]
+    if token.startswith("if_not_exists("):
+        path, default = token[len("if_not_exists("):-1].split(",", 1)
+        current = _get_path(item, _resolve_path(path, names))
+        return current if current is not None else _operand(item, default, names, values)
+    return _get_path(item, _resolve_path(token, names))
+
+
+def _split_top_level(expression, separator=","):
+    parts, depth, current = [], 0, ""
+    for char in expression:
+        depth += char == "("
+        depth -= char == ")"
+        if char == separator and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    parts.append(current)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _apply_update(item, expression, names, values):
+    """Soporta SET (con if_not_exists, + y -), ADD y REMOVE."""
+    clauses = re.split(r"\b(SET|ADD|REMOVE)\b", expression)
+    for action, body in zip(clauses[1::2], clauses[2::2]):
+        for part in _split_top_level(body):
+            if action == "SET":
+                path, value_expression = part.split("=", 1)
+                operands = re.split(r"\s([+-])\s", value_expression.strip())
+                value = _operand(item, operands[0], names, values)
+                for operator, operand in zip(operands[1::2], operands[2::2]):
+                    other = _operand(item, operand, names, values)
+                    value = value + other if operator == "+" else value - other
+                _set_path(item, _resolve_path(path, names), value)
+            elif action == "ADD":
+                path, value_token = part.split()
+                parts = _resolve_path(path, names)
+                increment = values[value_token]
+                current = _get_path(item, parts)
+                if isinstance(increment, set):
+                    _set_path(item, parts, (current or set()) | increment)
+                else:
+                    _set_path(item, parts, (current or 0) + increment)
+            else:
+                parts = _resolve_path(part, names)
+                parent = _get_path(item, parts[:-1]) if len(parts) > 1 else item
+                if isinstance(parent, dict):
+                    parent.pop(parts[-1], None)
+
+
+def _condition_key(condition):
+    """Representación hasheable de una condición de boto3 (para cachear queries)."""
+    expression = condition.get_expression()
+    values = tuple(
+        _condition_key(value) if hasattr(value, "get_expression")
+        else ("attr", value.name) if hasattr(value, "name") and not isinstance(value, str)
+        else value
+        for value in expression["values"]
+    )
+    return (expression["operator"], values)
+
+
+def _evaluate(condition, item):
+    """Evalúa una condición de boto3.dynamodb.conditions contra un item."""
+    expression = condition.get_expression()
+    operator = expression["operator"]
+    values = expression["values"]
+    if operator == "AND":
+        return all(_evaluate(value, item) for value in values)
+    if operator == "OR":
+        return any(_evaluate(value, item) for value in values)
+    if operator == "attribute_exists":
+        return values[0].name in item
+    if operator == "attribute_not_exists":
+        return values[0].name not in item
+    attribute = item.get(values[0].name)
+    if operator == "=":
+        return attribute == values[1]
+    if operator == "<>":
+        return attribute != values[1]
+    if attribute is None:
+        return False
+    if operator == "BETWEEN":
+        return values[1] <= attribute <= values[2]
+    if operator == "begins_with":
+        return attribute.startswith(values[1])
+    if operator == "<":
+        return attribute < values[1]
+    if operator == "<=":
+        return attribute <= values[1]
+    if operator == ">":
+        return attribute > values[1]
+    if operator == ">=":
+        return attribute >= values[1]
+    raise NotImplementedError(operator)
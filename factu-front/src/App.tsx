@@ -1,7 +1,7 @@
 import { useState, useEffect } from "react";
 import React from "react";
 import { HashRouter as Router, Route, Routes, useNavigate } from "react-router-dom";
-import { ApiService } from "./services/apiService";
+import { ApiService, MULTIPART_THRESHOLD_BYTES } from "./services/apiService";
 import { useAuth } from "./hooks/useAuth";
 import Reports from "./Reports";
 
@@ -143,14 +143,19 @@ const Home = () => {
     
     setIsUploading(true);
     try {
-      console.log('Obteniendo presigned URL para:', selectedFile.name);
-      
-      // Obtener presigned URL del API Gateway
-      const presignedData = await ApiService.getPresignedUrl(accessToken, selectedFile.name);
-      console.log('Presigned URL obtenida:', presignedData);
-      
-      // Subir archivo a S3 usando la presigned URL
-      await ApiService.uploadFileToS3(presignedData, selectedFile);
+      if (selectedFile.size > MULTIPART_THRESHOLD_BYTES) {
+        // Archivos grandes: partes en paralelo con multipart upload
+        await ApiService.uploadLargeFile(accessToken, selectedFile, selectedFile.name);
+      } else {
+        console.log('Obteniendo presigned URL para:', selectedFile.name);
+
+        // Obtener presigned URL del API Gateway
+        const presignedData = await ApiService.getPresignedUrl(accessToken, selectedFile.name);
+        console.log('Presigned URL obtenida:', presignedData);
+
+        // Subir archivo a S3 usando la presigned URL
+        await ApiService.uploadFileToS3(presignedData, selectedFile);
+      }
       
       console.log('Archivo subido exitosamente a S3');
       alert('¡Archivo subido exitosamente!');
@@ -11,6 +11,17 @@ export interface PresignedUrlResponse {
   file_key: string;
 }
 
+export interface MultipartUploadStart {
+  file_key: string;
+  upload_id: string;
+  part_size: number;
+  parts: { part_number: number; url: string }[];
+}
+
+// Files above this size go through multipart upload (parallel parts) instead of a single POST
+export const MULTIPART_THRESHOLD_BYTES = 8 * 1024 * 1024;
+const MULTIPART_CONCURRENCY = 4;
+
 export class ApiService {
   private static getAuthHeaders(token: string) {
     return {
@@ -39,6 +50,68 @@ export class ApiService {
     }
   }
 
+  // One request for a whole folder: a presigned POST per file, in the same order
+  static async getPresignedUrls(token: string, fileNames: string[]): Promise<PresignedUrlResponse[]> {
+    const response = await fetch(`${API_BASE_URL}/uploads/presign`, {
+      method: 'POST',
+      headers: this.getAuthHeaders(token),
+      body: JSON.stringify({ files: fileNames.map((fileName) => ({ fileName })) })
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    return data.uploads;
+  }
+
+  private static async multipartAction(token: string, body: Record<string, unknown>): Promise<any> {
+    const response = await fetch(`${API_BASE_URL}/uploads/presign`, {
+      method: 'POST',
+      headers: this.getAuthHeaders(token),
+      body: JSON.stringify(body)
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return response.json();
+  }
+
+  // Large files: PUT the parts in parallel to their presigned URLs, then complete the upload
+  static async uploadLargeFile(token: string, file: File, fileName: string): Promise<string> {
+    const start: MultipartUploadStart = await this.multipartAction(token, {
+      action: 'start',
+      fileName,
+      size: file.size,
+    });
+    const { file_key, upload_id, part_size } = start;
+
+    try {
+      const etags: { part_number: number; etag: string }[] = [];
+      const pending = [...start.parts];
+      const worker = async () => {
+        for (let part = pending.shift(); part; part = pending.shift()) {
+          const chunk = file.slice((part.part_number - 1) * part_size, part.part_number * part_size);
+          const response = await fetch(part.url, { method: 'PUT', body: chunk });
+          if (!response.ok) {
+            throw new Error(`Part ${part.part_number} failed with status: ${response.status}`);
+          }
+          etags.push({ part_number: part.part_number, etag: response.headers.get('ETag') || '' });
+        }
+      };
+      await Promise.all(Array.from({ length: MULTIPART_CONCURRENCY }, worker));
+
+      await this.multipartAction(token, { action: 'complete', file_key, upload_id, parts: etags });
+      return file_key;
+    } catch (error) {
+      console.error('Error uploading file parts to S3:', error);
+      await this.multipartAction(token, { action: 'abort', file_key, upload_id }).catch(() => undefined);
+      throw error;
+    }
+  }
+
   static async uploadFileToS3(presignedData: PresignedUrlResponse, file: File): Promise<void> {
     try {
       const formData = new FormData();
@@ -65,20 +138,31 @@ export class ApiService {
     }
   }
 
-  // Fetch invoices list (file_key and filename only)
+  // Fetch invoices list (file_key and filename only), following next_token pages
   static async fetchInvoices(token: string): Promise<any> {
     try {
-      const response = await fetch(`${API_BASE_URL}/invoices`, {
-        method: 'GET',
-        headers: this.getAuthHeaders(token),
-      });
+      let nextToken: string | null = null;
+      let data: any = null;
+      const facturas: any[] = [];
+      do {
+        const query: string = nextToken ? `?next_token=${encodeURIComponent(nextToken)}` : '';
+        const response = await fetch(`${API_BASE_URL}/invoices${query}`, {
+          method: 'GET',
+          headers: this.getAuthHeaders(token),
+        });
 
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
 
-      const data = await response.json();
-      return data;
+        data = await response.json();
+        if (Array.isArray(data.facturas)) {
+          facturas.push(...data.facturas);
+        }
+        nextToken = data.next_token || null;
+      } while (nextToken);
+
+      return { ...data, facturas, next_token: null };
     } catch (error) {
       console.error('Error fetching invoices:', error);
       throw error;
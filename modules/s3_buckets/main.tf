@@ -20,7 +20,8 @@ resource "aws_s3_bucket_cors_configuration" "this" {
     allowed_headers = ["*"]
     allowed_methods = ["GET", "PUT", "POST"]
     allowed_origins = ["*"]
-    expose_headers  = []
+    # El browser necesita el ETag de cada parte para completar un multipart upload
+    expose_headers  = ["ETag"]
     max_age_seconds = 3000
   }
 }
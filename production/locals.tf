@@ -12,7 +12,9 @@ locals {
     { name = "PK", type = "S" },      # userId o groupKey
     { name = "SK", type = "S" },      # invoiceId único
     { name = "userId", type = "S" },
-    { name = "groupKey", type = "S" }
+    { name = "groupKey", type = "S" },    # "<fecha ISO>#<file_key>" (ver lambda_runtime.invoice_keys)
+    { name = "supplierKey", type = "S" }, # "<userId>#<PROVEEDOR>"
+    { name = "cuitKey", type = "S" }      # "<userId>#<cuit>"
   ]
 
   dynamodb_global_secondary_indexes = [
@@ -22,6 +24,19 @@ locals {
       range_key       = "groupKey"
       projection_type = "ALL"  # Asegúrate de que 'createdAt' esté incluido
     },
+    # Filtros por proveedor / CUIT con rango de fechas en report-generator y export
+    {
+      name            = "GSI_User_Supplier"
+      hash_key        = "supplierKey"
+      range_key       = "groupKey"
+      projection_type = "ALL"
+    },
+    {
+      name            = "GSI_User_Cuit"
+      hash_key        = "cuitKey"
+      range_key       = "groupKey"
+      projection_type = "ALL"
+    },
     {
       name            = "GSI_InvoiceId"
       hash_key        = "PK"  # userId o groupKey
@@ -145,6 +145,13 @@ environment_variables = merge(
     } : {},
     each.key == "invoice-data-updater" ? {
       TABLE_NAME = module.ddb_invoice_jobs.dynamodb_table_id
+    } : {},
+    each.key == "invoice-search" ? {
+      TABLE_NAME = module.ddb_invoice_jobs.dynamodb_table_id
+    } : {},
+    each.key == "pdf-downloader" ? {
+      TABLE_NAME = module.ddb_invoice_jobs.dynamodb_table_id
+      INDEX_NAME = "GSI_User_Group"
     } : {}
 )
 
@@ -170,7 +177,8 @@ module "http_api" {
   cors_configuration = {
     allow_origins = ["*"]
     allow_methods = ["GET", "POST", "OPTIONS", "PUT"]
-    allow_headers = ["authorization", "content-type"]
+    allow_headers  = ["authorization", "content-type", "if-none-match"]
+    expose_headers = ["etag"]
   }
 
   authorizers = {
@@ -197,6 +205,7 @@ resource "aws_apigatewayv2_integration" "integrations" {
     export         = module.lambdas["export"].lambda_function_arn
     pdf_downloader = module.lambdas["pdf-downloader"].lambda_function_arn
     update_invoice = module.lambdas["invoice-data-updater"].lambda_function_arn
+    search         = module.lambdas["invoice-search"].lambda_function_arn
     auth_callback  = module.lambdas["cognito-post-auth"].lambda_function_arn
   }
 
@@ -224,6 +233,12 @@ resource "aws_apigatewayv2_route" "routes" {
       authorization_type = "JWT"
       authorizer_id      = module.http_api.authorizers["cognito"].id
     }
+    pdf_bundle = {
+      route_key          = "POST /download/bundle"
+      integration        = "pdf_downloader"
+      authorization_type = "JWT"
+      authorizer_id      = module.http_api.authorizers["cognito"].id
+    }
     report = {
       route_key          = "GET /report"
       authorization_type = "JWT"
@@ -244,11 +259,17 @@ resource "aws_apigatewayv2_route" "routes" {
       authorization_type = "JWT"
       authorizer_id      = module.http_api.authorizers["cognito"].id
     }
+    search = {
+      route_key          = "GET /invoices/search"
+      authorization_type = "JWT"
+      authorizer_id      = module.http_api.authorizers["cognito"].id
+    }
   }
 
   api_id             = module.http_api.api_id
   route_key          = each.value.route_key
-  target             = "integrations/${aws_apigatewayv2_integration.integrations[each.key].id}"
+  # integration: rutas que comparten lambda con otra (por defecto, la del mismo nombre)
+  target             = "integrations/${aws_apigatewayv2_integration.integrations[lookup(each.value, "integration", each.key)].id}"
   authorization_type = each.value.authorization_type
 
   # optional authorizer_id only set when present in map
@@ -263,6 +284,7 @@ resource "aws_lambda_permission" "apigw_invoke" {
     getter        = module.lambdas["invoice-getter"].lambda_function_name
     export        = module.lambdas["export"].lambda_function_name
     update        = module.lambdas["invoice-data-updater"].lambda_function_name
+    search        = module.lambdas["invoice-search"].lambda_function_name
     auth_callback = module.lambdas["cognito-post-auth"].lambda_function_name
     pdf_downloader = module.lambdas["pdf-downloader"].lambda_function_name
   }
@@ -285,6 +307,10 @@ module "ddb_invoice_jobs" {
 
   global_secondary_indexes = local.dynamodb_global_secondary_indexes
 
+  # Expiración de las entradas del cache de extracción de database-writer
+  ttl_enabled        = true
+  ttl_attribute_name = "expiresAt"
+
   tags = local.common_tags
 }
 
@@ -334,9 +360,13 @@ resource "aws_lambda_permission" "sqs_invoke_database_writer" {
 resource "aws_lambda_event_source_mapping" "sqs_to_database_writer" {
   event_source_arn = aws_sqs_queue.invoice_processing_queue.arn
   function_name    = module.lambdas["database-writer"].lambda_function_arn
-  batch_size       = 1  # Procesar un mensaje a la vez
+  batch_size       = 10 # database-writer procesa el batch completo en paralelo
   enabled          = true
 
+  # Sólo se reintentan los mensajes reportados en batchItemFailures
+  function_response_types            = ["ReportBatchItemFailures"]
+  maximum_batching_window_in_seconds = 5
+
   depends_on = [
     aws_lambda_permission.sqs_invoke_database_writer
   ]
@@ -358,6 +388,8 @@ resource "aws_s3_bucket_notification" "uploads_trigger" {
   lambda_function {
     lambda_function_arn = module.lambdas["invoice-processor"].lambda_function_arn
     events              = ["s3:ObjectCreated:*"]
+    # Sólo los PDFs subidos; los exports generados en exports/ no se procesan
+    filter_suffix = ".pdf"
   }
 
   depends_on = [
@@ -365,6 +397,40 @@ resource "aws_s3_bucket_notification" "uploads_trigger" {
   ]
 }
 
+# Los exports generados por la lambda "export" (mode=url) se borran solos
+resource "aws_s3_bucket_lifecycle_configuration" "facturas_exports" {
+  bucket = module.s3_buckets["facturas"].bucket_name
+
+  rule {
+    id     = "expire-exports"
+    status = "Enabled"
+
+    filter {
+      prefix = "exports/"
+    }
+
+    expiration {
+      days = 1
+    }
+
+    abort_incomplete_multipart_upload {
+      days_after_initiation = 1
+    }
+  }
+
+  # Subidas multipart de presigned-url-generator que el browser no completó ni abortó
+  rule {
+    id     = "abort-incomplete-uploads"
+    status = "Enabled"
+
+    filter {}
+
+    abort_incomplete_multipart_upload {
+      days_after_initiation = 1
+    }
+  }
+}
+
 resource "aws_cloudwatch_log_group" "invoice_processor" {
   count             = var.manage_lambda_log_group ? 1 : 0
   name              = "/aws/lambda/${module.lambdas["invoice-processor"].lambda_function_name}"
@@ -0,0 +1,127 @@
+"""
+Verificación local de los JWT (RS256) emitidos por Cognito.
+
+Las claves públicas salen del JWKS del user pool y se guardan en memoria con
+un TTL; si llega un `kid` desconocido (rotación de claves) se vuelve a leer
+el JWKS. Si después de releerlo el kid sigue sin aparecer, otros kids
+desconocidos no disparan lecturas durante `min_refresh_interval` segundos.
+La firma se verifica con RSASSA-PKCS1-v1_5 + SHA-256 en Python puro, así no
+hace falta agregar una librería criptográfica al layer.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+
+# Prefijo DER del DigestInfo de SHA-256 (RFC 8017, sección 9.2)
+SHA256_DIGEST_INFO = bytes.fromhex("3031300d060960864801650304020105000420")
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def _b64url_decode(segment):
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _b64url_int(segment):
+    return int.from_bytes(_b64url_decode(segment), "big")
+
+
+def rsa_sha256_verify(message, signature, n, e):
+    """True si `signature` es una firma PKCS#1 v1.5 / SHA-256 válida de `message`."""
+    size = (n.bit_length() + 7) // 8
+    if len(signature) != size:
+        return False
+    value = int.from_bytes(signature, "big")
+    if value >= n:
+        return False
+    encoded = pow(value, e, n).to_bytes(size, "big")
+    digest_info = SHA256_DIGEST_INFO + hashlib.sha256(message).digest()
+    if size < len(digest_info) + 11:
+        return False
+    expected = b"\x00\x01" + b"\xff" * (size - len(digest_info) - 3) + b"\x00" + digest_info
+    return hmac.compare_digest(encoded, expected)
+
+
+class JWKSCache:
+    """
+    Claves públicas por `kid`. `fetch(url)` devuelve el documento JWKS ya
+    parseado; se llama al primer uso, al vencer el TTL o ante un kid nuevo.
+    """
+
+    def __init__(self, url, fetch, ttl_seconds=3600, min_refresh_interval=30, clock=time.time):
+        self.url = url
+        self._fetch = fetch
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_interval = min_refresh_interval
+        self._clock = clock
+        self._keys = {}
+        self._fetched_at = None
+        self._retry_unknown_at = None
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    def _refresh(self):
+        document = self._fetch(self.url)
+        self._keys = {
+            key["kid"]: (_b64url_int(key["n"]), _b64url_int(key["e"]))
+            for key in document.get("keys", [])
+            if key.get("kty") == "RSA" and key.get("kid")
+        }
+        self._fetched_at = self._clock()
+        self.fetches += 1
+
+    def get_key(self, kid):
+        """(n, e) de la clave `kid`, o None si el JWKS no la tiene."""
+        with self._lock:
+            now = self._clock()
+            expired = self._fetched_at is None or now - self._fetched_at >= self.ttl_seconds
+            unknown = kid not in self._keys and (self._retry_unknown_at is None or now >= self._retry_unknown_at)
+            if expired or unknown:
+                self._refresh()
+                if kid not in self._keys:
+                    self._retry_unknown_at = now + self.min_refresh_interval
+            return self._keys.get(kid)
+
+
+def verify(token, jwks, issuer, audience, token_use="id", leeway=60, now=None):
+    """
+    Verifica firma, emisor, audiencia, uso y vencimiento de un JWT de Cognito.
+    Devuelve los claims o levanta InvalidToken.
+    """
+    try:
+        header_segment, payload_segment, signature_segment = token.split(".")
+        header = json.loads(_b64url_decode(header_segment))
+        claims = json.loads(_b64url_decode(payload_segment))
+        signature = _b64url_decode(signature_segment)
+        # JSON válido pero no objeto ("1", []) o kid que no es string: token mal formado, no un 500
+        if not isinstance(header, dict) or not isinstance(claims, dict):
+            raise ValueError("header and claims must be JSON objects")
+        if not isinstance(header.get("kid"), (str, type(None))):
+            raise ValueError("kid must be a string")
+    except (AttributeError, ValueError):
+        raise InvalidToken("Malformed token")
+
+    if header.get("alg") != "RS256":
+        raise InvalidToken("Unsupported algorithm")
+    key = jwks.get_key(header.get("kid"))
+    if key is None:
+        raise InvalidToken("Unknown signing key")
+    if not rsa_sha256_verify(f"{header_segment}.{payload_segment}".encode("ascii"), signature, *key):
+        raise InvalidToken("Invalid signature")
+
+    now = time.time() if now is None else now
+    if not isinstance(claims.get("exp"), (int, float)) or claims["exp"] < now - leeway:
+        raise InvalidToken("Token expired")
+    if claims.get("iss") != issuer:
+        raise InvalidToken("Invalid issuer")
+    if token_use and claims.get("token_use") != token_use:
+        raise InvalidToken("Invalid token_use")
+    # Los ID tokens traen el client id en aud; los access tokens en client_id
+    if audience and audience not in (claims.get("aud"), claims.get("client_id")):
+        raise InvalidToken("Invalid audience")
+    return claims
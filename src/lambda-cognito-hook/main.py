@@ -2,24 +2,75 @@ import json
 import urllib.parse
 import requests
 import os
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from lambda_runtime import Metrics
+
+import jwt_verify
 
 # Constantes de Cognito extraídas de las variables de entorno
 CLIENT_ID = os.environ['COGNITO_CLIENT_ID']
 REDIRECT_URI = os.environ['COGNITO_REDIRECT_URI']
 SPA_URL = os.environ['SPA_URL']
-COGNITO_TOKEN_URL = "https://"  + os.environ['COGNITO_DOMAIN'] + ".auth.us-east-1.amazoncognito.com/oauth2/token"
+REGION = os.environ.get('AWS_REGION', 'us-east-1')
+USER_POOL_ID = os.environ.get('COGNITO_USER_POOL_ID', '')
+COGNITO_TOKEN_URL = os.environ.get('COGNITO_TOKEN_URL') or (
+    "https://" + os.environ['COGNITO_DOMAIN'] + ".auth.us-east-1.amazoncognito.com/oauth2/token"
+)
+COGNITO_ISSUER = f"https://cognito-idp.{REGION}.amazonaws.com/{USER_POOL_ID}"
+COGNITO_JWKS_URL = os.environ.get('COGNITO_JWKS_URL') or f"{COGNITO_ISSUER}/.well-known/jwks.json"
+# (connect, read) en segundos para las llamadas a Cognito
+HTTP_TIMEOUT = (
+    float(os.environ.get('HTTP_CONNECT_TIMEOUT', '2')),
+    float(os.environ.get('HTTP_READ_TIMEOUT', '5')),
+)
+JWKS_TTL_SECONDS = int(os.environ.get('JWKS_TTL_SECONDS', '3600'))
+
+
+def _build_session():
+    """
+    Sesión HTTP compartida entre invocaciones: las conexiones TLS al dominio de
+    Cognito quedan abiertas en el pool y los logins siguientes no repiten el
+    handshake. Los errores de conexión se reintentan siempre (la request no
+    llegó); los 5xx sólo en GET, porque el code de autorización es de un uso.
+    """
+    retry = Retry(
+        total=3,
+        connect=3,
+        read=0,
+        status=2,
+        backoff_factor=0.2,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset({'GET'}),
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
 
+def _fetch_json(url):
+    response = session.get(url, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+session = _build_session()
+metrics = Metrics("cognito-post-auth")
+jwks = jwt_verify.JWKSCache(COGNITO_JWKS_URL, _fetch_json, ttl_seconds=JWKS_TTL_SECONDS)
+
+@metrics.handler
 def handler(event, context):
     try:
-        print(f"Event: {json.dumps(event)}")
-        
         # Manejar queryStringParameters que puede ser None
         query_params = event.get('queryStringParameters') or {}
         code = query_params.get('code')
         state = query_params.get('state')
-        
-        print(f"Received code: {code}")
-        print(f"Received state: {state}")
+
+        # El code y los tokens no se loguean: alcanzan para iniciar sesión
+        print(f"Callback received (code present: {bool(code)}, state present: {bool(state)})")
 
         if not code:
             return {
@@ -50,16 +101,15 @@ def handler(event, context):
             'client_id': CLIENT_ID
         }
 
-        print(f"Exchanging code for tokens with payload: {payload}")
-        
-        response = requests.post(
-            COGNITO_TOKEN_URL, 
-            data=payload, 
-            headers={'Content-Type': 'application/x-www-form-urlencoded'}
-        )
-        
+        with metrics.stage('token_exchange'):
+            response = session.post(
+                COGNITO_TOKEN_URL,
+                data=payload,
+                headers={'Content-Type': 'application/x-www-form-urlencoded'},
+                timeout=HTTP_TIMEOUT
+            )
+
         print(f"Token exchange response status: {response.status_code}")
-        print(f"Token exchange response: {response.text}")
 
         if response.status_code != 200:
             return {
@@ -70,7 +120,7 @@ def handler(event, context):
                 },
                 'body': json.dumps({
                     'success': False,
-                    'error': f'Failed to exchange code for tokens: {response.text}'
+                    'error': f'Failed to exchange code for tokens (status {response.status_code})'
                 })
             }
 
@@ -92,32 +142,33 @@ def handler(event, context):
                 })
             }
 
-        # Decodificar el ID token para obtener información del usuario
-        # Nota: En producción deberías verificar la firma del JWT
+        # Verificar firma y claims del ID token contra el JWKS del user pool (cacheado)
         user_info = {}
         if id_token:
             try:
-                # Decodificar el payload del JWT (sin verificar firma para simplicidad)
-                import base64
-                payload_part = id_token.split('.')[1]
-                # Agregar padding si es necesario
-                payload_part += '=' * (4 - len(payload_part) % 4)
-                decoded_payload = base64.urlsafe_b64decode(payload_part)
-                user_data = json.loads(decoded_payload)
-                
-                user_info = {
-                    'email': user_data.get('email', ''),
-                    'name': user_data.get('name', user_data.get('given_name', '')),
-                    'sub': user_data.get('sub', '')
-                }
-            except Exception as e:
-                print(f"Error decoding ID token: {e}")
-                user_info = {
-                    'email': 'user@example.com',
-                    'name': 'User',
-                    'sub': 'unknown'
+                with metrics.stage('verify_token'):
+                    user_data = jwt_verify.verify(id_token, jwks, issuer=COGNITO_ISSUER, audience=CLIENT_ID)
+            except jwt_verify.InvalidToken as e:
+                print(f"Rejected ID token: {e}")
+                return {
+                    'statusCode': 401,
+                    'headers': {
+                        'Access-Control-Allow-Origin': '*',
+                        'Content-Type': 'application/json'
+                    },
+                    'body': json.dumps({
+                        'success': False,
+                        'error': 'Invalid ID token'
+                    })
                 }
 
+            user_info = {
+                'email': user_data.get('email', ''),
+                'name': user_data.get('name', user_data.get('given_name', '')),
+                'sub': user_data.get('sub', '')
+            }
+            print(f"Authenticated user sub: {user_info['sub']}")
+
         # Retornar JSON con los tokens (no redirección)
         # Redirigir al frontend con los tokens en la URL
         redirect_url = f"{SPA_URL}?access_token={access_token}&id_token={id_token}&refresh_token={refresh_token}"
@@ -0,0 +1,249 @@
+import io
+import multiprocessing
+import os
+import threading
+import time
+
+from lambda_runtime import lazy_module
+
+# PyPDF2 se importa recién al extraer el primer PDF (los hits de cache no lo necesitan)
+PyPDF2 = lazy_module("PyPDF2")
+
+# Modos de extracción disponibles (variable de entorno EXTRACTION_MODE)
+MODE_FULL = "full"              # lee todas las páginas (hasta max_pages)
+MODE_EARLY_EXIT = "early_exit"  # corta apenas stop_when devuelve True
+# PyPDF2 cachea cada objeto que lee, incluidas las imágenes de páginas escaneadas;
+# los streams más grandes que esto se sueltan después de cada página
+RELEASE_STREAM_BYTES = 256 * 1024
+# Extracción en paralelo: mínimo de páginas por proceso para compensar el fork
+MIN_PAGES_PER_PROCESS = 8
+# Espera máxima por los procesos hijos antes de matarlos y extraer en serie
+PARALLEL_TIMEOUT_SECONDS = 20
+
+
+def available_cpus():
+    """vCPUs que puede usar el proceso (en Lambda dependen de la memoria asignada)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# Procesos hijos en curso entre todos los threads del handler (uno por vCPU)
+_process_slots = threading.BoundedSemaphore(available_cpus())
+
+
+class TooManyPages(ValueError):
+    """El documento supera el tope de páginas; no se extrajo texto."""
+
+    def __init__(self, page_count, limit):
+        super().__init__(f"El PDF tiene {page_count} páginas (máximo {limit})")
+        self.page_count = page_count
+        self.limit = limit
+
+
+class ParallelDeferred(Exception):
+    """
+    El documento se extraería en paralelo, pero quien llama pidió no hacer
+    fork desde acá (defer_parallel): hay que volver a extraerlo sin otros
+    threads corriendo.
+    """
+
+    def __init__(self, page_count):
+        super().__init__(f"Extracción en paralelo diferida ({page_count} páginas)")
+        self.page_count = page_count
+
+
+class Extraction:
+    """Resultado de extraer texto de un PDF."""
+
+    def __init__(self, text, pages_read, page_count, processes=1):
+        self.text = text
+        self.pages_read = pages_read
+        self.page_count = page_count
+        self.processes = processes
+
+    @property
+    def truncated(self):
+        return self.pages_read < self.page_count
+
+
+def _release_large_streams(reader):
+    """
+    Saca del cache de PyPDF2 los streams grandes (imágenes) ya leídos, para
+    que la memoria dependa de la página actual y no de las páginas leídas.
+    """
+    cache = getattr(reader, "resolved_objects", None)
+    if not cache:
+        return
+    for key, obj in list(cache.items()):
+        data = getattr(obj, "_data", None)
+        if data is not None and len(data) > RELEASE_STREAM_BYTES:
+            del cache[key]
+
+
+def iter_page_texts(reader, max_pages=None, start=0):
+    """
+    Itera el texto de las páginas de forma lazy: cada página se decodifica
+    recién cuando se pide, así cortar la iteración evita el resto del trabajo.
+    """
+    pages = reader.pages
+    limit = len(pages) if max_pages is None else min(len(pages), max_pages)
+    for index in range(start, limit):
+        text = pages[index].extract_text() or ""
+        _release_large_streams(reader)
+        yield text
+
+
+def _extract_range(reader, start, stop, conn):
+    """Proceso hijo: texto de las páginas [start, stop) enviado por el pipe."""
+    try:
+        # Un archivo en disco comparte el offset con el padre y los demás hijos:
+        # se reabre para tener uno propio. Un BytesIO ya es una copia del fork.
+        try:
+            reader.stream = open(f"/proc/self/fd/{reader.stream.fileno()}", "rb")
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            pass
+        conn.send(("ok", list(iter_page_texts(reader, stop, start))))
+    except BaseException as e:
+        conn.send(("error", repr(e)))
+    finally:
+        conn.close()
+
+
+def _stop(workers):
+    """Termina los hijos que siguen vivos (p. ej. trabados en un lock heredado del fork)."""
+    for process, receiver in workers:
+        receiver.close()
+        if process.is_alive():
+            process.terminate()
+            process.join(1)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+
+def _wanted_processes(pages, processes, min_parallel_pages):
+    """Procesos para extraer `pages` páginas; menos de 2 significa en serie."""
+    if processes <= 1 or pages < max(min_parallel_pages, 2):
+        return 1
+    return min(processes, -(-pages // MIN_PAGES_PER_PROCESS))
+
+
+def _parallel_page_texts(reader, start, stop, processes, min_parallel_pages, timeout=PARALLEL_TIMEOUT_SECONDS):
+    """
+    Reparte las páginas [start, stop) en rangos contiguos entre procesos hijos
+    y devuelve (textos en orden, procesos usados), o (None, 1) si no conviene
+    (pocas páginas o sin vCPUs libres) para que se extraigan en serie.
+    Usa fork + Pipe porque Lambda no tiene /dev/shm (multiprocessing.Pool y
+    ProcessPoolExecutor no funcionan ahí); el hijo hereda el reader ya parseado.
+    Un hijo puede quedar trabado en un lock que otro thread tenía tomado al
+    hacer el fork (el writer extrae en paralelo recién sin su pool corriendo,
+    ver defer_parallel), así que si los hijos no terminan en `timeout`
+    segundos se matan y se extrae en serie.
+    """
+    wanted = _wanted_processes(stop - start, processes, min_parallel_pages)
+    if wanted < 2:
+        return None, 1
+    pages = stop - start
+    acquired = 0
+    while acquired < wanted and _process_slots.acquire(blocking=False):
+        acquired += 1
+    try:
+        if acquired < 2:
+            return None, 1
+        context = multiprocessing.get_context("fork")
+        bounds = [start + pages * i // acquired for i in range(acquired + 1)]
+        workers = []
+        for first, last in zip(bounds, bounds[1:]):
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_extract_range, args=(reader, first, last, sender), daemon=True)
+            process.start()
+            sender.close()
+            workers.append((process, receiver))
+        texts = []
+        failure = None
+        deadline = time.monotonic() + timeout
+        try:
+            for process, receiver in workers:
+                if not receiver.poll(max(0.0, deadline - time.monotonic())):
+                    failure = f"sin respuesta después de {timeout} s"
+                    break
+                try:
+                    status, payload = receiver.recv()
+                except EOFError:
+                    status, payload = "error", f"el proceso terminó con código {process.exitcode}"
+                process.join()
+                if status == "ok":
+                    texts.extend(payload)
+                else:
+                    failure = failure or payload
+        finally:
+            _stop(workers)
+        if failure:
+            print(f"Extracción en paralelo fallida, se reintenta en serie: {failure}")
+            return None, 1
+        return texts, acquired
+    finally:
+        for _ in range(acquired):
+            _process_slots.release()
+
+
+def extract_text(stream, mode=MODE_EARLY_EXIT, stop_when=None, max_pages=None, max_page_count=None,
+                 processes=1, min_parallel_pages=16, parallel_timeout=PARALLEL_TIMEOUT_SECONDS,
+                 defer_parallel=False):
+    """
+    Extrae el texto de un PDF (stream seekable).
+    - stop_when(page_text) se llama después de cada página; si devuelve True y
+      el modo es early_exit, no se leen más páginas.
+    - max_pages limita la cantidad de páginas leídas en documentos enormes.
+    - max_page_count rechaza (TooManyPages) documentos con más páginas.
+    - processes > 1 permite repartir las páginas entre procesos cuando el
+      documento tiene al menos min_parallel_pages y hay vCPUs libres. En
+      early_exit la primera página se lee antes en serie (casi siempre
+      alcanza) y el resto se extrae en bloques de a lo sumo
+      max(min_parallel_pages, processes * MIN_PAGES_PER_PROCESS) páginas,
+      aplicando stop_when en orden entre bloques: el resultado es el mismo
+      que en serie y no se lee más de un bloque de más. Si los procesos no
+      terminan en parallel_timeout segundos se matan y las páginas se leen
+      en serie.
+    - defer_parallel=True levanta ParallelDeferred en lugar de hacer fork,
+      para quien extrae desde un pool de threads (un fork con otros threads
+      corriendo puede heredar un lock tomado).
+    El texto se arma con join para no pagar concatenaciones cuadráticas.
+    PyPDF2 lee el stream por offsets, así que puede ser un archivo en disco.
+    """
+    reader = PyPDF2.PdfReader(stream)
+    page_count = len(reader.pages)
+    if max_page_count is not None and page_count > max_page_count:
+        raise TooManyPages(page_count, max_page_count)
+    limit = page_count if max_pages is None else min(page_count, max_pages)
+    early_exit = mode == MODE_EARLY_EXIT and stop_when is not None
+
+    parts = []
+    start = 0
+    stopped = False
+    if early_exit and processes > 1 and limit:
+        parts.append(next(iter_page_texts(reader, 1)))
+        start = 1
+        stopped = stop_when(parts[0])
+    chunk = max(min_parallel_pages, processes * MIN_PAGES_PER_PROCESS) if early_exit else limit
+    used = 1
+    while not stopped and start < limit:
+        stop = min(limit, start + chunk)
+        if defer_parallel and _wanted_processes(stop - start, processes, min_parallel_pages) > 1:
+            raise ParallelDeferred(page_count)
+        texts, chunk_processes = _parallel_page_texts(reader, start, stop, processes, min_parallel_pages, parallel_timeout)
+        if texts is None:
+            # En serie la lectura ya es lazy: sigue página por página hasta el final
+            texts, stop = iter_page_texts(reader, limit, start), limit
+        used = max(used, chunk_processes)
+        for page_text in texts:
+            parts.append(page_text)
+            if early_exit and stop_when(page_text):
+                stopped = True
+                break
+        start = stop
+    # Mismo formato que antes: cada página seguida de un salto de línea
+    text = "\n".join(parts) + "\n" if parts else ""
+    return Extraction(text, len(parts), page_count, used)
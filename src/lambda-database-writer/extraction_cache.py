@@ -0,0 +1,78 @@
+"""
+Cache de resultados de extracción direccionado por contenido.
+
+La clave es el ETag del objeto en S3 (MD5 del contenido para uploads de una
+sola parte), así dos uploads del mismo PDF con distinto file_key comparten la
+entrada. La clave incluye una versión: al cambiar el parser o la configuración
+de extracción las entradas viejas dejan de leerse y expiran por el TTL de DynamoDB.
+"""
+import time
+
+CACHE_SK = "CACHE"
+STATS_PK = "CACHE#STATS"
+BATCH_GET_CHUNK = 100  # límite de DynamoDB por llamada
+
+
+class ExtractionCache:
+    def __init__(self, table_name, version, ttl_seconds, max_retries=5):
+        self.table_name = table_name
+        self.version = version
+        self.ttl_seconds = ttl_seconds
+        self.max_retries = max_retries
+
+    def key_for(self, etag):
+        if not etag:
+            return None
+        etag = etag.strip('"')
+        return f"CACHE#{self.version}#{etag}"
+
+    def get_many(self, dynamodb, keys):
+        """BatchGetItem de las claves pedidas. Devuelve {clave: data} sólo para los hits vigentes."""
+        keys = list(dict.fromkeys(k for k in keys if k))
+        found = {}
+        now = int(time.time())
+        for start in range(0, len(keys), BATCH_GET_CHUNK):
+            request_items = {
+                self.table_name: {
+                    "Keys": [{"PK": key, "SK": CACHE_SK} for key in keys[start:start + BATCH_GET_CHUNK]],
+                    "ProjectionExpression": "PK, #data, expiresAt",
+                    "ExpressionAttributeNames": {"#data": "data"},
+                }
+            }
+            for attempt in range(self.max_retries + 1):
+                response = dynamodb.batch_get_item(RequestItems=request_items)
+                for item in response.get("Responses", {}).get(self.table_name, []):
+                    # El TTL de DynamoDB borra con demora: ignorar entradas ya vencidas
+                    if int(item.get("expiresAt", 0)) > now:
+                        found[item["PK"]] = item["data"]
+                request_items = response.get("UnprocessedKeys") or {}
+                if not request_items:
+                    break
+                time.sleep(min(0.05 * (2 ** attempt), 1.0))
+        return found
+
+    def get(self, dynamodb, key):
+        return self.get_many(dynamodb, [key]).get(key) if key else None
+
+    def entry(self, key, data):
+        """Item a escribir en la tabla para guardar `data` bajo `key`."""
+        return {
+            "PK": key,
+            "SK": CACHE_SK,
+            "data": data,
+            "expiresAt": int(time.time()) + self.ttl_seconds,
+        }
+
+    def record_stats(self, dynamodb, hits, misses):
+        """Acumula contadores de hits/misses en un item de la tabla (un solo write por invocación)."""
+        if not hits and not misses:
+            return
+        print(f"Cache de extracción: {hits} hit(s), {misses} miss(es)")
+        try:
+            dynamodb.Table(self.table_name).update_item(
+                Key={"PK": STATS_PK, "SK": self.version},
+                UpdateExpression="ADD hits :h, misses :m",
+                ExpressionAttributeValues={":h": hits, ":m": misses},
+            )
+        except Exception as e:
+            print(f"Error actualizando estadísticas de cache: {str(e)}")
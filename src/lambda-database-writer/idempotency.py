@@ -0,0 +1,126 @@
+"""
+Registro de mensajes ya procesados, para que las entregas repetidas de SQS
+no vuelvan a descargar ni parsear el PDF.
+
+Cada objeto procesado tiene un item PK "IDEMP#<file_key>", SK
+"<versionId o ETag>#<versión del writer>". Antes de procesar se toma un
+lease con un put condicional (status IN_PROGRESS y vencimiento); al terminar
+se reemplaza por COMPLETED con el resultado. Una entrega repetida lee ese
+item (un BatchGetItem chico por batch) y:
+
+- COMPLETED: devuelve el resultado guardado sin hacer nada más;
+- IN_PROGRESS vigente: otra invocación lo está procesando, se reintenta
+  después (batchItemFailures);
+- IN_PROGRESS vencido: la invocación anterior murió, se toma el lease.
+
+La versión del writer (parser y configuración de extracción) va en la clave,
+así que después de un cambio de parser el mismo objeto se vuelve a procesar.
+"""
+import time
+import uuid
+
+IDEMPOTENCY_PREFIX = "IDEMP#"
+IN_PROGRESS = "IN_PROGRESS"
+COMPLETED = "COMPLETED"
+BATCH_GET_CHUNK = 100  # límite de DynamoDB por llamada
+
+
+class IdempotencyStore:
+    def __init__(self, table_name, version, lease_seconds, ttl_seconds, max_retries=5):
+        self.table_name = table_name
+        self.version = version
+        self.lease_seconds = lease_seconds
+        self.ttl_seconds = ttl_seconds
+        self.max_retries = max_retries
+
+    def key_for(self, file_key, object_version):
+        """Clave (PK, SK) del mensaje, o None si no trae versionId ni ETag."""
+        if not file_key or not object_version:
+            return None
+        # Los ETag de S3 vienen entre comillas en algunos eventos y en otros no
+        object_version = object_version.strip('"')
+        return f"{IDEMPOTENCY_PREFIX}{file_key}", f"{object_version}#{self.version}"
+
+    def get_many(self, dynamodb, keys):
+        """BatchGetItem de los registros pedidos. Devuelve {(PK, SK): item}."""
+        keys = list(dict.fromkeys(key for key in keys if key))
+        found = {}
+        for start in range(0, len(keys), BATCH_GET_CHUNK):
+            request_items = {
+                self.table_name: {
+                    "Keys": [{"PK": pk, "SK": sk} for pk, sk in keys[start:start + BATCH_GET_CHUNK]],
+                    "ProjectionExpression": "PK, SK, #status, leaseExpiresAt, #result",
+                    "ExpressionAttributeNames": {"#status": "status", "#result": "result"},
+                }
+            }
+            for attempt in range(self.max_retries + 1):
+                response = dynamodb.batch_get_item(RequestItems=request_items)
+                for item in response.get("Responses", {}).get(self.table_name, []):
+                    found[(item["PK"], item["SK"])] = item
+                request_items = response.get("UnprocessedKeys") or {}
+                if not request_items:
+                    break
+                time.sleep(min(0.05 * (2 ** attempt), 1.0))
+        return found
+
+    @staticmethod
+    def is_completed(record):
+        return bool(record) and record.get("status") == COMPLETED
+
+    @staticmethod
+    def is_leased(record, now=None):
+        """True si otra invocación tiene el lease y todavía no venció."""
+        return (
+            bool(record)
+            and record.get("status") == IN_PROGRESS
+            and int(record.get("leaseExpiresAt", 0)) > (now if now is not None else time.time())
+        )
+
+    def acquire(self, table, key, lease_seconds=None):
+        """
+        Toma el lease de `key` con un put condicional. Devuelve el id del lease,
+        o None si el mensaje ya se completó o lo tiene otra invocación.
+        """
+        # Import local: boto3 se carga recién con el primer cliente (ver lambda_runtime.aws)
+        from boto3.dynamodb.conditions import Attr
+
+        now = int(time.time())
+        lease = uuid.uuid4().hex
+        try:
+            table.put_item(
+                Item={
+                    "PK": key[0],
+                    "SK": key[1],
+                    "status": IN_PROGRESS,
+                    "lease": lease,
+                    "leaseExpiresAt": now + int(lease_seconds or self.lease_seconds),
+                    "expiresAt": now + self.ttl_seconds,
+                },
+                ConditionExpression=Attr("PK").not_exists()
+                | (Attr("status").eq(IN_PROGRESS) & Attr("leaseExpiresAt").lt(now)),
+            )
+        except Exception as e:
+            if getattr(e, "response", {}).get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                return None
+            raise
+        return lease
+
+    def completed(self, key, result):
+        """Item COMPLETED con el resultado, para escribir con batch_write_item después de la factura."""
+        return {
+            "PK": key[0],
+            "SK": key[1],
+            "status": COMPLETED,
+            "result": result,
+            "expiresAt": int(time.time()) + self.ttl_seconds,
+        }
+
+    def release(self, table, key, lease):
+        """Libera el lease después de un error transitorio, así el reintento de SQS no espera el vencimiento."""
+        from boto3.dynamodb.conditions import Attr
+
+        try:
+            table.delete_item(Key={"PK": key[0], "SK": key[1]}, ConditionExpression=Attr("lease").eq(lease))
+        except Exception as e:
+            # Si no se pudo, el lease vence solo
+            print(f"No se pudo liberar el lease de {key[0]}: {str(e)}")
@@ -0,0 +1,278 @@
+"""
+Parser de campos de facturas: una pasada con etiquetas y, sólo si hace falta,
+una búsqueda del valor sin etiqueta.
+
+Cada campo se define como un FieldExtractor con su patrón, una función que
+normaliza/valida el valor y otra que puntúa los candidatos. Los patrones con
+etiqueta de todos los campos se combinan en una única regex compilada, así
+agregar un campo nuevo no agrega otra pasada sobre el texto. Los matches sólo
+pueden empezar al inicio de una palabra y con alguno de los caracteres
+declarados en `starts`, lo que permite descartar rápido la mayoría de las
+posiciones del texto (y no probar cada número de las líneas de detalle).
+El score depende sólo de la etiqueta y la posición, así que los valores se
+normalizan recién al elegir, empezando por el mejor candidato.
+
+Los campos con etiqueta opcional (fecha, CUIT) también se reconocen sin
+etiqueta, pero un candidato con etiqueta siempre gana. Si a uno le falta un
+candidato válido después de la pasada, se busca sólo su valor desde el
+principio del texto y gana el primero válido. Esa segunda búsqueda es el
+precio de validar (fecha existente, dígito verificador del CUIT): una
+factura sin etiquetas se parsea más lento que con el parser original de 4
+regex, que tomaba el primer número con forma de fecha aunque no lo fuera
+(ver bench/bench_parser.py).
+"""
+import re
+from datetime import date
+from operator import mul
+
+# Subir este número cuando cambie el resultado del parser (invalida caches)
+PARSER_VERSION = "2"
+
+
+class Candidate:
+    __slots__ = ("value", "label", "position")
+
+    def __init__(self, value, label, position):
+        self.value = value
+        self.label = label
+        self.position = position
+
+
+class FieldExtractor:
+    """
+    - label / value: regex de la etiqueta (con un grupo nombrado `label`) y
+      del valor (grupo `value`); con optional_label el campo también se
+      reconoce sin etiqueta (ver InvoiceParser.parse).
+    - normalize(value) -> valor normalizado o None si el candidato no es válido.
+    - score(candidate) -> tupla comparable, sólo a partir de label y position;
+      gana el candidato válido con mayor score.
+    - starts: caracteres con los que puede empezar un match (sin distinguir
+      mayúsculas): las letras con etiqueta, los dígitos sin etiqueta.
+    """
+
+    def __init__(self, name, label, value, normalize, score, starts, optional_label=False):
+        self.name = name
+        self.label = label
+        self.value = value
+        self.normalize = normalize
+        self.score = score
+        self.starts = starts
+        self.optional_label = optional_label
+
+    def pattern(self):
+        return self.label + self.value
+
+
+# --- normalizadores ---
+
+def normalize_amount(raw):
+    """
+    Normaliza montos en formato argentino o anglosajón a "1234.56".
+    Con ambos separadores, el último es el decimal. Con uno solo, se toma como
+    decimal si lo siguen 1 o 2 dígitos; si no, es separador de miles.
+    """
+    raw = raw.strip(".,")
+    if not raw:
+        return None
+    last_dot, last_comma = raw.rfind("."), raw.rfind(",")
+    if last_dot >= 0 and last_comma >= 0:
+        decimal_sep = "." if last_dot > last_comma else ","
+        thousands_sep = "," if decimal_sep == "." else "."
+        integer, _, decimals = raw.replace(thousands_sep, "").rpartition(decimal_sep)
+    else:
+        sep = "." if last_dot >= 0 else ","
+        parts = raw.split(sep)
+        if len(parts) == 2 and 1 <= len(parts[1]) <= 2:
+            integer, decimals = parts
+        else:
+            integer, decimals = "".join(parts), ""
+    if not integer.isdigit() or (decimals and not decimals.isdigit()):
+        return None
+    return f"{int(integer)}.{decimals.ljust(2, '0')}" if decimals else f"{int(integer)}.00"
+
+
+def normalize_date(raw):
+    """dd/mm/aaaa, dd-mm-aa, etc. -> aaaa-mm-dd. Devuelve None si la fecha no existe."""
+    day, month, year = map(int, raw.replace("-", "/").split("/"))
+    if year < 100:
+        year += 2000
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+_CUIT_WEIGHTS = (5, 4, 3, 2, 7, 6, 5, 4, 3, 2)
+# Los dígitos se ponderan como bytes ASCII; se descuenta el aporte de los "0"
+_CUIT_ZERO = ord("0") * sum(_CUIT_WEIGHTS)
+
+
+def cuit_is_valid(digits):
+    if len(digits) != 11 or not digits.isdigit():
+        return False
+    total = sum(map(mul, digits[:10].encode(), _CUIT_WEIGHTS)) - _CUIT_ZERO
+    check = 11 - total % 11
+    if check == 11:
+        check = 0
+    return check != 10 and check == int(digits[10])
+
+
+def normalize_cuit(raw):
+    digits = raw.replace("-", "")
+    if not cuit_is_valid(digits):
+        return None
+    return f"{digits[:2]}-{digits[2:10]}-{digits[10]}"
+
+
+def normalize_supplier(raw):
+    value = " ".join(raw.split()).strip(" .")
+    if raw.rstrip().endswith("."):
+        # Conservar el punto final de "S.A." / "S.R.L."
+        value += "."
+    return value or None
+
+
+# --- puntuación de candidatos ---
+
+def _total_score(candidate):
+    label = (candidate.label or "").lower()
+    if label.replace(" ", "").startswith("sub"):
+        priority = 0
+    elif "total" in label:
+        priority = 2
+    else:
+        priority = 1
+    # Entre los "total", el último suele ser el total final (después de subtotales e IVA)
+    return (priority, candidate.position)
+
+
+def _date_score(candidate):
+    # Preferir la fecha etiquetada como "fecha"; si no, la primera del documento
+    return (candidate.label is not None, -candidate.position)
+
+
+def _cuit_score(candidate):
+    return (candidate.label is not None, -candidate.position)
+
+
+_SUPPLIER_LABELS = {"razón social": 3, "razon social": 3, "proveedor": 2, "empresa": 1}
+
+
+def _supplier_score(candidate):
+    label = " ".join(candidate.label.lower().split())
+    return (_SUPPLIER_LABELS.get(label, 0), -candidate.position)
+
+
+FIELDS = [
+    FieldExtractor(
+        "total",
+        r"(?P<label>sub\s*-?\s*total|importe\s+total|total|importe)[^\d\n]{0,40}?\n?[^\d\n]{0,10}?",
+        r"(?P<value>\d{1,3}(?:[.,]\d{3})+(?:[.,]\d{1,2})?|\d+(?:[.,]\d{1,2})?)(?![\d-])",
+        normalize_amount,
+        _total_score,
+        starts="sti",
+    ),
+    FieldExtractor(
+        "fecha",
+        r"(?P<label>fecha)[^\d\n]{0,30}",
+        r"(?<!\d)(?P<value>\d{1,2}[/-]\d{1,2}[/-](?:\d{4}|\d{2}))(?![\d/-])",
+        normalize_date,
+        _date_score,
+        starts="f0123456789",
+        optional_label=True,
+    ),
+    FieldExtractor(
+        "cuit",
+        r"(?P<label>C\.?\s?U\.?\s?I\.?\s?T\.?)[^\d\n]{0,10}",
+        r"(?<![\d-])(?P<value>\d{2}-\d{8}-\d|\d{11})(?![\d-])",
+        normalize_cuit,
+        _cuit_score,
+        starts="c0123456789",
+        optional_label=True,
+    ),
+    FieldExtractor(
+        "proveedor",
+        r"(?P<label>raz[oó]n\s+social|proveedor|empresa)[ \t]*:?[ \t]*",
+        r"(?P<value>[A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑ .&]*)",
+        normalize_supplier,
+        _supplier_score,
+        starts="rpe",
+    ),
+]
+
+
+def _prefix(starts):
+    # Primero el lookahead: descarta la posición con una comparación de caracteres,
+    # el lookbehind (inicio de palabra) se evalúa sólo si pasa
+    return f"(?=[{re.escape(''.join(sorted(starts)))}])(?<!\\w)"
+
+
+class InvoiceParser:
+    def __init__(self, fields):
+        self.fields = {field.name: field for field in fields}
+        self.regex = self._compile(fields)
+        self._groups = self._group_indexes(self.regex)
+        # Sólo el valor, para los campos que pueden venir sin etiqueta
+        self._unlabeled = {
+            field.name: re.compile(_prefix({c for c in field.starts if c.isdigit()}) + field.value, re.IGNORECASE)
+            for field in fields if field.optional_label
+        }
+
+    @staticmethod
+    def _compile(fields):
+        alternatives = []
+        for field in fields:
+            # Prefijar los grupos internos con el nombre del campo para que no choquen
+            pattern = re.sub(
+                r"\(\?P<(\w+)>", lambda m, n=field.name: f"(?P<{n}__{m.group(1)}>", field.pattern()
+            )
+            alternatives.append(f"(?P<{field.name}>{pattern})")
+        starts = {c for field in fields for c in field.starts.lower() if not c.isdigit()}
+        return re.compile(_prefix(starts) + "(?:" + "|".join(alternatives) + ")", re.IGNORECASE)
+
+    def _group_indexes(self, regex):
+        """lastindex del match (el grupo del campo, que cierra último) -> (campo, grupo value, grupo label)."""
+        index = regex.groupindex
+        return {
+            index[name]: (name, index[f"{name}__value"], index[f"{name}__label"])
+            for name in self.fields
+        }
+
+    def candidates(self, text):
+        """Agrupa por campo los candidatos con etiqueta (sin normalizar) de la pasada de la regex."""
+        found = {}
+        for match in self.regex.finditer(text):
+            name, value, label = self._groups[match.lastindex]
+            found.setdefault(name, []).append(Candidate(match.group(value), match.group(label), match.start()))
+        return found
+
+    def parse(self, text):
+        data = {}
+        for name, candidates in self.candidates(text).items():
+            field = self.fields[name]
+            if len(candidates) > 1:
+                # sorted es estable: entre scores iguales gana el primero, como con max
+                candidates.sort(key=field.score, reverse=True)
+            for candidate in candidates:
+                value = field.normalize(candidate.value)
+                if value is not None:
+                    data[name] = value
+                    break
+        for name, regex in self._unlabeled.items():
+            if name in data:
+                continue
+            # Sin etiqueta gana el primero del documento: se corta en el primer valor válido
+            normalize = self.fields[name].normalize
+            for match in regex.finditer(text):
+                value = normalize(match.group("value"))
+                if value is not None:
+                    data[name] = value
+                    break
+        return data
+
+
+default_parser = InvoiceParser(FIELDS)
+
+
+def parse(text):
+    return default_parser.parse(text)
@@ -1,121 +1,712 @@
-import boto3
+import contextlib
+import gzip
 import json
 import os
 import io
-import re
-import PyPDF2
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 
-s3 = boto3.client("s3")
-dynamodb = boto3.resource("dynamodb")
+from lambda_runtime import Metrics, aggregates, aws, etags, invoice_keys, text_index
+
+import extraction
+import extraction_cache
+import idempotency
+import invoice_parser
+
+# Cantidad de PDFs que se descargan y parsean en paralelo dentro de un batch
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", "8"))
+# Reintentos de batch_write_item cuando DynamoDB devuelve UnprocessedItems
+BATCH_WRITE_MAX_RETRIES = int(os.environ.get("BATCH_WRITE_MAX_RETRIES", "5"))
+BATCH_WRITE_CHUNK = 25  # límite de DynamoDB por llamada
+# "early_exit" deja de leer páginas cuando ya se encontraron todos los campos
+EXTRACTION_MODE = os.environ.get("EXTRACTION_MODE", extraction.MODE_EARLY_EXIT)
+# Tope de páginas a leer por documento (0 = sin tope)
+MAX_PDF_PAGES = int(os.environ.get("MAX_PDF_PAGES", "50")) or None
+# Procesos para extraer páginas en paralelo ("auto" = vCPUs disponibles, 1 = en serie);
+# sólo se usan con documentos de al menos PARALLEL_MIN_PAGES páginas
+_processes = os.environ.get("EXTRACTION_PROCESSES", "auto")
+EXTRACTION_PROCESSES = extraction.available_cpus() if _processes == "auto" else max(1, int(_processes))
+PARALLEL_MIN_PAGES = int(os.environ.get("PARALLEL_MIN_PAGES", "16"))
+# Si los procesos hijos no terminan en este tiempo se matan y el PDF se extrae en serie
+PARALLEL_TIMEOUT_SECONDS = float(os.environ.get("PARALLEL_TIMEOUT_SECONDS", "20"))
+# Documentos con más páginas que esto se rechazan sin extraer (0 = sin tope)
+MAX_PAGE_COUNT = int(os.environ.get("MAX_PAGE_COUNT", "0")) or None
+# Límites de tamaño; el máximo es el mismo que aplica invoice-processor antes de encolar
+MIN_PDF_BYTES = int(os.environ.get("MIN_PDF_BYTES", "100"))
+MAX_PDF_BYTES = int(os.environ.get("MAX_PDF_BYTES", str(50 * 1024 * 1024)))
+# Por encima de este tamaño el PDF se descarga a /tmp en lugar de a memoria
+SPOOL_THRESHOLD_BYTES = int(os.environ.get("SPOOL_THRESHOLD_BYTES", str(8 * 1024 * 1024)))
+SPOOL_DIR = os.environ.get("SPOOL_DIR", tempfile.gettempdir())
+# Archivos grandes procesándose a la vez (acota el uso de /tmp a ~N * MAX_PDF_BYTES)
+LARGE_FILE_CONCURRENCY = int(os.environ.get("LARGE_FILE_CONCURRENCY", "2"))
+TARGET_FIELDS = ("total", "fecha", "cuit", "proveedor")
+# Días que se conserva un resultado en el cache de extracción (TTL de DynamoDB)
+CACHE_TTL_DAYS = int(os.environ.get("CACHE_TTL_DAYS", "30"))
+CACHE_ENABLED = os.environ.get("CACHE_ENABLED", "true").lower() == "true"
+# Texto extraído comprimido en S3 (junto al PDF, bajo TEXT_PREFIX) e índice de búsqueda
+STORE_TEXT = os.environ.get("STORE_TEXT", "true").lower() == "true"
+TEXT_PREFIX = os.environ.get("TEXT_PREFIX", "text/")
+# Registro de mensajes procesados por objeto de S3 (ver idempotency.py)
+IDEMPOTENCY_ENABLED = os.environ.get("IDEMPOTENCY_ENABLED", "true").lower() == "true"
+# Vencimiento del lease cuando no hay contexto de Lambda (timeout de 60 s + margen);
+# con contexto vence cuando termina la invocación más LEASE_MARGIN_SECONDS
+LEASE_SECONDS = int(os.environ.get("LEASE_SECONDS", "70"))
+LEASE_MARGIN_SECONDS = int(os.environ.get("LEASE_MARGIN_SECONDS", "10"))
+# Cubre la retención máxima de SQS: una entrega repetida siempre encuentra el registro
+IDEMPOTENCY_TTL_DAYS = int(os.environ.get("IDEMPOTENCY_TTL_DAYS", "14"))
+# Intentos de reemplazar una factura existente si alguien la edita mientras tanto
+REWRITE_MAX_ATTEMPTS = 3
+
+s3 = aws.client("s3", max_pool_connections=max(MAX_WORKERS, aws.MAX_POOL_CONNECTIONS))
+dynamodb = aws.resource("dynamodb")
 TABLE = os.environ["TABLE_NAME"]
+metrics = Metrics("database-writer")
+_large_files = threading.BoundedSemaphore(LARGE_FILE_CONCURRENCY)
+
+# La versión del cache cambia con el parser y con la configuración de extracción
+cache = extraction_cache.ExtractionCache(
+    TABLE,
+    # "-text": las entradas guardan text_key, necesario para indexar los hits
+    version=f"v{invoice_parser.PARSER_VERSION}-{EXTRACTION_MODE}-{MAX_PDF_PAGES or 0}" + ("-text" if STORE_TEXT else ""),
+    ttl_seconds=CACHE_TTL_DAYS * 86400,
+)
+# Misma versión que el cache: con otro parser el mismo objeto se vuelve a procesar
+processed = idempotency.IdempotencyStore(
+    TABLE, version=cache.version, lease_seconds=LEASE_SECONDS, ttl_seconds=IDEMPOTENCY_TTL_DAYS * 86400,
+)
 
 
 # --- helpers para detectar campos comunes ---
 def parse_invoice_text(text):
-    data = {}
+    """Extrae total, fecha (ISO), CUIT y proveedor en una sola pasada (ver invoice_parser)."""
+    return invoice_parser.parse(text)
 
-    # Buscar monto total (números con coma o punto)
-    match_total = re.search(r"(total|importe)\D+([\d.,]+)", text, re.IGNORECASE)
-    if match_total:
-        data["total"] = match_total.group(2).replace(",", ".")
 
-    # Buscar fecha
-    match_date = re.search(r"(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})", text)
-    if match_date:
-        data["fecha"] = match_date.group(1)
+def _fields_found_tracker():
+    """
+    Devuelve un stop_when para extraction.extract_text que acumula los campos
+    encontrados página por página y corta cuando están todos.
+    """
+    found = set()
 
-    # Buscar CUIT
-    match_cuit = re.search(r"(?:CUIT|C.U.I.T)\D*(\d{2}-\d{8}-\d)", text, re.IGNORECASE)
-    if match_cuit:
-        data["cuit"] = match_cuit.group(1)
+    def stop_when(page_text):
+        found.update(parse_invoice_text(page_text))
+        return found.issuperset(TARGET_FIELDS)
 
-    # Buscar proveedor
-    match_prov = re.search(r"(?:razón social|proveedor|empresa):?\s*([A-ZÁÉÍÓÚÑ ]+)", text, re.IGNORECASE)
-    if match_prov:
-        data["proveedor"] = match_prov.group(1).strip()
+    return stop_when
 
-    return data
 
+def _error(status_code, key, message, **extra):
+    return {
+        "statusCode": status_code,
+        "body": json.dumps({"error": message, "file_key": key, **extra})
+    }
 
-def handler(event, context):
+
+def _build_item(key, user_id, data):
+    return {
+        "PK": key,                 # must match your Dynamo table PK
+        "SK": "META#1",
+        "file_key": key,
+        "userId": user_id,
+        # groupKey (fecha#file_key), supplierKey y cuitKey: claves de los GSI de consulta
+        **invoice_keys.access_keys(user_id, key, data),
+        "data": data
+    }
+
+
+def _index_items(user_id, key, invoice_terms):
+    """Postings de la factura más el item con sus términos (text_index.terms_record)."""
+    if not user_id:
+        return []
+    return text_index.postings(user_id, key, invoice_terms) + [text_index.terms_record(key, invoice_terms)]
+
+
+def _preserve_edits(item, previous):
     """
-    Procesa mensajes de SQS que contienen información de archivos PDF a procesar.
-    El evento puede venir directamente de SQS (con Records) o como payload directo.
+    Combina la factura recién extraída con la que ya estaba: los campos que el
+    usuario editó con invoice-data-updater (`editedFields`) quedan con su
+    valor y `version` se mantiene, para no romper su control de concurrencia.
     """
-    try:
-        # Si el evento viene de SQS, extraer el mensaje del formato SQS
-        if "Records" in event and len(event["Records"]) > 0:
-            # Formato de evento SQS
-            sqs_record = event["Records"][0]
-            message_body = json.loads(sqs_record["body"])
-            bucket = message_body["bucket"]
-            key = message_body["key"]
-            user_id = message_body.get("userId")
+    if not previous:
+        return item
+    edited = previous.get("editedFields") or set()
+    data = dict(item["data"])
+    current = previous.get("data") or {}
+    for field in edited:
+        if field in current:
+            data[field] = current[field]
         else:
-            # Formato directo (para compatibilidad con invocación directa)
-            bucket = event["bucket"]
-            key = event["key"]
-            user_id = event.get("userId")
-        
-        print(f"Procesando archivo: {key} del bucket: {bucket} para usuario: {user_id}")
-        
-        # Descargar el PDF desde S3
-        pdf_stream = io.BytesIO()
-        s3.download_fileobj(bucket, key, pdf_stream)
-        pdf_stream.seek(0)
-        
-        # Verificar el tamaño del archivo
-        file_size = pdf_stream.getbuffer().nbytes
-        if file_size < 100:  # PDFs válidos son generalmente más grandes
-            return {
-                "statusCode": 400,
-                "body": json.dumps({
-                    "error": f"Archivo muy pequeño ({file_size} bytes), posiblemente corrupto",
-                    "file_key": key
-                })
-            }
+            data.pop(field, None)
+    merged = _build_item(item["PK"], item["userId"], data)
+    if edited:
+        merged["editedFields"] = set(edited)
+    if "version" in previous:
+        merged["version"] = previous["version"]
+    return merged
+
+
+def _put_preserving_edits(table, item, previous):
+    """
+    Reemplaza una factura existente sólo si no cambió desde que se leyó
+    (misma `version`); si el usuario la editó en el medio, se vuelve a leer y
+    a combinar. Devuelve (item escrito, versión anterior) para los agregados.
+    """
+    from boto3.dynamodb.conditions import Attr
+
+    for _ in range(REWRITE_MAX_ATTEMPTS):
+        merged = _preserve_edits(item, previous)
+        if previous is None:
+            condition = Attr("PK").not_exists()
+        elif "version" in previous:
+            condition = Attr("version").eq(previous["version"])
+        else:
+            condition = Attr("PK").exists() & Attr("version").not_exists()
+        try:
+            with metrics.stage("put_item"):
+                table.put_item(Item=merged, ConditionExpression=condition)
+            return merged, previous
+        except Exception as e:
+            if getattr(e, "response", {}).get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+        previous = table.get_item(Key={"PK": item["PK"], "SK": "META#1"}, ConsistentRead=True).get("Item")
+    raise RuntimeError(f"La factura {item['PK']} cambió {REWRITE_MAX_ATTEMPTS} veces durante la escritura")
+
+
+def _lease_seconds(context):
+    """El lease dura lo que le queda a la invocación: después de eso el intento ya no puede escribir."""
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        return context.get_remaining_time_in_millis() // 1000 + LEASE_MARGIN_SECONDS
+    return LEASE_SECONDS
+
+
+def _stored_response(record):
+    """Resultado guardado en el registro COMPLETED (DynamoDB devuelve los números como Decimal)."""
+    result = record.get("result") or {}
+    return {"statusCode": int(result.get("statusCode", 200)), "body": result.get("body", "")}
+
+
+@contextlib.contextmanager
+def _download(bucket, key, file_size):
+    """
+    Descarga el PDF a un stream seekable para PyPDF2: en memoria si es chico,
+    o a un archivo temporal de /tmp (se borra al salir) si supera
+    SPOOL_THRESHOLD_BYTES, para que la memoria no crezca con el tamaño.
+    """
+    if file_size <= SPOOL_THRESHOLD_BYTES:
+        stream = io.BytesIO()
+        with metrics.stage("download"):
+            s3.download_fileobj(bucket, key, stream)
+        stream.seek(0)
+        yield stream
+        return
+    # Import local: boto3 se carga recién con el primer cliente (ver lambda_runtime.aws)
+    from boto3.s3.transfer import TransferConfig
+
+    with _large_files, tempfile.TemporaryFile(dir=SPOOL_DIR) as stream:
+        metrics.add("spooled", 1)
+        with metrics.stage("download"):
+            # Pocas partes en vuelo, así el buffer de s3transfer también queda acotado
+            s3.download_fileobj(bucket, key, stream, Config=TransferConfig(max_concurrency=4, max_io_queue=16))
+        stream.seek(0)
+        yield stream
+
+
+def _store_text(bucket, key, text):
+    """
+    Guarda el texto extraído comprimido con gzip en S3 y devuelve su key, o
+    None si falla (la factura se escribe igual, sólo queda sin texto).
+    """
+    text_key = f"{TEXT_PREFIX}{key}.txt.gz"
+    try:
+        with metrics.stage("store_text"):
+            s3.put_object(
+                Bucket=bucket,
+                Key=text_key,
+                Body=gzip.compress(text.encode("utf-8")),
+                ContentType="text/plain; charset=utf-8",
+                ContentEncoding="gzip",
+            )
+    except Exception as e:
+        print(f"Error guardando texto de {key}: {str(e)}")
+        return None
+    return text_key
+
+
+def _load_text(bucket, text_key):
+    """Texto guardado por _store_text ("" si no está)."""
+    if not text_key:
+        return ""
+    try:
+        with metrics.stage("load_text"):
+            body = s3.get_object(Bucket=bucket, Key=text_key)["Body"].read()
+        return gzip.decompress(body).decode("utf-8")
+    except Exception as e:
+        print(f"Error leyendo texto {text_key}: {str(e)}")
+        return ""
+
+
+def _process_file(bucket, key, user_id, cached=None, file_size=None, defer_parallel=False):
+    """
+    Descarga y parsea un PDF. No escribe en DynamoDB.
+    Si `cached` trae el resultado de un PDF idéntico, no se descarga nada: el
+    texto se lee del que guardó ese PDF y se copia bajo este file_key (el PDF
+    pudo subirlo otro usuario, su text_key no se expone en esta factura).
+    `file_size` viene en el mensaje de invoice-processor; si falta se pide con HEAD.
+    Con `defer_parallel` (desde el pool de threads) un PDF que se extraería en
+    paralelo levanta extraction.ParallelDeferred en lugar de hacer fork.
+    Devuelve (respuesta, item, postings): item es None si el archivo fue
+    rechazado; postings son los items del índice de búsqueda (text_index),
+    incluido el que guarda los términos de la factura.
+    """
+    if cached is not None:
+        print(f"Cache hit para archivo: {key} del usuario: {user_id}")
+        data = dict(cached)
+        source_text_key = data.pop("text_key", None)
+        postings = []
+        if STORE_TEXT:
+            text = _load_text(bucket, source_text_key)
+            text_key = _store_text(bucket, key, text) if text else None
+            if text_key:
+                data["text_key"] = text_key
+            postings = _index_items(user_id, key, text_index.terms(text))
+        item = _build_item(key, user_id, data)
+        return {"statusCode": 200, "body": json.dumps(data, default=str)}, item, postings
+
+    print(f"Procesando archivo: {key} del bucket: {bucket} para usuario: {user_id}")
 
-        # Extraer texto con PyPDF2
-        all_text = ""
+    # Verificar el tamaño antes de descargar
+    if file_size is None:
+        with metrics.stage("head"):
+            file_size = s3.head_object(Bucket=bucket, Key=key)["ContentLength"]
+    metrics.add("bytes", file_size, unit="Bytes")
+    if file_size < MIN_PDF_BYTES:  # PDFs válidos son generalmente más grandes
+        return _error(400, key, f"Archivo muy pequeño ({file_size} bytes), posiblemente corrupto"), None, []
+    if MAX_PDF_BYTES and file_size > MAX_PDF_BYTES:
+        return _error(413, key, f"Archivo muy grande ({file_size} bytes, máximo {MAX_PDF_BYTES})", file_size=file_size), None, []
+
+    # Descargar el PDF desde S3 y extraer texto con PyPDF2
+    with _download(bucket, key, file_size) as pdf_stream:
         try:
-            pdf_reader = PyPDF2.PdfReader(pdf_stream)
-            for page in pdf_reader.pages:
-                all_text += page.extract_text() + "\n"
+            with metrics.stage("extract"):
+                result = extraction.extract_text(
+                    pdf_stream,
+                    mode=EXTRACTION_MODE,
+                    stop_when=_fields_found_tracker(),
+                    max_pages=MAX_PDF_PAGES,
+                    max_page_count=MAX_PAGE_COUNT,
+                    processes=EXTRACTION_PROCESSES,
+                    min_parallel_pages=PARALLEL_MIN_PAGES,
+                    parallel_timeout=PARALLEL_TIMEOUT_SECONDS,
+                    defer_parallel=defer_parallel,
+                )
+        except extraction.ParallelDeferred:
+            raise
+        except extraction.TooManyPages as too_many:
+            return _error(413, key, str(too_many), file_size=file_size, page_count=too_many.page_count), None, []
         except Exception as pdf_error:
-            return {
-                "statusCode": 400,
-                "body": json.dumps({
-                    "error": f"Error al leer PDF: {str(pdf_error)}",
-                    "file_key": key,
-                    "file_size": file_size
-                })
-            }
+            return _error(400, key, f"Error al leer PDF: {str(pdf_error)}", file_size=file_size), None, []
+    metrics.add("pages", result.pages_read)
+    metrics.add("extract_processes", result.processes)
 
-        # Parsear datos relevantes
+    # Parsear datos relevantes
+    all_text = result.text
+    with metrics.stage("parse"):
         extracted_data = parse_invoice_text(all_text)
-        extracted_data["file_size"] = file_size
-        extracted_data["text_length"] = len(all_text)
+    extracted_data["file_size"] = file_size
+    extracted_data["text_length"] = len(all_text)
+    extracted_data["page_count"] = result.page_count
 
-        # Guardar en DynamoDB
-        table = dynamodb.Table(TABLE)
-        table.put_item(
-            Item={
-                "PK": key,                 # must match your Dynamo table PK
-                "SK": "META#1",
-                "file_key": key,
-                "userId": user_id,
-                "groupKey": "group_key",
-                "data": json.loads(json.dumps(extracted_data), parse_float=Decimal)
-            }
-        )
+    postings = []
+    if STORE_TEXT:
+        text_key = _store_text(bucket, key, all_text)
+        if text_key:
+            extracted_data["text_key"] = text_key
+        postings = _index_items(user_id, key, text_index.terms(all_text))
 
-        return {
-            "statusCode": 200,
-            "body": json.dumps(extracted_data)
+    item = _build_item(key, user_id, json.loads(json.dumps(extracted_data), parse_float=Decimal))
+    return {"statusCode": 200, "body": json.dumps(extracted_data)}, item, postings
+
+
+def _write_chunk(chunk):
+    """batch_write_item de hasta 25 requests (PutRequest o DeleteRequest); devuelve las que quedaron sin escribir."""
+    request_items = {TABLE: chunk}
+    for attempt in range(BATCH_WRITE_MAX_RETRIES + 1):
+        try:
+            response = dynamodb.batch_write_item(RequestItems=request_items)
+        except Exception as e:
+            print(f"Error en batch_write_item: {str(e)}")
+            break
+        request_items = response.get("UnprocessedItems") or {}
+        if not request_items:
+            break
+        if attempt < BATCH_WRITE_MAX_RETRIES:
+            time.sleep(min(0.05 * (2 ** attempt), 1.0))
+    return request_items.get(TABLE, [])
+
+
+def _batch_write(items, deletes=()):
+    """
+    Escribe items (y borra las claves de `deletes`) con batch_write_item en
+    bloques de 25, reintentando UnprocessedItems con backoff exponencial. Con
+    los postings del índice un batch son decenas de bloques, así que se
+    escriben en paralelo. Devuelve los items (o claves) que no se pudieron escribir.
+    """
+    requests = [{"PutRequest": {"Item": item}} for item in items]
+    requests += [{"DeleteRequest": {"Key": key}} for key in deletes]
+    chunks = [requests[start:start + BATCH_WRITE_CHUNK] for start in range(0, len(requests), BATCH_WRITE_CHUNK)]
+    if len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(chunks))) as pool:
+            unprocessed = list(pool.map(_write_chunk, chunks))
+    else:
+        unprocessed = [_write_chunk(chunk) for chunk in chunks]
+    return [
+        request["PutRequest"]["Item"] if "PutRequest" in request else request["DeleteRequest"]["Key"]
+        for chunk in unprocessed for request in chunk
+    ]
+
+
+def _get_existing_invoices(keys):
+    """
+    Lee las versiones actuales de las facturas que se van a escribir, para
+    calcular el delta de los agregados y conservar las ediciones del usuario.
+    Devuelve {file_key: item}.
+    """
+    return _get_items(keys, "META#1", "PK, userId, #data, #version, editedFields",
+                      {"#data": "data", "#version": "version"})
+
+
+def _get_terms_records(keys):
+    """Términos indexados de estas facturas (text_index.terms_record). Devuelve {file_key: item}."""
+    return _get_items(keys, text_index.TERMS_SK, "PK, #terms", {"#terms": "terms"})
+
+
+def _get_items(keys, sort_key, projection, names):
+    """BatchGetItem de (file_key, sort_key) en bloques de 100. Devuelve {file_key: item}."""
+    keys = list(dict.fromkeys(keys))
+    found = {}
+    for start in range(0, len(keys), 100):
+        request_items = {
+            TABLE: {
+                "Keys": [{"PK": key, "SK": sort_key} for key in keys[start:start + 100]],
+                "ProjectionExpression": projection,
+                "ExpressionAttributeNames": names,
+            }
         }
-        
+        for attempt in range(BATCH_WRITE_MAX_RETRIES + 1):
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response.get("Responses", {}).get(TABLE, []):
+                found[item["PK"]] = item
+            request_items = response.get("UnprocessedKeys") or {}
+            if not request_items:
+                break
+            time.sleep(min(0.05 * (2 ** attempt), 1.0))
+    return found
+
+
+def _update_aggregates(deltas):
+    """
+    Best-effort, después de escribir las facturas (ver lambda_runtime.aggregates):
+    un error no reintenta el mensaje, el desvío lo corrige tools/rebuild_aggregates.py.
+    """
+    aggregates.apply_deltas(dynamodb.Table(TABLE), deltas, metrics=metrics)
+
+
+def _bump_versions(user_ids):
+    """Invalida los ETags de invoice-getter / report-generator de estos usuarios."""
+    try:
+        etags.bump(dynamodb.Table(TABLE), user_ids)
+    except Exception as e:
+        print(f"Error actualizando versión de usuario: {str(e)}")
+
+
+def _handle_sqs_batch(records, context=None):
+    """
+    Procesa todos los mensajes del batch de SQS. Descarga y parseo corren en un
+    pool de threads acotado; la escritura se hace con batch_write_item.
+    Sólo los mensajes con error transitorio se reportan en batchItemFailures
+    para que SQS los vuelva a entregar. Los archivos rechazados (400) se descartan.
+    Los PDFs cuyo ETag ya está en el cache de extracción no se descargan.
+    Los mensajes de un objeto ya procesado (entregas repetidas de SQS) se
+    confirman con el resultado guardado, leyendo sólo su registro (ver idempotency.py);
+    los que otra invocación está procesando se reintentan más tarde.
+    """
+    failures = []
+    jobs = []
+    for record in records:
+        try:
+            message_body = json.loads(record["body"])
+            jobs.append({
+                "message_id": record["messageId"],
+                "bucket": message_body["bucket"],
+                "key": message_body["key"],
+                "user_id": message_body.get("userId"),
+                "size": message_body.get("size"),
+                "cache_key": cache.key_for(message_body.get("etag")) if CACHE_ENABLED else None,
+                "processed_key": processed.key_for(
+                    message_body["key"], message_body.get("versionId") or message_body.get("etag")
+                ) if IDEMPOTENCY_ENABLED else None,
+                "lease": None,
+            })
+        except Exception as e:
+            # Mensaje mal formado: reintentarlo no lo arregla, SQS lo termina moviendo a la DLQ
+            print(f"Mensaje inválido {record.get('messageId')}: {str(e)}")
+            failures.append(record.get("messageId"))
+
+    metrics.set_property("batch_size", len(records))
+    records_found = {}
+    try:
+        with metrics.stage("idempotency_lookup"):
+            records_found = processed.get_many(dynamodb, (job["processed_key"] for job in jobs))
+    except Exception as e:
+        print(f"Error leyendo registros de idempotencia: {str(e)}")
+
+    # Entregas repetidas: se confirman (o se reintentan) sin descargar nada.
+    # Un objeto que llega dos veces en el batch se procesa una vez.
+    pending = []
+    repeated = {}
+    duplicates = in_progress = 0
+    for job in jobs:
+        record = records_found.get(job["processed_key"])
+        if processed.is_completed(record):
+            duplicates += 1
+        elif processed.is_leased(record):
+            in_progress += 1
+            failures.append(job["message_id"])
+        elif job["processed_key"] in repeated:
+            repeated[job["processed_key"]].append(job)
+        else:
+            if job["processed_key"]:
+                repeated[job["processed_key"]] = []
+            pending.append(job)
+
+    cached = {}
+    try:
+        with metrics.stage("cache_lookup"):
+            cached = cache.get_many(dynamodb, (job["cache_key"] for job in pending))
+    except Exception as e:
+        print(f"Error leyendo cache de extracción: {str(e)}")
+
+    table = dynamodb.Table(TABLE)
+    lease_seconds = _lease_seconds(context)
+
+    def run(job, defer_parallel=False):
+        try:
+            if job["processed_key"] and job["lease"] is None:
+                job["lease"] = processed.acquire(table, job["processed_key"], lease_seconds)
+                if job["lease"] is None:
+                    # Otra invocación lo tomó entre la lectura y el put condicional
+                    job["busy"] = True
+                    return job, None
+            return job, _process_file(
+                job["bucket"], job["key"], job["user_id"], cached.get(job["cache_key"]), job["size"], defer_parallel
+            )
+        except extraction.ParallelDeferred:
+            job["deferred"] = True
+            return job, None
+        except Exception as e:
+            print(f"Error procesando {job['key']}: {str(e)}")
+            return job, None
+
+    if len(pending) == 1:
+        results = [run(pending[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(pending) or 1))) as pool:
+            results = list(pool.map(lambda job: run(job, defer_parallel=True), pending))
+        # Los PDFs que se extraen en paralelo hacen fork recién acá, de a uno y sin el pool
+        # corriendo: un fork con otros threads activos puede heredar un lock tomado
+        deferred = [job for job, _outcome in results if job.get("deferred")]
+        if deferred:
+            metrics.add("deferred_extractions", len(deferred))
+            results = [result for result in results if not result[0].get("deferred")]
+            results += [run(job) for job in deferred]
+
+    # Un mismo archivo puede llegar dos veces en el batch; batch_write_item no admite
+    # claves repetidas en una misma llamada, así que se escribe una sola vez.
+    items_by_key = {}
+    message_ids_by_key = {}
+    postings_by_file = {}
+    completed = []  # (job, respuesta) a registrar como procesados si la escritura sale bien
+    hits = misses = 0
+    for job, outcome in results:
+        followers = [job["message_id"]] + [other["message_id"] for other in repeated.get(job["processed_key"], [])]
+        if outcome is None:
+            failures.extend(followers)
+            if job.get("busy"):
+                in_progress += 1
+            elif job["lease"]:
+                processed.release(table, job["processed_key"], job["lease"])
+            continue
+        response, item, postings = outcome
+        if job["lease"]:
+            completed.append((job, response))
+        if job["cache_key"] in cached:
+            hits += 1
+        elif job["cache_key"]:
+            misses += 1
+            if item is not None:
+                items_by_key[job["cache_key"]] = cache.entry(job["cache_key"], item["data"])
+        if item is None:
+            continue
+        items_by_key[job["key"]] = item
+        postings_by_file[job["key"]] = postings
+        message_ids_by_key.setdefault(job["key"], []).extend(followers)
+
+    written_keys = list(message_ids_by_key)
+    with metrics.stage("read_previous"):
+        previous = _get_existing_invoices(written_keys) if written_keys else {}
+
+    # Las facturas que ya existen se reemplazan de a una con un put condicional,
+    # conservando lo editado por el usuario; las nuevas van en batch
+    rewrites = [key for key in written_keys if key in previous]
+    failed_keys = set()
+
+    # Postings de términos que la factura reindexada ya no tiene: se borran antes de
+    # reemplazarla, así si falla el borrado el reintento los vuelve a calcular
+    indexed = [key for key in rewrites if postings_by_file.get(key)]
+    if indexed:
+        with metrics.stage("index_cleanup"):
+            records = _get_terms_records(indexed)
+            stale = [
+                posting for key in indexed
+                for posting in text_index.stale_keys(previous[key]["userId"], key, records.get(key), postings_by_file[key])
+            ]
+            if stale:
+                # SK "<término>#<file_key>": el término nunca tiene "#"
+                failed_keys |= {posting["SK"].split("#", 1)[1] for posting in _batch_write([], stale)}
+                rewrites = [key for key in rewrites if key not in failed_keys]
+        metrics.add("stale_postings", len(stale))
+
+    def rewrite(key):
+        try:
+            return key, _put_preserving_edits(table, items_by_key[key], previous[key])
+        except Exception as e:
+            print(f"Error reemplazando {key}: {str(e)}")
+            return key, None
+
+    if rewrites:
+        with ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(rewrites)))) as pool:
+            for key, written in pool.map(rewrite, rewrites):
+                if written is None:
+                    failed_keys.add(key)
+                else:
+                    items_by_key[key], previous[key] = written
+        metrics.add("rewrites", len(rewrites))
+    new_items = [item for key, item in items_by_key.items() if key not in previous]
+    # Sin la factura escrita tampoco su índice: el terms_record nuevo ocultaría los postings viejos al reintento
+    postings = [posting for key, items in postings_by_file.items() if key not in failed_keys for posting in items]
+
+    with metrics.stage("batch_write"):
+        unprocessed = _batch_write(new_items + postings)
+    # Una factura sin escribir no cuenta para los agregados. Si sólo quedó sin escribir
+    # algún posting del índice, la factura sí cuenta y el mensaje se reintenta igual:
+    # en el reintento la factura ya está (delta cero) y se vuelven a escribir los postings
+    failed_keys |= {item["PK"] for item in unprocessed if item.get("SK") == "META#1"}
+    retry_keys = failed_keys | {
+        item["file_key"] for item in unprocessed if item.get("SK") != "META#1" and item.get("file_key")
+    }
+    metrics.add("items_written", len(written_keys) - len(failed_keys & set(written_keys)))
+    metrics.add("postings", len(postings))
+    for key in retry_keys:
+        # Si falla sólo la entrada de cache no hace falta reintentar el mensaje
+        failures.extend(message_ids_by_key.get(key, []))
+
+    # El registro COMPLETED se escribe recién con la factura y sus postings escritos;
+    # si no, se libera el lease para que el reintento vuelva a procesar el mensaje
+    records_to_write = []
+    for job, response in completed:
+        if job["key"] in retry_keys:
+            processed.release(table, job["processed_key"], job["lease"])
+        else:
+            records_to_write.append(processed.completed(job["processed_key"], response))
+    if records_to_write:
+        with metrics.stage("idempotency_write"):
+            _batch_write(records_to_write)
+
+    # Agregados por usuario: delta entre la versión anterior y la escrita
+    deltas = {}
+    for key in written_keys:
+        if key not in failed_keys:
+            aggregates.delta(previous.get(key), items_by_key[key], into=deltas)
+    with metrics.stage("aggregates"):
+        _update_aggregates(deltas)
+    _bump_versions(items_by_key[key]["userId"] for key in written_keys if key not in failed_keys)
+    cache.record_stats(dynamodb, hits, misses)
+    metrics.add("cache_hits", hits)
+    metrics.add("cache_misses", misses)
+    metrics.add("duplicates", duplicates)
+    metrics.add("in_progress", in_progress)
+
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failures if message_id]}
+
+
+@metrics.handler
+def handler(event, context):
+    """
+    Procesa mensajes de SQS que contienen información de archivos PDF a procesar.
+    El evento puede venir directamente de SQS (con Records) o como payload directo.
+    Para SQS se procesa el batch completo y se devuelve batchItemFailures.
+    """
+    if "Records" in event and len(event["Records"]) > 0:
+        return _handle_sqs_batch(event["Records"], context)
+
+    # Formato directo (para compatibilidad con invocación directa)
+    lease = None
+    try:
+        bucket = event["bucket"]
+        key = event["key"]
+        user_id = event.get("userId")
+        table = dynamodb.Table(TABLE)
+
+        processed_key = processed.key_for(key, event.get("versionId") or event.get("etag")) if IDEMPOTENCY_ENABLED else None
+        if processed_key:
+            record = processed.get_many(dynamodb, [processed_key]).get(processed_key)
+            if processed.is_completed(record):
+                metrics.add("duplicates", 1)
+                return _stored_response(record)
+            lease = None if processed.is_leased(record) else processed.acquire(table, processed_key, _lease_seconds(context))
+            if lease is None:
+                metrics.add("in_progress", 1)
+                return _error(409, key, "El archivo se está procesando en otra invocación")
+
+        cache_key = cache.key_for(event.get("etag")) if CACHE_ENABLED else None
+        cached = cache.get(dynamodb, cache_key)
+
+        response, item, postings = _process_file(bucket, key, user_id, cached, event.get("size"))
+        if item is not None:
+            # Guardar en DynamoDB sin pisar lo que editó el usuario
+            existing = _get_existing_invoices([key]).get(key)
+            stale = []
+            if existing and postings:
+                record = _get_terms_records([key]).get(key)
+                stale = text_index.stale_keys(existing["userId"], key, record, postings)
+            if stale:
+                with metrics.stage("index_cleanup"):
+                    if _batch_write([], stale):
+                        raise RuntimeError(f"No se pudieron borrar los postings viejos de {key}")
+                metrics.add("stale_postings", len(stale))
+            item, previous = _put_preserving_edits(table, item, existing)
+            with metrics.stage("aggregates"):
+                _update_aggregates(aggregates.delta(previous, item))
+            _bump_versions([user_id])
+            with metrics.stage("index"):
+                unprocessed = _batch_write(postings)
+            if cache_key and cached is None:
+                table.put_item(Item=cache.entry(cache_key, item["data"]))
+            if unprocessed:
+                # Sin el registro COMPLETED el reintento vuelve a escribir los postings
+                # (la factura ya está: el delta de agregados es cero)
+                raise RuntimeError(f"{len(unprocessed)} postings del índice quedaron sin escribir")
+        if lease:
+            table.put_item(Item=processed.completed(processed_key, response))
+        return response
+
     except Exception as e:
+        if lease:
+            processed.release(dynamodb.Table(TABLE), processed_key, lease)
         return {
             "statusCode": 500,
             "body": json.dumps({
@@ -1,78 +1,234 @@
 import json
 import os
-import boto3
 import csv
 import io
 import base64
-from boto3.dynamodb.conditions import Key
+import time
+from decimal import Decimal, InvalidOperation
+from lambda_runtime import Metrics, aws, extract_username, invoice_keys
+from lambda_runtime.s3_stream import MultipartUploadWriter
 
-dynamodb = boto3.resource("dynamodb")
+import parquet_writer
+
+dynamodb = aws.resource("dynamodb")
+s3 = aws.client("s3")
+metrics = Metrics("export")
 TABLE = os.environ.get("TABLE_NAME")
 INDEX_NAME = os.environ.get("INDEX_NAME", "GSI_User_Group")
+EXPORT_BUCKET = os.environ.get("EXPORT_BUCKET") or os.environ.get("UPLOAD_BUCKET")
+EXPORT_PREFIX = os.environ.get("EXPORT_PREFIX", "exports/")
+EXPORT_URL_EXPIRATION = int(os.environ.get("EXPORT_URL_EXPIRATION", "3600"))
+# Tamaño de cada parte del multipart upload: es el máximo de CSV que se mantiene en memoria
+EXPORT_PART_SIZE_MB = int(os.environ.get("EXPORT_PART_SIZE_MB", "8"))
+# Filas por row group de format=parquet: es lo que se mantiene en memoria antes de escribirlo
+PARQUET_ROW_GROUP_ROWS = int(os.environ.get("PARQUET_ROW_GROUP_ROWS", "20000"))
+
+CSV_FIELDS = ["fecha", "proveedor", "total", "cuit"]
+PARQUET_COLUMNS = [
+    parquet_writer.Column("file_key", parquet_writer.STRING, required=True),
+    parquet_writer.Column("fecha", parquet_writer.DATE),
+    parquet_writer.Column("proveedor", parquet_writer.STRING),
+    parquet_writer.Column("cuit", parquet_writer.STRING),
+    parquet_writer.Column("total", parquet_writer.DECIMAL, scale=2),
+    parquet_writer.Column("file_size", parquet_writer.INT64),
+    parquet_writer.Column("text_length", parquet_writer.INT64),
+]
+CONTENT_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+def _iter_user_items(table, username, filters=None):
+    """
+    Recorre todas las páginas del GSI del usuario, trayendo sólo PK y data.
+    Los filtros de fecha, proveedor y CUIT son key conditions (ver invoice_keys),
+    así que sólo se leen las facturas exportadas, ordenadas por fecha.
+    """
+    query_kwargs = {
+        **invoice_keys.query_kwargs(username, filters, user_index=INDEX_NAME),
+        "ProjectionExpression": "PK, #data",
+        "ExpressionAttributeNames": {"#data": "data"},
+    }
+    while True:
+        response = table.query(**query_kwargs)
+        for item in response.get("Items", []):
+            yield item
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return
+        query_kwargs["ExclusiveStartKey"] = last_key
+
+
+def _iter_csv_chunks(items):
+    """Genera el CSV en bloques de bytes, fila por fila, sin armar el archivo completo."""
+    line = io.StringIO()
+    writer = csv.DictWriter(line, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for item in items:
+        data = item.get("data", {})
+        writer.writerow({field: data.get(field, "") for field in CSV_FIELDS})
+        if line.tell() >= 64 * 1024:
+            yield line.getvalue().encode("utf-8")
+            line.seek(0)
+            line.truncate()
+    yield line.getvalue().encode("utf-8")
+
+
+def _cents(value):
+    """Total como entero de centavos (DECIMAL con scale 2), o None si no es un número."""
+    try:
+        cents = int(Decimal(str(value)).scaleb(2).to_integral_value())
+    except (InvalidOperation, TypeError, ValueError, OverflowError):
+        return None
+    return cents if abs(cents) < 10 ** 18 else None  # precisión 18 de la columna
+
+
+def _integer(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _date(value):
+    try:
+        # El writer ya guarda la fecha en ISO; las facturas viejas pueden tener otro formato
+        return parquet_writer.date_value(value)
+    except (TypeError, ValueError):
+        normalized = invoice_keys.normalize_date(value)
+        return parquet_writer.date_value(normalized) if normalized else None
+
+
+def _parquet_row(item):
+    data = item.get("data", {})
+    return {
+        "file_key": item.get("PK"),
+        "fecha": _date(data.get("fecha")),
+        "proveedor": str(data["proveedor"]) if data.get("proveedor") else None,
+        "cuit": str(data["cuit"]) if data.get("cuit") else None,
+        "total": _cents(data.get("total")),
+        "file_size": _integer(data.get("file_size")),
+        "text_length": _integer(data.get("text_length")),
+    }
+
+
+def _write_export(sink, items, export_format):
+    """Escribe las facturas en `sink` (write(bytes)) a medida que llegan las páginas."""
+    if export_format == "parquet":
+        # Un row group cada PARQUET_ROW_GROUP_ROWS filas, con las columnas tipadas y comprimidas
+        writer = parquet_writer.ParquetWriter(sink, PARQUET_COLUMNS, row_group_rows=PARQUET_ROW_GROUP_ROWS)
+        for item in items:
+            writer.write_row(_parquet_row(item))
+        writer.close()
+        return
+    for chunk in _iter_csv_chunks(items):
+        sink.write(chunk)
+
 
+def _get_export_options(event: dict):
+    qsp = (event.get("queryStringParameters") if isinstance(event, dict) else None) or {}
+    mode = (qsp.get("mode") or "inline").lower()
+    gzip = (qsp.get("gzip") or "").lower() in ("1", "true", "yes")
+    export_format = (qsp.get("format") or "csv").lower()
+    return mode, gzip, export_format
 
-def _extract_username_from_event(event: dict):
-    # Extract username from JWT via API Gateway
-    if isinstance(event, dict) and event.get("username"):
-        return event.get("username")
-    qsp = event.get("queryStringParameters") if isinstance(event, dict) else None
-    if qsp and qsp.get("username"):
-        return qsp.get("username")
+
+def _export_to_s3(table, username, gzip, filters=None, export_format="csv"):
+    """
+    Escribe el export en S3 con multipart upload a medida que llegan las páginas
+    de DynamoDB y devuelve un presigned URL de descarga.
+    """
+    filename = f"export_{username}_{int(time.time())}.{export_format}" + (".gz" if gzip else "")
+    key = f"{EXPORT_PREFIX}{username}/{filename}"
+    upload = MultipartUploadWriter(
+        s3,
+        EXPORT_BUCKET,
+        key,
+        content_type="application/gzip" if gzip else CONTENT_TYPES[export_format],
+        part_size=EXPORT_PART_SIZE_MB * 1024 * 1024,
+        gzip=gzip,
+    )
     try:
-        claims = event.get("requestContext", {}).get("authorizer", {}).get("jwt", {}).get("claims", {})
-        if claims:
-            return claims.get("cognito:username") or claims.get("email") or claims.get("sub")
+        # query + armado del archivo + upload de partes, intercalados página por página
+        with metrics.stage("export"):
+            _write_export(upload, _iter_user_items(table, username, filters), export_format)
+            upload.close()
     except Exception:
-        pass
-    return None
+        upload.abort()
+        raise
+    metrics.add("bytes", upload.bytes_out, unit="Bytes")
+
+    download_url = s3.generate_presigned_url(
+        "get_object",
+        Params={
+            "Bucket": EXPORT_BUCKET,
+            "Key": key,
+            "ResponseContentDisposition": f"attachment; filename={filename}",
+        },
+        ExpiresIn=EXPORT_URL_EXPIRATION,
+    )
+    return {
+        "statusCode": 200,
+        "headers": {"Content-Type": "application/json"},
+        "body": json.dumps({
+            "download_url": download_url,
+            "file_key": key,
+            "bytes": upload.bytes_out,
+            "compressed": gzip,
+            "format": export_format,
+        })
+    }
 
 
+@metrics.handler
 def handler(event, context):
     if not TABLE:
         return {"statusCode": 500, "body": json.dumps({"error": "Missing TABLE_NAME env var"})}
 
-    username = _extract_username_from_event(event)
+    username = extract_username(event)
     if not username:
         return {"statusCode": 400, "body": json.dumps({"error": "Missing 'username' parameter or JWT claim"})}
 
+    mode, gzip, export_format = _get_export_options(event)
+    if mode not in ("inline", "url"):
+        return {"statusCode": 400, "body": json.dumps({"error": "'mode' must be 'inline' or 'url'"})}
+    if export_format not in CONTENT_TYPES:
+        return {"statusCode": 400, "body": json.dumps({"error": "'format' must be 'csv' or 'parquet'"})}
+    if gzip and export_format == "parquet":
+        # Parquet ya comprime cada página
+        return {"statusCode": 400, "body": json.dumps({"error": "'gzip' only applies to format=csv"})}
+    if mode == "url" and not EXPORT_BUCKET:
+        return {"statusCode": 500, "body": json.dumps({"error": "Missing EXPORT_BUCKET env var"})}
+    try:
+        filters = invoice_keys.parse_filters(event.get("queryStringParameters"))
+    except ValueError as e:
+        return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
+
     table = dynamodb.Table(TABLE)
+    metrics.set_property("format", export_format)
 
     try:
+        # mode=url: CSV en S3 + presigned URL, sin límite de tamaño ni de memoria
+        if mode == "url":
+            return _export_to_s3(table, username, gzip, filters, export_format)
+
         # Query solo los items del usuario autenticado
-        response = table.query(
-            IndexName=INDEX_NAME,
-            KeyConditionExpression=Key("userId").eq(username)
-        )
-        items = response.get("Items", [])
-
-        # Build CSV
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=["fecha", "proveedor", "total", "cuit"])
-        writer.writeheader()
-        
-        for item in items:
-            data = item.get("data", {})
-            row = {
-                "fecha": data.get("fecha", ""),
-                "proveedor": data.get("proveedor", ""),
-                "total": data.get("total", ""),
-                "cuit": data.get("cuit", "")
-            }
-            writer.writerow(row)
-
-        csv_bytes = output.getvalue().encode("utf-8")
-        encoded = base64.b64encode(csv_bytes).decode("utf-8")
+        # Build CSV / Parquet
+        with metrics.stage("export"):
+            buffer = io.BytesIO()
+            _write_export(buffer, _iter_user_items(table, username, filters), export_format)
+            export_bytes = buffer.getvalue()
+        with metrics.stage("serialize"):
+            encoded = base64.b64encode(export_bytes).decode("utf-8")
+        metrics.add("bytes", len(export_bytes), unit="Bytes")
 
         return {
             "statusCode": 200,
             "isBase64Encoded": True,
             "headers": {
-                "Content-Type": "text/csv",
-                "Content-Disposition": f"attachment; filename=export_{username}.csv"
+                "Content-Type": CONTENT_TYPES[export_format],
+                "Content-Disposition": f"attachment; filename=export_{username}.{export_format}"
             },
             "body": encoded
         }
 
     except Exception as e:
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
-
@@ -0,0 +1,271 @@
+"""
+Escritor de Parquet mínimo, sin dependencias (pyarrow pesa más de 100 MB y
+se nota en el cold start). Alcanza para el export: columnas planas,
+REQUIRED u OPTIONAL, un data page v1 por columna y row group, niveles de
+definición RLE y compresión GZIP. Las columnas de texto con pocos valores
+distintos (proveedor, CUIT) van con diccionario; el resto, PLAIN.
+
+    writer = ParquetWriter(sink, [Column("file_key", STRING, required=True), ...])
+    writer.write_row({"file_key": "...", ...})
+    writer.close()
+
+`sink` es cualquier objeto con write(bytes) (p. ej. MultipartUploadWriter):
+cada row group se escribe apenas junta `row_group_rows` filas, así la
+memoria queda acotada a un row group. Los metadatos (FileMetaData) se
+codifican con el protocolo compacto de Thrift, como exige el formato.
+"""
+import struct
+import zlib
+from collections import namedtuple
+from datetime import date
+
+MAGIC = b"PAR1"
+
+# Tipos lógicos de las columnas: (tipo físico, converted type)
+STRING = "string"
+DATE = "date"
+DECIMAL = "decimal"
+INT64 = "int64"
+
+_INT32, _INT64, _BYTE_ARRAY = 1, 2, 6
+_CONVERTED_UTF8, _CONVERTED_DECIMAL, _CONVERTED_DATE = 0, 5, 6
+_PHYSICAL = {STRING: _BYTE_ARRAY, DATE: _INT32, DECIMAL: _INT64, INT64: _INT64}
+_CONVERTED = {STRING: _CONVERTED_UTF8, DATE: _CONVERTED_DATE, DECIMAL: _CONVERTED_DECIMAL}
+_REQUIRED, _OPTIONAL = 0, 1
+_PLAIN, _RLE, _RLE_DICTIONARY = 0, 3, 8
+_GZIP, _UNCOMPRESSED = 2, 0
+_DATA_PAGE, _DICTIONARY_PAGE = 0, 2
+# Con más valores distintos que esta fracción de las filas el diccionario no conviene
+DICTIONARY_MAX_RATIO = 0.5
+_EPOCH = date(1970, 1, 1).toordinal()
+
+# DECIMAL: enteros en INT64 con `scale` decimales (precisión máxima para INT64: 18)
+Column = namedtuple("Column", "name kind required scale", defaults=(False, 2))
+
+
+# --- protocolo compacto de Thrift (sólo lo que usan los metadatos de Parquet) ---
+_T_I32, _T_I64, _T_BINARY, _T_LIST, _T_STRUCT = 5, 6, 8, 9, 12
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value):
+    return _varint((value << 1) ^ (value >> 63))
+
+
+def _struct(fields):
+    """`fields`: [(id, tipo, valor)] en orden de id; los None se omiten."""
+    out = bytearray()
+    last = 0
+    for field_id, kind, value in fields:
+        if value is None:
+            continue
+        delta = field_id - last
+        out += bytes([(delta << 4) | kind]) if 0 < delta <= 15 else bytes([kind]) + _zigzag(field_id)
+        out += _value(kind, value)
+        last = field_id
+    out.append(0)  # STOP
+    return bytes(out)
+
+
+def _value(kind, value):
+    if kind in (_T_I32, _T_I64):
+        return _zigzag(value)
+    if kind == _T_BINARY:
+        value = value.encode("utf-8") if isinstance(value, str) else value
+        return _varint(len(value)) + value
+    if kind == _T_LIST:
+        element_kind, items = value
+        header = bytes([(len(items) << 4) | element_kind]) if len(items) < 15 else bytes([0xF0 | element_kind]) + _varint(len(items))
+        return header + b"".join(_value(element_kind, item) for item in items)
+    if kind == _T_STRUCT:
+        return value  # ya codificado con _struct
+    raise ValueError(kind)
+
+
+# --- encodings de Parquet ---
+def _definition_levels(present):
+    """Niveles 0/1 con el híbrido RLE/bit-packed (sólo runs RLE, bit width 1), con su largo delante."""
+    out = bytearray()
+    run_value, run_length = None, 0
+    for value in present:
+        if value == run_value:
+            run_length += 1
+            continue
+        if run_length:
+            out += _varint(run_length << 1) + bytes([run_value])
+        run_value, run_length = value, 1
+    if run_length:
+        out += _varint(run_length << 1) + bytes([run_value])
+    return struct.pack("<I", len(out)) + out
+
+
+def _bit_packed(values, bit_width):
+    """Índices del diccionario: bit width + un run bit-packed del híbrido RLE (grupos de 8)."""
+    values = list(values) + [0] * (-len(values) % 8)
+    out = bytearray([bit_width]) + _varint((len(values) // 8) << 1 | 1)
+    for start in range(0, len(values), 8):
+        packed = 0
+        for position, value in enumerate(values[start:start + 8]):
+            packed |= value << (position * bit_width)
+        out += packed.to_bytes(bit_width, "little")
+    return bytes(out)
+
+
+def _plain(kind, values):
+    if kind == STRING:
+        out = bytearray()
+        for value in values:
+            encoded = value.encode("utf-8")
+            out += struct.pack("<I", len(encoded)) + encoded
+        return bytes(out)
+    return struct.pack(f"<{len(values)}{'i' if kind == DATE else 'q'}", *values)
+
+
+def _schema_element(column):
+    fields = [
+        (1, _T_I32, _PHYSICAL[column.kind]),
+        (3, _T_I32, _REQUIRED if column.required else _OPTIONAL),
+        (4, _T_BINARY, column.name),
+        (6, _T_I32, _CONVERTED.get(column.kind)),
+    ]
+    if column.kind == DECIMAL:
+        fields += [(7, _T_I32, column.scale), (8, _T_I32, 18)]
+    return _struct(fields)
+
+
+class ParquetWriter:
+    def __init__(self, sink, columns, row_group_rows=50000, compression=True):
+        self.sink = sink
+        self.columns = list(columns)
+        self.row_group_rows = row_group_rows
+        self.compression = compression
+        self.rows = 0
+        self._offset = 0
+        self._row_groups = []
+        self._buffer = [[] for _ in self.columns]
+        self._buffered = 0
+        self._write(MAGIC)
+
+    def _write(self, data):
+        self.sink.write(data)
+        self._offset += len(data)
+
+    def write_row(self, row):
+        """Agrega una fila {columna: valor}; None (o ausente) es nulo."""
+        for column, values in zip(self.columns, self._buffer):
+            value = row.get(column.name)
+            if value is None and column.required:
+                raise ValueError(f"Column '{column.name}' is required")
+            values.append(value)
+        self._buffered += 1
+        if self._buffered >= self.row_group_rows:
+            self._flush_row_group()
+
+    def _flush_row_group(self):
+        if not self._buffered:
+            return
+        chunks = []
+        total_size = 0
+        for column, values in zip(self.columns, self._buffer):
+            chunk, size = self._write_column(column, values)
+            chunks.append(chunk)
+            total_size += size
+        self._row_groups.append(_struct([
+            (1, _T_LIST, (_T_STRUCT, chunks)),
+            (2, _T_I64, total_size),
+            (3, _T_I64, self._buffered),
+        ]))
+        self.rows += self._buffered
+        self._buffer = [[] for _ in self.columns]
+        self._buffered = 0
+
+    def _write_page(self, body, page_type, page_header):
+        """Escribe header + página comprimida; devuelve (offset, bytes sin comprimir, bytes escritos)."""
+        page = zlib.compress(body, 6, wbits=31) if self.compression else body
+        header = _struct([
+            (1, _T_I32, page_type),
+            (2, _T_I32, len(body)),
+            (3, _T_I32, len(page)),
+            (5 if page_type == _DATA_PAGE else 7, _T_STRUCT, page_header),
+        ])
+        offset = self._offset
+        self._write(header)
+        self._write(page)
+        return offset, len(header) + len(body), len(header) + len(page)
+
+    def _write_column(self, column, values):
+        present = [value is not None for value in values]
+        levels = b"" if column.required else _definition_levels(present)
+        non_null = [value for value in values if value is not None]
+        dictionary = {}
+        if column.kind == STRING:
+            for value in non_null:
+                dictionary.setdefault(value, len(dictionary))
+                if len(dictionary) > DICTIONARY_MAX_RATIO * len(values):
+                    dictionary = {}
+                    break
+
+        dictionary_offset = None
+        uncompressed = compressed = 0
+        if dictionary:
+            dictionary_offset, uncompressed, compressed = self._write_page(
+                _plain(column.kind, list(dictionary)),
+                _DICTIONARY_PAGE,
+                _struct([(1, _T_I32, len(dictionary)), (2, _T_I32, _PLAIN)]),
+            )
+            bit_width = max(1, (len(dictionary) - 1).bit_length())
+            body, encoding = levels + _bit_packed([dictionary[value] for value in non_null], bit_width), _RLE_DICTIONARY
+        else:
+            body, encoding = levels + _plain(column.kind, non_null), _PLAIN
+        data_offset, data_uncompressed, data_compressed = self._write_page(
+            body,
+            _DATA_PAGE,
+            _struct([
+                (1, _T_I32, len(values)),
+                (2, _T_I32, encoding),
+                (3, _T_I32, _RLE),
+                (4, _T_I32, _RLE),
+            ]),
+        )
+        uncompressed += data_uncompressed
+        compressed += data_compressed
+        metadata = _struct([
+            (1, _T_I32, _PHYSICAL[column.kind]),
+            (2, _T_LIST, (_T_I32, [_PLAIN, _RLE] + ([_RLE_DICTIONARY] if dictionary else []))),
+            (3, _T_LIST, (_T_BINARY, [column.name])),
+            (4, _T_I32, _GZIP if self.compression else _UNCOMPRESSED),
+            (5, _T_I64, len(values)),
+            (6, _T_I64, uncompressed),
+            (7, _T_I64, compressed),
+            (9, _T_I64, data_offset),
+            (11, _T_I64, dictionary_offset),
+        ])
+        chunk_offset = data_offset if dictionary_offset is None else dictionary_offset
+        return _struct([(2, _T_I64, chunk_offset), (3, _T_STRUCT, metadata)]), uncompressed
+
+    def close(self):
+        """Escribe el último row group y el footer. No cierra `sink`."""
+        self._flush_row_group()
+        root = _struct([(4, _T_BINARY, "schema"), (5, _T_I32, len(self.columns))])
+        footer = _struct([
+            (1, _T_I32, 1),
+            (2, _T_LIST, (_T_STRUCT, [root] + [_schema_element(column) for column in self.columns])),
+            (3, _T_I64, self.rows),
+            (4, _T_LIST, (_T_STRUCT, self._row_groups)),
+            (6, _T_BINARY, "factutable export"),
+        ])
+        self._write(footer)
+        self._write(struct.pack("<I", len(footer)) + MAGIC)
+
+
+def date_value(iso):
+    """aaaa-mm-dd -> días desde 1970-01-01 (valor físico de DATE)."""
+    return date.fromisoformat(iso).toordinal() - _EPOCH
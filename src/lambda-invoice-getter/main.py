@@ -1,31 +1,51 @@
+import base64
 import json
-import boto3
 import os
 import re
-from boto3.dynamodb.conditions import Key
+from lambda_runtime import Metrics, aws, etags, extract_username, responses
 
-dynamodb = boto3.resource("dynamodb")
+dynamodb = aws.resource("dynamodb")
+metrics = Metrics("invoice-getter")
 TABLE = os.environ.get("TABLE_NAME")
 INDEX_NAME = os.environ.get("INDEX_NAME", "GSI_User_Group")
+DEFAULT_PAGE_SIZE = int(os.environ.get("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", "1000"))
 
 
-def _extract_username_from_event(event: dict):
-    # Extract username from JWT via API Gateway
-    if isinstance(event, dict) and event.get("username"):
-        return event.get("username")
+def _encode_next_token(last_evaluated_key):
+    """Opaque cursor: base64url of the LastEvaluatedKey returned by DynamoDB."""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
 
-    qsp = event.get("queryStringParameters") if isinstance(event, dict) else None
-    if qsp and qsp.get("username"):
-        return qsp.get("username")
 
+def _decode_next_token(token: str, username: str) -> dict:
+    """Decode a cursor and make sure it belongs to the caller. Raises ValueError if invalid."""
     try:
-        claims = event.get("requestContext", {}).get("authorizer", {}).get("jwt", {}).get("claims", {})
-        if claims:
-            return claims.get("cognito:username") or claims.get("email") or claims.get("sub")
+        padded = token + "=" * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
     except Exception:
-        pass
-
-    return None
+        raise ValueError("Invalid next_token")
+    if not isinstance(key, dict) or key.get("userId") != username:
+        raise ValueError("Invalid next_token")
+    return key
+
+
+def _get_page_params(event: dict):
+    """Read `limit` and `next_token` from the query string. Raises ValueError if invalid."""
+    qsp = (event.get("queryStringParameters") if isinstance(event, dict) else None) or {}
+    limit = qsp.get("limit")
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    else:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValueError("'limit' must be an integer")
+        if limit < 1:
+            raise ValueError("'limit' must be greater than 0")
+    return min(limit, MAX_PAGE_SIZE), qsp.get("next_token")
 
 
 def _parse_filename_from_s3_key(file_key: str) -> str:
@@ -46,23 +66,49 @@ def _parse_filename_from_s3_key(file_key: str) -> str:
         return file_key
 
 
+@metrics.handler
 def handler(event, context):
     if not TABLE:
         return {"statusCode": 500, "body": json.dumps({"error": "Missing TABLE_NAME env var"})}
 
-    username = _extract_username_from_event(event)
+    username = extract_username(event)
     if not username:
         return {"statusCode": 400, "body": json.dumps({"error": "Missing 'username' parameter or JWT claim"})}
 
+    try:
+        limit, next_token = _get_page_params(event)
+        exclusive_start_key = _decode_next_token(next_token, username) if next_token else None
+    except ValueError as e:
+        return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
+
     table = dynamodb.Table(TABLE)
 
+    # Conditional GET: if the user's version did not change, answer 304 after a single GetItem
+    with metrics.stage("version"):
+        etag = etags.current(table, username, "list", limit, next_token)
+    if etags.matches(event, etag):
+        metrics.add("not_modified", 1)
+        return etags.not_modified(etag)
+
+    # Imported here: boto3 is only loaded with the first client (see lambda_runtime.aws)
+    from boto3.dynamodb.conditions import Key
+
     try:
-        response = table.query(
-            IndexName=INDEX_NAME,
-            KeyConditionExpression=Key("userId").eq(username)
-        )
+        # Only file_key is needed: project it instead of reading full items,
+        # and read at most `limit` items per request
+        query_kwargs = {
+            "IndexName": INDEX_NAME,
+            "KeyConditionExpression": Key("userId").eq(username),
+            "ProjectionExpression": "file_key",
+            "Limit": limit,
+        }
+        if exclusive_start_key:
+            query_kwargs["ExclusiveStartKey"] = exclusive_start_key
+        with metrics.stage("query"):
+            response = table.query(**query_kwargs)
 
         items = response.get("Items", [])
+        metrics.add("items", len(items))
         
         # Build response with file_key and parsed filename
         facturas = []
@@ -75,11 +121,12 @@ def handler(event, context):
             }
             facturas.append(factura)
 
-        return {
-            "statusCode": 200,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({"username": username, "facturas": facturas}, ensure_ascii=False)
-        }
+        # Compressed when the client sends Accept-Encoding (see lambda_runtime.responses)
+        return etags.attach(responses.json_response(event, {
+            "username": username,
+            "facturas": facturas,
+            "next_token": _encode_next_token(response.get("LastEvaluatedKey"))
+        }, metrics=metrics), etag)
 
     except Exception as e:
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
@@ -1,51 +1,164 @@
 import json
 import os
-import boto3
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from lambda_runtime import Metrics, aws
 
+# Se crean en el primer uso y se reutilizan en las invocaciones siguientes
+sqs = aws.client("sqs")
+s3 = aws.client("s3")
+metrics = Metrics("invoice-processor")
+
+SQS_BATCH_SIZE = 10  # límite de SendMessageBatch
+SEND_MAX_RETRIES = int(os.environ.get("SEND_MAX_RETRIES", "3"))
+# Mismo mínimo que usa database-writer para descartar PDFs corruptos
+MIN_PDF_BYTES = int(os.environ.get("MIN_PDF_BYTES", "100"))
+MAX_PDF_BYTES = int(os.environ.get("MAX_PDF_BYTES", str(50 * 1024 * 1024)))
+# La especificación permite basura antes de "%PDF-" dentro del primer KB
+PDF_MAGIC = b"%PDF-"
+MAGIC_RANGE_BYTES = 1024
+VALIDATION_WORKERS = int(os.environ.get("VALIDATION_WORKERS", "16"))
+
+
+class EnqueueError(RuntimeError):
+    """
+    Mensajes que no se pudieron encolar después de SEND_MAX_RETRIES. S3 invoca
+    esta lambda en forma asíncrona: sólo una excepción hace que Lambda
+    reintente el evento y, al agotar los reintentos, lo mande al destino de
+    fallas. Los mensajes ya encolados se vuelven a mandar; database-writer
+    descarta las entregas repetidas (ver idempotency.py).
+    """
+
+    def __init__(self, failed):
+        super().__init__(f"{len(failed)} archivo(s) sin encolar: {', '.join(failed)}")
+        self.failed = failed
+
+
+def _validate_object(bucket, key, size):
+    """
+    Chequeo barato antes de encolar: tamaño informado por el evento y un GET
+    por rango del primer KB buscando la firma de PDF.
+    Devuelve None si el objeto es válido o el motivo del rechazo.
+    """
+    if size is not None:
+        if size < MIN_PDF_BYTES:
+            return f"muy chico ({size} bytes)"
+        if MAX_PDF_BYTES and size > MAX_PDF_BYTES:
+            return f"muy grande ({size} bytes)"
+    try:
+        head = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes=0-{MAGIC_RANGE_BYTES - 1}")["Body"].read()
+    except Exception as e:
+        code = getattr(e, "response", {}).get("Error", {}).get("Code")
+        if code in ("NoSuchKey", "404"):
+            return "el objeto ya no existe"
+        # Ante otros errores se encola igual: database-writer hace la validación completa
+        print(f"No se pudo validar {key}: {str(e)}")
+        return None
+    if PDF_MAGIC not in head:
+        return "no es un PDF"
+    return None
+
+
+def _send_batch(queue_url, messages):
+    """
+    SendMessageBatch en bloques de 10, reintentando con backoff sólo las
+    entradas fallidas que no son culpa del emisor.
+    Devuelve la lista de claves que no se pudieron encolar.
+    """
+    failed = []
+    for start in range(0, len(messages), SQS_BATCH_SIZE):
+        pending = {str(index): message for index, message in enumerate(messages[start:start + SQS_BATCH_SIZE])}
+        for attempt in range(SEND_MAX_RETRIES + 1):
+            entries = [{"Id": entry_id, "MessageBody": json.dumps(message)} for entry_id, message in pending.items()]
+            try:
+                response = sqs.send_message_batch(QueueUrl=queue_url, Entries=entries)
+            except Exception as e:
+                print(f"Error en send_message_batch: {str(e)}")
+                response = {"Failed": [{"Id": entry_id, "SenderFault": False} for entry_id in pending]}
+            retry = {}
+            for failure in response.get("Failed", []):
+                message = pending[failure["Id"]]
+                if failure.get("SenderFault"):
+                    print(f"Mensaje rechazado por SQS para {message['key']}: {failure.get('Message')}")
+                    failed.append(message["key"])
+                else:
+                    retry[failure["Id"]] = message
+            pending = retry
+            if not pending:
+                break
+            if attempt < SEND_MAX_RETRIES:
+                time.sleep(min(0.05 * (2 ** attempt), 1.0))
+        failed.extend(message["key"] for message in pending.values())
+    return failed
+
+
+@metrics.handler
 def handler(event, context):
     """
     Procesa eventos de S3 cuando se sube un archivo PDF.
-    Envía mensajes a SQS para que database-writer los procese de forma asíncrona.
+    Valida cada objeto (tamaño y firma %PDF) y envía los válidos a SQS en
+    batches de 10 para que database-writer los procese de forma asíncrona.
     """
     try:
         # Obtener la URL de la cola SQS desde las variables de entorno
         queue_url = os.environ.get('SQS_QUEUE_URL')
         if not queue_url:
             raise ValueError("SQS_QUEUE_URL no está configurada en las variables de entorno")
-        
-        sqs_client = boto3.client('sqs')
-        
+
         # Extraer información del evento de S3
-        records = event.get('Records', [])
-        processed_count = 0
-        
-        for record in records:
+        candidates = []
+        for record in event.get('Records', []):
             if record['eventSource'] == 'aws:s3':
                 bucket = record['s3']['bucket']['name']
-                key = record['s3']['object']['key']
-                
-                print(f"Enviando archivo a cola SQS: {key} del bucket: {bucket}")
-                
+                # Las claves llegan URL-encoded en los eventos de S3
+                key = urllib.parse.unquote_plus(record['s3']['object']['key'])
+                size = record['s3']['object'].get('size')
+
                 # Extraer user_id del path del archivo
                 parts = key.split('/', 1)
                 user_id = parts[0] if len(parts) > 1 else None
 
-                # Crear mensaje para SQS
-                message_body = {
+                # El ETag permite a database-writer reutilizar la extracción de un PDF idéntico,
+                # el tamaño le evita un HEAD antes de decidir cómo descargarlo y versionId
+                # (bucket versionado) identifica el objeto para descartar entregas repetidas
+                candidates.append(({
                     "bucket": bucket,
                     "key": key,
-                    "userId": user_id
-                }
-                
-                # Enviar mensaje a SQS
-                response = sqs_client.send_message(
-                    QueueUrl=queue_url,
-                    MessageBody=json.dumps(message_body)
-                )
-                
-                print(f"Mensaje enviado a SQS. MessageId: {response['MessageId']}")
-                processed_count += 1
-        
+                    "userId": user_id,
+                    "etag": record['s3']['object'].get('eTag'),
+                    "versionId": record['s3']['object'].get('versionId'),
+                    "size": size
+                }, size))
+
+        # Los GET por rango de todos los objetos del evento corren en paralelo
+        with metrics.stage("validate"), ThreadPoolExecutor(max_workers=max(1, min(VALIDATION_WORKERS, len(candidates)))) as pool:
+            reasons = list(pool.map(
+                _validate_object,
+                [message["bucket"] for message, _ in candidates],
+                [message["key"] for message, _ in candidates],
+                [size for _, size in candidates],
+            ))
+
+        messages = []
+        rejected = []
+        for (message, _), reason in zip(candidates, reasons):
+            if reason:
+                print(f"Archivo descartado sin encolar: {message['key']} ({reason})")
+                rejected.append({"key": message["key"], "reason": reason})
+            else:
+                messages.append(message)
+
+        with metrics.stage("enqueue"):
+            failed = _send_batch(queue_url, messages)
+        processed_count = len(messages) - len(failed)
+        metrics.add("records", len(candidates))
+        metrics.add("enqueued", processed_count)
+        metrics.add("rejected", len(rejected))
+        print(f"{processed_count} mensaje(s) enviados a SQS, {len(rejected)} descartado(s), {len(failed)} con error")
+        if failed:
+            raise EnqueueError(failed)
+
         return {
             'statusCode': 200,
             'headers': {
@@ -53,18 +166,12 @@ def handler(event, context):
             },
             'body': json.dumps({
                 'message': f'{processed_count} archivo(s) enviado(s) a la cola SQS para procesamiento',
-                'processed_files': processed_count
+                'processed_files': processed_count,
+                'rejected_files': rejected
             })
         }
-        
+
     except Exception as e:
+        # Un valor devuelto no se reintenta nunca en una invocación asíncrona
         print(f"Error procesando archivo: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json'
-            },
-            'body': json.dumps({
-                'error': str(e)
-            })
-        }
+        raise
@@ -0,0 +1,170 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lambda_runtime import Metrics, aws, etags, extract_username, responses, text_index
+
+dynamodb = aws.resource("dynamodb")
+metrics = Metrics("invoice-search")
+TABLE = os.environ.get("TABLE_NAME")
+# Sort key of invoice items, as written by database-writer
+META_SK = "META#1"
+BATCH_GET_CHUNK = 100  # DynamoDB limit per BatchGetItem call
+DEFAULT_PAGE_SIZE = int(os.environ.get("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", "200"))
+MAX_QUERY_TERMS = int(os.environ.get("MAX_QUERY_TERMS", "8"))
+# Postings read per term; broader prefixes are cut here and the response is marked truncated
+MAX_MATCHES_PER_TERM = int(os.environ.get("MAX_MATCHES_PER_TERM", "10000"))
+
+
+def _bad_request(message):
+    return {"statusCode": 400, "body": json.dumps({"error": message})}
+
+
+def _get_search_params(event: dict):
+    """Read `q`, `limit` and `offset` from the query string. Raises ValueError if invalid."""
+    qsp = (event.get("queryStringParameters") if isinstance(event, dict) else None) or {}
+    terms = text_index.parse_query(qsp.get("q"))
+    if not terms:
+        raise ValueError(f"'q' must contain at least one word of {text_index.MIN_TERM_LENGTH} or more characters")
+    if len(terms) > MAX_QUERY_TERMS:
+        raise ValueError(f"At most {MAX_QUERY_TERMS} words per search")
+    params = {}
+    for name, default, minimum in (("limit", DEFAULT_PAGE_SIZE, 1), ("offset", 0, 0)):
+        value = qsp.get(name)
+        if value is None:
+            params[name] = default
+            continue
+        try:
+            params[name] = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{name}' must be an integer")
+        if params[name] < minimum:
+            raise ValueError(f"'{name}' must be at least {minimum}")
+    return terms, min(params["limit"], MAX_PAGE_SIZE), params["offset"]
+
+
+def _matching_keys(table, username, term, is_prefix):
+    """
+    file_keys whose text contains `term` (or a word starting with it), read
+    from the user's index partition for the term's first character.
+    Returns (keys, truncated).
+    """
+    # Imported here: boto3 is only loaded with the first client (see lambda_runtime.aws)
+    from boto3.dynamodb.conditions import Key
+
+    query_kwargs = {
+        "KeyConditionExpression": Key("PK").eq(text_index.index_pk(username, term))
+        & Key("SK").begins_with(text_index.key_prefix(term, is_prefix)),
+        "ProjectionExpression": "file_key",
+    }
+    keys = set()
+    read = 0
+    while True:
+        response = table.query(**query_kwargs)
+        for item in response.get("Items", []):
+            keys.add(item["file_key"])
+        read += len(response.get("Items", []))
+        if not response.get("LastEvaluatedKey"):
+            return keys, False
+        if read >= MAX_MATCHES_PER_TERM:
+            return keys, True
+        query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def _search(table, username, terms):
+    """Keys of the invoices that match every term (AND), sorted. Returns (keys, truncated)."""
+    with ThreadPoolExecutor(max_workers=len(terms)) as pool:
+        results = list(pool.map(lambda term: _matching_keys(table, username, *term), terms))
+    truncated = any(partial for _keys, partial in results)
+    # Smallest set first, so each intersection only walks the remaining candidates
+    sets = sorted((keys for keys, _partial in results), key=len)
+    matches = sets[0]
+    for keys in sets[1:]:
+        matches = matches & keys
+    return sorted(matches), truncated
+
+
+def _batch_get_invoices(file_keys, username, max_retries=5):
+    """BatchGetItem in chunks of 100, retrying UnprocessedKeys. Only the caller's items are returned."""
+    found = {}
+    for start in range(0, len(file_keys), BATCH_GET_CHUNK):
+        request_items = {
+            TABLE: {
+                "Keys": [{"PK": key, "SK": META_SK} for key in file_keys[start:start + BATCH_GET_CHUNK]],
+                "ProjectionExpression": "file_key, userId, #data",
+                "ExpressionAttributeNames": {"#data": "data"},
+            }
+        }
+        for attempt in range(max_retries + 1):
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response.get("Responses", {}).get(TABLE, []):
+                if item.get("userId") == username:
+                    found[item["file_key"]] = item
+            request_items = response.get("UnprocessedKeys") or {}
+            if not request_items:
+                break
+            time.sleep(min(0.05 * (2 ** attempt), 1.0))
+        if request_items:
+            raise RuntimeError("Could not read all matching invoices")
+    return found
+
+
+@metrics.handler
+def handler(event, context):
+    """
+    GET /invoices/search?q=...&limit=&offset=
+
+    Words are matched against the text database-writer extracted from each PDF
+    (accents and case are ignored); a trailing "*" matches by prefix ("acei*").
+    Every word must match. Results are sorted by file_key.
+    """
+    if not TABLE:
+        return {"statusCode": 500, "body": json.dumps({"error": "Missing TABLE_NAME env var"})}
+
+    username = extract_username(event)
+    if not username:
+        return _bad_request("Missing 'username' parameter or JWT claim")
+
+    try:
+        terms, limit, offset = _get_search_params(event)
+    except ValueError as e:
+        return _bad_request(str(e))
+
+    table = dynamodb.Table(TABLE)
+
+    # Conditional GET: the index only changes when the writer bumps the user's version
+    with metrics.stage("version"):
+        etag = etags.current(table, username, "search", terms, limit, offset)
+    if etags.matches(event, etag):
+        metrics.add("not_modified", 1)
+        return etags.not_modified(etag)
+
+    try:
+        with metrics.stage("query"):
+            matches, truncated = _search(table, username, terms)
+        metrics.add("terms", len(terms))
+        metrics.add("matches", len(matches))
+
+        page = matches[offset:offset + limit]
+        with metrics.stage("batch_get"):
+            found = _batch_get_invoices(page, username) if page else {}
+        metrics.add("items", len(found))
+
+        # Decimals as strings, compressed when the client sends Accept-Encoding
+        return etags.attach(responses.json_response(event, {
+            "username": username,
+            "query": [term + "*" if is_prefix else term for term, is_prefix in terms],
+            "total": len(matches),
+            "truncated": truncated,
+            "offset": offset,
+            "facturas": [
+                {"file_key": key, "data": found[key].get("data", {})}
+                for key in page if key in found
+            ],
+            "next_offset": offset + limit if offset + limit < len(matches) else None,
+        }, metrics=metrics), etag)
+
+    except Exception as e:
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
@@ -1,11 +1,199 @@
+import copy
 import json
-import boto3
 import os
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 
-dynamodb = boto3.resource("dynamodb")
+from lambda_runtime import Metrics, aggregates, aws, etags, extract_username, invoice_keys, responses
+
+dynamodb = aws.resource("dynamodb")
+metrics = Metrics("invoice-data-updater")
 TABLE = os.environ["TABLE_NAME"]
+# Modo bulk: máximo de facturas por request y updates en paralelo
+MAX_BULK_ITEMS = int(os.environ.get("MAX_BULK_ITEMS", "500"))
+BULK_WORKERS = int(os.environ.get("BULK_WORKERS", "16"))
+
+
+def _filter_updates(updates):
+    # Filtrar valores None/vacíos si es necesario, pero permitir null explícitos
+    # Convertir strings vacíos a None para mantener consistencia
+    filtered_updates = {}
+    for field, value in updates.items():
+        if value is not None and value != "":
+            filtered_updates[field] = value
+        elif value == "":
+            # Permitir strings vacíos como None
+            filtered_updates[field] = None
+        else:
+            filtered_updates[field] = value
+    return filtered_updates
+
+
+def _condition(username, expected_version):
+    """
+    La factura tiene que existir, ser del usuario y, si se pidió, estar en la
+    versión esperada (las facturas sin `version` cuentan como versión 0).
+    """
+    # Import local: boto3 se carga recién con el primer cliente (ver lambda_runtime.aws)
+    from boto3.dynamodb.conditions import Attr
+
+    condition = Attr("PK").exists()
+    if username:
+        condition = condition & Attr("userId").eq(username)
+    if expected_version is not None:
+        version_matches = Attr("version").eq(expected_version)
+        if expected_version == 0:
+            version_matches = version_matches | Attr("version").not_exists()
+        condition = condition & version_matches
+    return condition
+
+
+def _conflict(previous, username):
+    """Explica por qué falló la condición a partir del item actual."""
+    if not previous or (username and previous.get("userId") != username):
+        # Una factura de otro usuario se reporta igual que una inexistente
+        return 404, {"error": "Invoice not found"}
+    return 409, {"error": "Version conflict", "current_version": int(previous.get("version", 0))}
+
+
+def _update_invoice(table, username, key, updates, expected_version=None):
+    """
+    Aplica `updates` sobre data.* con un update condicional e incrementa
+    `version`. Devuelve (status, resultado, anterior, actualizado); los dos
+    últimos son None si no se escribió nada.
+    """
+    filtered_updates = _filter_updates(updates)
+    if not filtered_updates:
+        return 400, {"error": "No valid updates provided"}, None, None
+    if expected_version is not None and (isinstance(expected_version, bool) or not isinstance(expected_version, (int, Decimal))):
+        return 400, {"error": "expected_version must be an integer"}, None, None
+    if filtered_updates.get("fecha") is not None:
+        # Misma forma que escribe database-writer: ISO, para ordenar y filtrar por rango
+        filtered_updates["fecha"] = invoice_keys.normalize_date(filtered_updates["fecha"])
+        if not filtered_updates["fecha"]:
+            return 400, {"error": "fecha must be a date (YYYY-MM-DD or DD/MM/YYYY)"}, None, None
+    key_updates = {
+        name: invoice_keys.key_value(name, username, key, filtered_updates[field])
+        for name, field in invoice_keys.KEY_FIELDS.items() if field in filtered_updates
+    }
+    if key_updates and not username:
+        # supplierKey y cuitKey llevan el userId del dueño
+        return 400, {"error": "Missing username to update fecha, proveedor or cuit"}, None, None
+
+    # Construir expresión de actualización
+    # Los campos se actualizan dentro del objeto "data"
+    update_parts = []
+    expr_attr_names = {"#data": "data", "#version": "version"}  # Mapear #data a "data"
+    expr_attr_values = {":zero": 0, ":one": 1}
+
+    for i, (field, value) in enumerate(filtered_updates.items()):
+        update_parts.append(f"#data.#k{i} = :u{i}")
+        expr_attr_names[f"#k{i}"] = field
+        # Convertir None a null para DynamoDB
+        expr_attr_values[f":u{i}"] = value if value is not None else None
+    update_parts.append("#version = if_not_exists(#version, :zero) + :one")
+    # Claves de los GSI que dependen de los campos editados (ver lambda_runtime.invoice_keys)
+    remove_parts = []
+    for name, value in key_updates.items():
+        expr_attr_names[f"#{name}"] = name
+        if value is None:
+            remove_parts.append(f"#{name}")
+        else:
+            update_parts.append(f"#{name} = :{name}")
+            expr_attr_values[f":{name}"] = value
+
+    update_expr = "SET " + ", ".join(update_parts)
+    if remove_parts:
+        update_expr += " REMOVE " + ", ".join(remove_parts)
+    # Campos editados a mano: database-writer no los pisa si vuelve a procesar el PDF
+    update_expr += " ADD #edited :edited"
+    expr_attr_names["#edited"] = "editedFields"
+    expr_attr_values[":edited"] = set(filtered_updates)
+
+    try:
+        # La tabla usa PK (file_key) y SK ("META#1") como claves primarias
+        with metrics.stage("update_item"):
+            response = table.update_item(
+                Key={
+                    "PK": key,      # Hash key
+                    "SK": "META#1"  # Range key (según database-writer)
+                },
+                UpdateExpression=update_expr,
+                ConditionExpression=_condition(username, expected_version),
+                ExpressionAttributeNames=expr_attr_names,
+                ExpressionAttributeValues=expr_attr_values,
+                ReturnValues="ALL_OLD",
+                ReturnValuesOnConditionCheckFailure="ALL_OLD"
+            )
+    except Exception as e:
+        error = getattr(e, "response", None) or {}
+        if error.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        status, result = _conflict(error.get("Item"), username)
+        return status, result, None, None
+
+    # Con la versión anterior se arma la nueva para la respuesta y el delta de agregados
+    previous = response.get("Attributes") or {}
+    updated = copy.deepcopy(previous)
+    updated.setdefault("data", {}).update(filtered_updates)
+    updated["editedFields"] = set(previous.get("editedFields") or ()) | set(filtered_updates)
+    for name, value in key_updates.items():
+        if value is None:
+            updated.pop(name, None)
+        else:
+            updated[name] = value
+    updated["version"] = int(previous.get("version", 0)) + 1
+    return 200, {"version": updated["version"]}, previous, updated
+
+
+def _apply_aggregates(table, changes):
+    """
+    Un solo delta para todas las facturas modificadas en la request; después
+    se incrementa la versión de sus dueños para invalidar los ETags de lectura.
+    Los agregados son best-effort (ver lambda_runtime.aggregates): si fallan,
+    la edición ya está escrita y se responde igual.
+    """
+    deltas = {}
+    for previous, updated in changes:
+        aggregates.delta(previous, updated, into=deltas)
+    with metrics.stage("aggregates"):
+        aggregates.apply_deltas(table, deltas, metrics=metrics)
+    try:
+        etags.bump(table, (updated.get("userId") for _, updated in changes))
+    except Exception as e:
+        print(f"Error actualizando versión de usuario: {str(e)}")
+
+
+def _bulk_update(table, username, entries):
+    """
+    Modo bulk: cada entrada {file_key, updates, expected_version} se aplica en
+    paralelo con su propio update condicional; el resultado es por factura.
+    """
+    def run(entry):
+        if not isinstance(entry, dict) or not entry.get("file_key") or not isinstance(entry.get("updates"), dict):
+            return {"status": 400, "error": "Missing file_key or updates"}, None
+        try:
+            status, result, previous, updated = _update_invoice(
+                table, username, entry["file_key"], entry["updates"], entry.get("expected_version")
+            )
+        except Exception as e:
+            return {"file_key": entry["file_key"], "status": 500, "error": str(e)}, None
+        return {"file_key": entry["file_key"], "status": status, **result}, (previous, updated) if updated else None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(BULK_WORKERS, len(entries)))) as pool:
+        outcomes = list(pool.map(run, entries))
+
+    _apply_aggregates(table, [change for _, change in outcomes if change])
+    results = [result for result, _ in outcomes]
+    summary = {}
+    for result in results:
+        summary[str(result["status"])] = summary.get(str(result["status"]), 0) + 1
+    metrics.add("items", len(entries))
+    metrics.add("items_updated", summary.get("200", 0))
+    return {"results": results, "summary": summary}
+
 
+@metrics.handler
 def handler(event, context):
     """
     Espera un input JSON como:
@@ -15,21 +203,38 @@ def handler(event, context):
             "total": "25000.50",
             "fecha": "2025-10-22",
             "proveedor": "AGRO S.A."
-        }
+        },
+        "expected_version": 3   (opcional)
     }
+    o, en modo bulk, {"items": [{"file_key": ..., "updates": {...}, "expected_version": ...}, ...]}.
     API Gateway v2 usually forwards the JSON body as a string in event['body'].
     """
     # Handle API Gateway proxy integration - body may be a string
     body = event.get("body")
     if isinstance(body, str):
         try:
-            body = json.loads(body)
+            body = json.loads(body, parse_float=Decimal)
         except json.JSONDecodeError:
             body = {}
-    
+    body = body if isinstance(body, dict) else {}
+
+    username = extract_username(event)
+    table = dynamodb.Table(TABLE)
+
+    entries = body.get("items")
+    if entries is not None:
+        if not isinstance(entries, list) or not entries:
+            return {"statusCode": 400, "body": json.dumps({"error": "'items' must be a non-empty list"})}
+        if len(entries) > MAX_BULK_ITEMS:
+            return {"statusCode": 400, "body": json.dumps({"error": f"At most {MAX_BULK_ITEMS} items per request"})}
+        result = _bulk_update(table, username, entries)
+        # Los Decimal de DynamoDB salen como números en el mismo json.dumps (sin copiar el resultado)
+        return responses.json_response(event, result, decimal=float, metrics=metrics)
+
     # Try to get from body first, then from event directly (for local testing)
     key = body.get("file_key") or event.get("file_key")
     updates = body.get("updates") or event.get("updates")
+    expected_version = body.get("expected_version", event.get("expected_version"))
 
     if not key or not updates:
         return {
@@ -37,73 +242,17 @@ def handler(event, context):
             "body": json.dumps({"error": "Missing file_key or updates"})
         }
 
-    # Filtrar valores None/vacíos si es necesario, pero permitir null explícitos
-    # Convertir strings vacíos a None para mantener consistencia
-    filtered_updates = {}
-    for field, value in updates.items():
-        if value is not None and value != "":
-            filtered_updates[field] = value
-        elif value == "":
-            # Permitir strings vacíos como None
-            filtered_updates[field] = None
-        else:
-            filtered_updates[field] = value
-    
-    if not filtered_updates:
-        return {
-            "statusCode": 400,
-            "body": json.dumps({"error": "No valid updates provided"})
-        }
-
-    table = dynamodb.Table(TABLE)
+    try:
+        status, result, previous, updated = _update_invoice(table, username, key, updates, expected_version)
+        if status != 200:
+            return responses.json_response(event, result, status=status, decimal=float)
 
-    # Construir expresión de actualización
-    # Los campos se actualizan dentro del objeto "data"
-    update_parts = []
-    expr_attr_names = {"#data": "data"}  # Mapear #data a "data"
-    expr_attr_values = {}
-    
-    for i, (field, value) in enumerate(filtered_updates.items()):
-        update_parts.append(f"#data.#k{i} = :v{i}")
-        expr_attr_names[f"#k{i}"] = field
-        # Convertir None a null para DynamoDB
-        expr_attr_values[f":v{i}"] = value if value is not None else None
-    
-    update_expr = "SET " + ", ".join(update_parts)
+        _apply_aggregates(table, [(previous, updated)])
 
-    try:
-        # La tabla usa PK (file_key) y SK ("META#1") como claves primarias
-        response = table.update_item(
-            Key={
-                "PK": key,      # Hash key
-                "SK": "META#1"  # Range key (según database-writer)
-            },
-            UpdateExpression=update_expr,
-            ExpressionAttributeNames=expr_attr_names,
-            ExpressionAttributeValues=expr_attr_values,
-            ReturnValues="ALL_NEW"
-        )
-
-        # Convertir Decimal a tipos nativos de Python para JSON
-        def convert_decimal(obj):
-            """Convert Decimal objects to float for JSON serialization"""
-            if isinstance(obj, Decimal):
-                return float(obj)
-            if isinstance(obj, dict):
-                return {k: convert_decimal(v) for k, v in obj.items()}
-            if isinstance(obj, list):
-                return [convert_decimal(item) for item in obj]
-            return obj
-        
-        updated_item = convert_decimal(response["Attributes"])
-        
-        return {
-            "statusCode": 200,
-            "body": json.dumps({
-                "message": "Factura actualizada correctamente",
-                "updated_item": updated_item
-            })
-        }
+        return responses.json_response(event, {
+            "message": "Factura actualizada correctamente",
+            "updated_item": updated
+        }, decimal=float, metrics=metrics)
 
     except Exception as e:
         return {
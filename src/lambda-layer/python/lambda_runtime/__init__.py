@@ -0,0 +1,23 @@
+"""
+Código compartido por las lambdas de src/, distribuido en lambda-layer.zip
+(carpeta python/, que Lambda agrega al sys.path).
+
+- aggregates: agregados por usuario (count y total por proveedor, mes y CUIT),
+  actualizados con ADD después de cada escritura (best-effort).
+- aws: clientes y resources de boto3 creados recién al primer uso y cacheados
+  entre invocaciones, con una configuración de botocore común.
+- etags: versión por usuario y GET condicional (ETag / If-None-Match).
+- events: lectura de parámetros comunes de los eventos de API Gateway.
+- imports: imports diferidos para dependencias pesadas.
+- invoice_keys: claves de los GSI por fecha, proveedor y CUIT, y filtros de consulta.
+- metrics: tiempos por etapa y contadores en CloudWatch Embedded Metric Format.
+- responses: respuestas JSON con Decimal serializados en una pasada y gzip/brotli negociado.
+- s3_stream: objetos grandes escritos en S3 con multipart upload, con memoria acotada.
+- text_index: términos del índice invertido de búsqueda (database-writer / invoice-search).
+"""
+from lambda_runtime.aws import client, resource
+from lambda_runtime.events import extract_username, jwt_username
+from lambda_runtime.imports import lazy_module
+from lambda_runtime.metrics import Metrics
+
+__all__ = ["client", "resource", "extract_username", "jwt_username", "lazy_module", "Metrics"]
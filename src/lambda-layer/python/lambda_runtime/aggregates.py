@@ -0,0 +1,96 @@
+"""
+Agregados por usuario que se mantienen junto a las facturas.
+
+Cada usuario tiene items con PK "AGG#<userId>" y SK "<dimensión>#<valor>"
+(proveedor, mes, CUIT) más uno "ALL", con `count` y `total`. Al insertar o
+editar una factura se calcula el delta entre la versión vieja y la nueva y se
+aplica con ADD, que es atómico en DynamoDB.
+
+Los agregados son best-effort: el ADD va después de escribir la factura, no
+en la misma transacción. Con TransactWriteItems todas las escrituras de un
+usuario tocarían su item "ALL", y las que corren en paralelo (batches de SQS
+concurrentes, el modo bulk de invoice-data-updater) se cancelarían entre sí
+con TransactionConflict. Si un update falla la factura queda escrita igual:
+se cuenta en la métrica `aggregate_errors`, se loguean los usuarios afectados
+y `tools/rebuild_aggregates.py --user <userId> --apply` recalcula sus
+agregados desde las facturas. Reintentar la escritura no lo arreglaría: la
+factura ya está y el delta sería cero.
+"""
+from decimal import Decimal, InvalidOperation
+
+AGG_PREFIX = "AGG#"
+# dimensión -> función que obtiene el valor desde data
+DIMENSIONS = {
+    "SUPPLIER": lambda data: " ".join(str(data.get("proveedor") or "").upper().split()),
+    "MONTH": lambda data: str(data.get("fecha") or "")[:7],
+    "CUIT": lambda data: str(data.get("cuit") or ""),
+}
+
+
+def aggregate_pk(user_id):
+    return f"{AGG_PREFIX}{user_id}"
+
+
+def aggregate_user(pk):
+    return pk[len(AGG_PREFIX):]
+
+
+def invoice_total(data):
+    try:
+        return Decimal(str(data.get("total")))
+    except (InvalidOperation, TypeError, ValueError):
+        return Decimal(0)
+
+
+def contributions(item):
+    """Claves de agregado (PK, SK) a las que suma una factura, con su total."""
+    if not item or not item.get("userId"):
+        return {}, Decimal(0)
+    data = item.get("data") or {}
+    pk = aggregate_pk(item["userId"])
+    keys = [(pk, "ALL")]
+    for dimension, get_value in DIMENSIONS.items():
+        value = get_value(data)
+        if value:
+            keys.append((pk, f"{dimension}#{value}"))
+    return keys, invoice_total(data)
+
+
+def delta(old_item, new_item, into=None):
+    """Acumula en `into` el cambio de count/total al pasar de old_item a new_item."""
+    deltas = {} if into is None else into
+    for item, sign in ((old_item, -1), (new_item, 1)):
+        keys, total = contributions(item)
+        for key in keys:
+            count_delta, total_delta = deltas.get(key, (0, Decimal(0)))
+            deltas[key] = (count_delta + sign, total_delta + sign * total)
+    return deltas
+
+
+def apply_deltas(table, deltas, metrics=None):
+    """
+    Un update_item con ADD por clave de agregado; omite los deltas nulos.
+    Un update que falla no corta los demás: devuelve las claves que quedaron
+    sin aplicar y, con `metrics`, las cuenta en `aggregate_errors`.
+    """
+    failed = []
+    for (pk, sk), (count_delta, total_delta) in deltas.items():
+        if count_delta == 0 and total_delta == 0:
+            continue
+        dimension, _, value = sk.partition("#")
+        try:
+            table.update_item(
+                Key={"PK": pk, "SK": sk},
+                UpdateExpression="SET #dim = :dim, #val = :val ADD #count :c, #total :t",
+                ExpressionAttributeNames={"#dim": "dimension", "#val": "value", "#count": "count", "#total": "total"},
+                ExpressionAttributeValues={":dim": dimension, ":val": value, ":c": count_delta, ":t": total_delta},
+            )
+        except Exception as e:
+            print(f"Error actualizando agregado {pk} {sk}: {str(e)}")
+            failed.append((pk, sk))
+    if failed:
+        if metrics is not None:
+            metrics.add("aggregate_errors", len(failed))
+        users = sorted({aggregate_user(pk) for pk, _ in failed})
+        print(f"Agregados desviados de {', '.join(users)}: corregir con tools/rebuild_aggregates.py --user <userId> --apply")
+    return failed
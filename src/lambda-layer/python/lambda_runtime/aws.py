@@ -0,0 +1,102 @@
+"""
+Clientes y resources de boto3 perezosos.
+
+`client("s3")` y `resource("dynamodb")` devuelven un proxy que crea el objeto
+real en el primer uso y lo reutiliza en las invocaciones siguientes del mismo
+contenedor. Así el import del handler no paga la creación de clientes que
+la invocación quizás no necesita, y los scripts de bench/ pueden reemplazar
+el atributo del módulo por un stand-in antes de que se cree nada.
+
+La configuración de botocore se ajusta con variables de entorno:
+AWS_MAX_POOL_CONNECTIONS, AWS_CONNECT_TIMEOUT, AWS_READ_TIMEOUT y
+AWS_MAX_ATTEMPTS.
+"""
+import os
+import threading
+
+from lambda_runtime.imports import lazy_module
+
+boto3 = lazy_module("boto3")
+
+MAX_POOL_CONNECTIONS = int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", "25"))
+CONNECT_TIMEOUT = float(os.environ.get("AWS_CONNECT_TIMEOUT", "2"))
+READ_TIMEOUT = float(os.environ.get("AWS_READ_TIMEOUT", "10"))
+MAX_ATTEMPTS = int(os.environ.get("AWS_MAX_ATTEMPTS", "5"))
+
+_lock = threading.Lock()
+
+
+def botocore_config(**overrides):
+    """
+    Pool de conexiones dimensionado para los ThreadPoolExecutor de las lambdas,
+    TCP keep-alive para reutilizar conexiones entre invocaciones y reintentos
+    adaptativos (con rate limiting del lado del cliente ante throttling).
+    """
+    from botocore.config import Config
+
+    settings = {
+        "max_pool_connections": MAX_POOL_CONNECTIONS,
+        "connect_timeout": CONNECT_TIMEOUT,
+        "read_timeout": READ_TIMEOUT,
+        "tcp_keepalive": True,
+        "retries": {"mode": "adaptive", "max_attempts": MAX_ATTEMPTS},
+    }
+    settings.update(overrides)
+    return Config(**settings)
+
+
+class _Lazy:
+    def __init__(self, factory, description):
+        self._factory = factory
+        self._description = description
+        self._target = None
+
+    def get(self):
+        """Crea (una sola vez) y devuelve el cliente o resource real."""
+        if self._target is None:
+            with _lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return self._target
+
+    @property
+    def created(self):
+        return self._target is not None
+
+    def __getattr__(self, attribute):
+        return getattr(self.get(), attribute)
+
+    def __repr__(self):
+        state = "created" if self.created else "not created"
+        return f"<lazy {self._description} ({state})>"
+
+
+class LazyClient(_Lazy):
+    pass
+
+
+class LazyResource(_Lazy):
+    def __init__(self, factory, description):
+        super().__init__(factory, description)
+        self._tables = {}
+
+    def Table(self, name):
+        """Los Table handles también se cachean por nombre."""
+        table = self._tables.get(name)
+        if table is None:
+            table = self._tables.setdefault(name, self.get().Table(name))
+        return table
+
+
+def client(service_name, **config_overrides):
+    return LazyClient(
+        lambda: boto3.client(service_name, config=botocore_config(**config_overrides)),
+        f"{service_name} client",
+    )
+
+
+def resource(service_name, **config_overrides):
+    return LazyResource(
+        lambda: boto3.resource(service_name, config=botocore_config(**config_overrides)),
+        f"{service_name} resource",
+    )
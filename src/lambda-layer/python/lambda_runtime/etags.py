@@ -0,0 +1,84 @@
+"""
+ETags por usuario para las lecturas de la API (GET condicional).
+
+Cada usuario tiene un contador en el item PK "VERSION#<userId>", SK "ALL",
+que database-writer e invoice-data-updater incrementan con `bump` después de
+escribir sus facturas. Los handlers de lectura lo leen con `current` antes de
+consultar: el ETag combina la versión con el usuario y los parámetros de la
+request, así que si llega en If-None-Match se responde 304 con ese único
+GetItem, sin query ni serialización.
+
+El GSI y las lecturas no consistentes pueden tardar en reflejar una escritura;
+durante `SETTLE_SECONDS` después de un bump no se emite ETag, para que el
+cliente no cachee una respuesta que todavía no incluye el cambio.
+"""
+import hashlib
+import json
+import os
+import time
+
+from lambda_runtime import events
+
+VERSION_PREFIX = "VERSION#"
+SETTLE_SECONDS = float(os.environ.get("ETAG_SETTLE_SECONDS", "2"))
+# El navegador guarda la respuesta pero la revalida siempre con If-None-Match
+CACHE_CONTROL = "private, no-cache"
+
+
+def version_key(user_id):
+    return {"PK": f"{VERSION_PREFIX}{user_id}", "SK": "ALL"}
+
+
+def bump(table, user_ids, clock=time.time):
+    """Incrementa la versión de cada usuario (una vez por usuario)."""
+    for user_id in dict.fromkeys(user_id for user_id in user_ids if user_id):
+        table.update_item(
+            Key=version_key(user_id),
+            UpdateExpression="SET #updated = :now ADD #version :one",
+            ExpressionAttributeNames={"#updated": "updated_at", "#version": "version"},
+            ExpressionAttributeValues={":now": int(clock()), ":one": 1},
+        )
+
+
+def current(table, user_id, *variant, clock=time.time):
+    """
+    ETag débil de la respuesta para `user_id` y `variant` (los parámetros que
+    cambian el contenido), o None si no se puede usar ETag en este momento.
+    """
+    try:
+        item = table.get_item(
+            Key=version_key(user_id),
+            ProjectionExpression="#version, #updated",
+            ExpressionAttributeNames={"#version": "version", "#updated": "updated_at"},
+            ConsistentRead=True,
+        ).get("Item") or {}
+    except Exception as e:
+        print(f"No se pudo leer la versión de {user_id}: {str(e)}")
+        return None
+    if item.get("updated_at") is not None and clock() - int(item["updated_at"]) < SETTLE_SECONDS:
+        return None
+    digest = hashlib.sha256(json.dumps([user_id, *variant], default=str).encode("utf-8")).hexdigest()[:16]
+    return f'W/"{int(item.get("version", 0))}-{digest}"'
+
+
+def matches(event, etag):
+    """True si el If-None-Match de la request incluye `etag` (comparación débil)."""
+    header = events.header(event, "if-none-match")
+    if not etag or not header:
+        return False
+    if header.strip() == "*":
+        return True
+    strip = etag[2:] if etag.startswith("W/") else etag
+    return any((tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip()) == strip
+               for tag in header.split(","))
+
+
+def not_modified(etag):
+    return {"statusCode": 304, "headers": {"ETag": etag, "Cache-Control": CACHE_CONTROL}, "body": ""}
+
+
+def attach(response, etag):
+    """Agrega ETag y Cache-Control a una respuesta 200."""
+    if etag and response.get("statusCode") == 200:
+        response["headers"] = {**(response.get("headers") or {}), "ETag": etag, "Cache-Control": CACHE_CONTROL}
+    return response
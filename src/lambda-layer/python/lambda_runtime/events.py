@@ -0,0 +1,37 @@
+"""Lectura de parámetros de eventos de API Gateway (HTTP API, payload v2)."""
+
+
+def extract_username(event):
+    """
+    Usuario de la request: los claims del JWT validado por API Gateway. Sólo
+    las invocaciones directas o locales (sin `requestContext`) pueden pasar
+    `username` en el evento o en el query string.
+    """
+    if not isinstance(event, dict):
+        return None
+    if "requestContext" in event:
+        return jwt_username(event)
+    if event.get("username"):
+        return event["username"]
+    qsp = event.get("queryStringParameters") or {}
+    if qsp.get("username"):
+        return qsp["username"]
+    return jwt_username(event)
+
+
+def jwt_username(event):
+    """Usuario sólo desde los claims del JWT validado por API Gateway (sin overrides del evento)."""
+    if not isinstance(event, dict):
+        return None
+    claims = (((event.get("requestContext") or {}).get("authorizer") or {}).get("jwt") or {}).get("claims") or {}
+    return claims.get("cognito:username") or claims.get("email") or claims.get("sub") or None
+
+
+def header(event, name):
+    """Valor del header `name` (en minúscula) de la request, o None."""
+    headers = (event.get("headers") if isinstance(event, dict) else None) or {}
+    # HTTP API (payload v2) manda los nombres en minúscula
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
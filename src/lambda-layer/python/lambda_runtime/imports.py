@@ -0,0 +1,33 @@
+"""Imports diferidos: el módulo se importa recién al acceder a un atributo."""
+import importlib
+import threading
+
+
+class _LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_module(name):
+    """
+    Devuelve un stand-in de `name` que lo importa en el primer acceso, para no
+    pagar dependencias pesadas (p. ej. PyPDF2) en el cold start de
+    invocaciones que no las usan.
+    """
+    return _LazyModule(name)
@@ -0,0 +1,130 @@
+"""
+Claves de acceso de las facturas (item PK=file_key, SK "META#1") para
+consultar por fecha, proveedor y CUIT con key conditions en lugar de traer
+todas las facturas del usuario y filtrar en Python:
+
+    groupKey     "<fecha ISO>#<file_key>"  range key de los tres índices
+    supplierKey  "<userId>#<PROVEEDOR>"    hash key de GSI_User_Supplier
+    cuitKey      "<userId>#<cuit>"         hash key de GSI_User_Cuit
+
+GSI_User_Group (userId, groupKey) queda ordenado por fecha. Las facturas sin
+fecha usan UNDATED, que ordena después de cualquier fecha y nunca cae en un
+rango. supplierKey y cuitKey se omiten si falta el dato (índices dispersos).
+El proveedor se normaliza igual que la dimensión SUPPLIER de los agregados,
+así los valores de view=summary sirven directamente como filtro.
+"""
+import re
+from datetime import date
+
+USER_INDEX = "GSI_User_Group"
+SUPPLIER_INDEX = "GSI_User_Supplier"
+CUIT_INDEX = "GSI_User_Cuit"
+UNDATED = "sin-fecha"
+# Atributos de clave que se recalculan cuando cambia el dato del que dependen
+KEY_FIELDS = {"groupKey": "fecha", "supplierKey": "proveedor", "cuitKey": "cuit"}
+
+_ISO_PREFIX = re.compile(r"^\d{4}(-\d{2}(-\d{2})?)?$")
+# Mayor que cualquier carácter de una fecha o de "#": cierra un rango por prefijo
+_RANGE_END = "~"
+
+
+def normalize_date(value):
+    """aaaa-mm-dd, dd/mm/aaaa, dd-mm-aa, etc. -> aaaa-mm-dd, o None si no es una fecha válida."""
+    value = str(value or "").strip()
+    try:
+        if re.fullmatch(r"\d{4}-\d{1,2}-\d{1,2}", value):
+            year, month, day = (int(part) for part in value.split("-"))
+        elif re.fullmatch(r"\d{1,2}[/-]\d{1,2}[/-](\d{4}|\d{2})", value):
+            day, month, year = (int(part) for part in re.split(r"[/-]", value))
+            if year < 100:
+                year += 2000
+        else:
+            return None
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def normalize_supplier(value):
+    return " ".join(str(value or "").upper().split())
+
+
+def normalize_cuit(value):
+    """"30-71234567-1", "30712345671" -> "30-71234567-1"; otros formatos quedan sin guiones ni espacios."""
+    digits = re.sub(r"[\s-]", "", str(value or ""))
+    if len(digits) == 11 and digits.isdigit():
+        return f"{digits[:2]}-{digits[2:10]}-{digits[10]}"
+    return digits
+
+
+def group_key(file_key, fecha):
+    return f"{normalize_date(fecha) or UNDATED}#{file_key}"
+
+
+def key_value(name, user_id, file_key, value):
+    """Valor del atributo de clave `name` (ver KEY_FIELDS), o None si hay que omitirlo."""
+    if name == "groupKey":
+        return group_key(file_key, value)
+    normalized = normalize_supplier(value) if name == "supplierKey" else normalize_cuit(value)
+    return f"{user_id}#{normalized}" if normalized and user_id else None
+
+
+def access_keys(user_id, file_key, data):
+    """Atributos de clave de una factura a partir de su `data`."""
+    keys = {}
+    for name, field in KEY_FIELDS.items():
+        value = key_value(name, user_id, file_key, (data or {}).get(field))
+        if value is not None:
+            keys[name] = value
+    return keys
+
+
+def parse_filters(params):
+    """
+    Lee `from`, `to` (aaaa, aaaa-mm, aaaa-mm-dd o dd/mm/aaaa), `supplier` y
+    `cuit` de un query string. Lanza ValueError si una fecha no es válida.
+    """
+    params = params or {}
+    filters = {}
+    for name in ("from", "to"):
+        value = (params.get(name) or "").strip()
+        if not value:
+            continue
+        normalized = value if _ISO_PREFIX.match(value) else normalize_date(value)
+        if not normalized:
+            raise ValueError(f"'{name}' must be a date (YYYY-MM-DD, YYYY-MM or YYYY)")
+        filters[name] = normalized
+    if filters.get("from") and filters.get("to") and filters["from"] > filters["to"] + _RANGE_END:
+        raise ValueError("'from' must not be after 'to'")
+    if normalize_supplier(params.get("supplier")):
+        filters["supplier"] = normalize_supplier(params["supplier"])
+    if normalize_cuit(params.get("cuit")):
+        filters["cuit"] = normalize_cuit(params["cuit"])
+    return filters
+
+
+def query_kwargs(user_id, filters=None, user_index=USER_INDEX):
+    """
+    IndexName, KeyConditionExpression y, si hace falta, FilterExpression para
+    las facturas de `user_id` que cumplen `filters` (ver parse_filters). Con
+    proveedor y CUIT a la vez se consulta por CUIT y el proveedor se filtra.
+    `user_index` es el nombre de GSI_User_Group (INDEX_NAME de cada lambda).
+    """
+    # Import local: boto3 se carga recién con el primer cliente (ver lambda_runtime.aws)
+    from boto3.dynamodb.conditions import Attr, Key
+
+    filters = filters or {}
+    if filters.get("cuit"):
+        kwargs = {"IndexName": CUIT_INDEX, "KeyConditionExpression": Key("cuitKey").eq(f"{user_id}#{filters['cuit']}")}
+        if filters.get("supplier"):
+            kwargs["FilterExpression"] = Attr("supplierKey").eq(f"{user_id}#{filters['supplier']}")
+    elif filters.get("supplier"):
+        kwargs = {"IndexName": SUPPLIER_INDEX, "KeyConditionExpression": Key("supplierKey").eq(f"{user_id}#{filters['supplier']}")}
+    else:
+        kwargs = {"IndexName": user_index, "KeyConditionExpression": Key("userId").eq(user_id)}
+
+    start, end = filters.get("from"), filters.get("to")
+    if start or end:
+        date_range = Key("groupKey").between(start or "0", (end or "9999") + _RANGE_END)
+        kwargs["KeyConditionExpression"] = kwargs["KeyConditionExpression"] & date_range
+    return kwargs
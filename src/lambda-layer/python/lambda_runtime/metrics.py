@@ -0,0 +1,158 @@
+"""
+Métricas por etapa en CloudWatch Embedded Metric Format (EMF).
+
+Cada lambda crea un `Metrics` a nivel de módulo y decora su handler:
+
+    metrics = Metrics("database-writer")
+
+    @metrics.handler
+    def handler(event, context):
+        with metrics.stage("download"):
+            ...
+        metrics.add("bytes", size, unit="Bytes")
+
+Al terminar cada invocación se imprime una sola línea JSON en formato EMF que
+CloudWatch convierte en métricas, con dimensiones Function y Outcome
+(ok, client_error, partial o error según la respuesta). Las etapas que se
+repiten dentro de una invocación (p. ej. una descarga por PDF del batch) se
+emiten como arreglo de valores, con un máximo de 100 por métrica.
+
+Con METRICS_ENABLED=false `stage()` devuelve siempre el mismo context manager
+vacío y no se emite nada.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "FactuTable")
+MAX_VALUES = 100  # límite de EMF para un arreglo de valores
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+def _enabled_from_env():
+    return os.environ.get("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def outcome_of(response):
+    """Clasifica la respuesta del handler para la dimensión Outcome."""
+    if not isinstance(response, dict):
+        return "ok"
+    if response.get("batchItemFailures"):
+        return "partial"
+    status = response.get("statusCode")
+    if isinstance(status, int):
+        if status >= 500:
+            return "error"
+        if status >= 400:
+            return "client_error"
+    return "ok"
+
+
+class _Stage:
+    __slots__ = ("_invocation", "_name", "_start")
+
+    def __init__(self, invocation, name):
+        self._invocation = invocation
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._invocation.add(f"{self._name}_ms", (time.perf_counter() - self._start) * 1000, "Milliseconds")
+        return False
+
+
+class _Invocation:
+    def __init__(self):
+        self.values = {}
+        self.units = {}
+        self.properties = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, value, unit):
+        with self._lock:
+            values = self.values.setdefault(name, [])
+            if len(values) < MAX_VALUES:
+                values.append(value)
+            self.units[name] = unit
+
+    def document(self, namespace, function, outcome):
+        metrics = {name: [round(v, 3) if isinstance(v, float) else v for v in values]
+                   for name, values in self.values.items()}
+        doc = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": namespace,
+                    "Dimensions": [["Function", "Outcome"]],
+                    "Metrics": [{"Name": name, "Unit": self.units[name]} for name in metrics],
+                }],
+            },
+            "Function": function,
+            "Outcome": outcome,
+        }
+        doc.update(self.properties)
+        doc.update({name: values[0] if len(values) == 1 else values for name, values in metrics.items()})
+        return doc
+
+
+class Metrics:
+    """
+    `emit` recibe la línea JSON de cada invocación (por defecto print, que
+    Lambda manda a CloudWatch Logs); en bench/ se reemplaza para verificarla.
+    """
+
+    def __init__(self, function, namespace=NAMESPACE, enabled=None, emit=print):
+        self.function = os.environ.get("AWS_LAMBDA_FUNCTION_NAME") or function
+        self.namespace = namespace
+        self.enabled = _enabled_from_env() if enabled is None else enabled
+        self.emit = emit
+        self._current = None
+
+    def stage(self, name):
+        """Context manager que mide la etapa `name` (métrica `<name>_ms`)."""
+        invocation = self._current
+        if invocation is None:
+            return _NULL_STAGE
+        return _Stage(invocation, name)
+
+    def add(self, name, value, unit="Count"):
+        invocation = self._current
+        if invocation is not None:
+            invocation.add(name, value, unit)
+
+    def set_property(self, name, value):
+        """Dato de contexto en el log (no es métrica), p. ej. el tamaño del batch."""
+        invocation = self._current
+        if invocation is not None:
+            invocation.properties[name] = value
+
+    def handler(self, fn):
+        """Decorador del handler: abre la invocación, mide el total y emite el EMF."""
+
+        @functools.wraps(fn)
+        def wrapper(event, context):
+            if not self.enabled:
+                return fn(event, context)
+            invocation = self._current = _Invocation()
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                response = fn(event, context)
+                outcome = outcome_of(response)
+                return response
+            finally:
+                invocation.add("invocation_ms", (time.perf_counter() - start) * 1000, "Milliseconds")
+                self._current = None
+                try:
+                    self.emit(json.dumps(invocation.document(self.namespace, self.function, outcome), default=str))
+                except Exception as e:
+                    print(f"Error emitiendo métricas: {str(e)}")
+
+        return wrapper
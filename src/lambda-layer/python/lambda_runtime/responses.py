@@ -0,0 +1,127 @@
+"""
+Respuestas JSON de la API: serialización y compresión negociada.
+
+`json_response` serializa el payload en una sola pasada (los Decimal que
+devuelve DynamoDB se convierten en el `default` del encoder, sin copiar el
+payload antes) y, si el body tiene al menos COMPRESS_MIN_BYTES y el
+Accept-Encoding de la request lo permite, lo comprime con brotli o gzip. El
+body comprimido va en base64 con isBase64Encoded, que API Gateway decodifica
+antes de mandarlo al cliente con el Content-Encoding indicado.
+
+brotli se usa sólo si el paquete `brotli` está instalado (no viene con el
+runtime de Lambda); si no, gzip de la biblioteca estándar.
+"""
+import base64
+import contextlib
+import gzip
+import json
+import os
+from decimal import Decimal
+
+from lambda_runtime.events import header
+
+# Debajo de esto la compresión no ahorra un paquete y cuesta CPU
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+# Calidad para contenido dinámico: 11 comprime un poco más pero es mucho más lenta
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "5"))
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _decimal_as_str(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):  # string sets de DynamoDB (p. ej. editedFields)
+        return sorted(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _decimal_as_float(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+_ENCODERS = {
+    str: json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(",", ":"), default=_decimal_as_str),
+    float: json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(",", ":"), default=_decimal_as_float),
+}
+
+
+def dumps(payload, decimal=str):
+    """JSON compacto de `payload`; los Decimal salen como `decimal` (str o float) y los sets como listas."""
+    return _ENCODERS[decimal].encode(payload)
+
+
+def _accepted(event):
+    """{encoding: q} del header Accept-Encoding."""
+    accepted = {}
+    for part in (header(event, "accept-encoding") or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def negotiate(event):
+    """'br', 'gzip' o None según el Accept-Encoding de la request."""
+    accepted = _accepted(event)
+    wildcard = accepted.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_quality = None, 0.0
+    for encoding in candidates:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def json_response(event, payload, status=200, headers=None, decimal=str, metrics=None):
+    """
+    Respuesta de API Gateway con `payload` en JSON, comprimida si conviene.
+    Con `metrics` registra las etapas serialize/compress y los bytes enviados.
+    """
+    with _stage(metrics, "serialize"):
+        body = dumps(payload, decimal)
+    response = {
+        "statusCode": status,
+        "headers": {"Content-Type": "application/json", **(headers or {})},
+        "body": body,
+    }
+    encoded = body.encode("utf-8")
+    encoding = negotiate(event) if len(encoded) >= COMPRESS_MIN_BYTES else None
+    if encoding:
+        with _stage(metrics, "compress"):
+            encoded = compress(encoded, encoding)
+            response["body"] = base64.b64encode(encoded).decode("ascii")
+        response["isBase64Encoded"] = True
+        response["headers"]["Content-Encoding"] = encoding
+    # El body depende del Accept-Encoding: los caches tienen que distinguirlo
+    response["headers"]["Vary"] = "Accept-Encoding"
+    if metrics is not None:
+        metrics.add("response_bytes", len(encoded), unit="Bytes")
+    return response
+
+
+def _stage(metrics, name):
+    return metrics.stage(name) if metrics is not None else contextlib.nullcontext()
@@ -0,0 +1,72 @@
+"""Escritura de objetos grandes en S3 por partes (export, bundles de PDFs)."""
+import zlib
+
+# S3 exige partes de al menos 5 MiB (salvo la última)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class MultipartUploadWriter:
+    """
+    Escribe un objeto en S3 por partes a medida que llegan los datos, así la
+    memoria usada queda acotada a una parte sin importar el tamaño total.
+    Con gzip=True el contenido se comprime en streaming (formato .gz).
+    """
+
+    def __init__(self, s3, bucket, key, content_type, part_size=8 * 1024 * 1024, gzip=False):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.buffer = bytearray()
+        self.parts = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # wbits=31 genera encabezado y checksum gzip
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+        response = s3.create_multipart_upload(Bucket=bucket, Key=key, ContentType=content_type)
+        self.upload_id = response["UploadId"]
+
+    def write(self, data):
+        """Devuelve los bytes recibidos, como un archivo (zipfile lleva el offset con eso)."""
+        size = len(data)
+        self.bytes_in += size
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+        self.buffer += data
+        if len(self.buffer) >= self.part_size:
+            self._upload_part()
+        return size
+
+    def _upload_part(self):
+        part_number = len(self.parts) + 1
+        response = self.s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=self.buffer,
+        )
+        self.bytes_out += len(self.buffer)
+        self.parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+        self.buffer = bytearray()
+
+    def flush(self):
+        """Para usarlo como archivo (p. ej. con zipfile): las partes se suben solas al llenarse."""
+
+    def close(self):
+        if self.compressor is not None:
+            self.buffer += self.compressor.flush()
+        if self.buffer or not self.parts:
+            self._upload_part()
+        self.s3.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts},
+        )
+
+    def abort(self):
+        try:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        except Exception as e:
+            print(f"Error abortando multipart upload {self.key}: {str(e)}")
@@ -0,0 +1,110 @@
+"""
+Índice invertido por usuario para buscar facturas por palabra.
+
+database-writer tokeniza el texto extraído de cada PDF y escribe un item por
+término (posting):
+
+    PK "IDX#<userId>#<primer carácter del término>", SK "<término>#<file_key>", file_key
+
+Los términos son [a-z0-9]+ en minúscula y sin acentos, así que nunca
+contienen "#": buscar un término exacto es una query con
+begins_with(SK, "<término>#") y un prefijo es begins_with(SK, "<prefijo>"),
+que recorre todos los términos que empiezan así. Como término y prefijo
+tienen al menos MIN_TERM_LENGTH caracteres, su primer carácter dice en cuál
+de las (hasta 36) particiones del usuario buscar: los postings de una
+factura se reparten entre ellas en lugar de cargar una sola partición.
+invoice-search usa las mismas funciones para normalizar la consulta.
+
+Los términos indexados de cada factura se guardan en un item aparte,
+PK file_key / SK TERMS#1 (terms_record): al reindexarla el writer borra los
+postings de los términos que ya no están (stale_keys). No van en el item de
+la factura porque los GSI proyectan todos sus atributos y se copiarían en
+cada uno.
+"""
+import os
+import re
+import unicodedata
+
+INDEX_PREFIX = "IDX#"
+TERMS_SK = "TERMS#1"
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 40
+# Tope de términos distintos por factura (los primeros que aparecen en el texto):
+# cada uno es un posting, o sea una unidad de escritura por factura
+MAX_TERMS_PER_INVOICE = int(os.environ.get("MAX_INDEX_TERMS", "200"))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def index_pk(user_id, term):
+    """Partición del índice donde está `term` (o los términos que empiezan con ese prefijo)."""
+    return f"{INDEX_PREFIX}{user_id}#{term[0]}"
+
+
+def normalize(text):
+    """Minúsculas y sin acentos ("Órden" -> "orden")."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def terms(text, limit=MAX_TERMS_PER_INVOICE):
+    """Términos distintos del texto, en orden de aparición."""
+    found = {}
+    for token in _TOKEN.findall(normalize(text)):
+        if MIN_TERM_LENGTH <= len(token) <= MAX_TERM_LENGTH and token not in found:
+            found[token] = None
+            if limit and len(found) >= limit:
+                break
+    return list(found)
+
+
+def postings(user_id, file_key, invoice_terms):
+    """Items del índice para una factura."""
+    return [{**key, "file_key": file_key} for key in posting_keys(user_id, file_key, invoice_terms)]
+
+
+def posting_keys(user_id, file_key, invoice_terms):
+    """Claves (PK, SK) de los postings de una factura, p. ej. para borrarlos."""
+    return [{"PK": index_pk(user_id, term), "SK": f"{term}#{file_key}"} for term in invoice_terms]
+
+
+def terms_record(file_key, invoice_terms):
+    """Item con los términos indexados de una factura (sin `terms` si no tiene ninguno)."""
+    record = {"PK": file_key, "SK": TERMS_SK, "file_key": file_key}
+    if invoice_terms:
+        record["terms"] = set(invoice_terms)
+    return record
+
+
+def stale_keys(user_id, file_key, record, invoice_postings):
+    """
+    Claves de los postings del indexado anterior (`record`, el terms_record
+    guardado) que no están entre los nuevos `invoice_postings`.
+    """
+    current = {posting["SK"] for posting in invoice_postings}
+    previous = sorted((record or {}).get("terms") or ())
+    return [key for key in posting_keys(user_id, file_key, previous) if key["SK"] not in current]
+
+
+def parse_query(query):
+    """
+    Convierte la consulta del usuario en [(término, es_prefijo)]. Una palabra
+    terminada en "*" se busca como prefijo ("acei*"); el resto, exacta.
+    Palabras como "30-71234567-1" se parten igual que al indexar.
+    """
+    parsed = []
+    for word in (query or "").split():
+        prefix = word.endswith("*")
+        tokens = _TOKEN.findall(normalize(word))
+        for index, token in enumerate(tokens):
+            is_prefix = prefix and index == len(tokens) - 1
+            if not MIN_TERM_LENGTH <= len(token) <= MAX_TERM_LENGTH:
+                continue
+            if (token, is_prefix) not in parsed:
+                parsed.append((token, is_prefix))
+    return parsed
+
+
+def key_prefix(term, is_prefix):
+    """Valor de begins_with(SK, ...) para buscar el término."""
+    return term if is_prefix else f"{term}#"
@@ -1,35 +1,185 @@
 import json
-import boto3
+import math
+from lambda_runtime import Metrics, aws
 import os
 import uuid
 
 
-s3 = boto3.client("s3")
+s3 = aws.client("s3")
 BUCKET = os.environ["UPLOAD_BUCKET"]
+metrics = Metrics("presigned-url-generator")
+URL_EXPIRATION = int(os.environ.get("UPLOAD_URL_EXPIRATION", "3000"))
+# Archivos por request batch ({"files": [...]}); firmar es local, el límite acota el tamaño de la respuesta
+MAX_BATCH_FILES = int(os.environ.get("MAX_BATCH_FILES", "500"))
+# Mismo límite que aplica database-writer; un archivo más grande se rechazaría después de subirlo
+MAX_PDF_BYTES = int(os.environ.get("MAX_PDF_BYTES", str(50 * 1024 * 1024)))
+MULTIPART_PART_SIZE_MB = int(os.environ.get("MULTIPART_PART_SIZE_MB", "5"))
+MIN_PART_SIZE = 5 * 1024 * 1024  # mínimo de S3 para todas las partes menos la última
+MAX_PARTS = 10000
 
+
+def _response(status_code, body):
+    return {"statusCode": status_code, "body": json.dumps(body)}
+
+
+def _parse_body(event):
+    """La invocación directa trae los campos en el evento; API Gateway manda un string JSON en body."""
+    body = event.get("body")
+    if isinstance(body, str) and body:
+        try:
+            parsed = json.loads(body)
+        except Exception:
+            parsed = None
+        if isinstance(parsed, dict):
+            return {**event, **parsed}
+    return event
+
+
+def _is_file_name(value):
+    return value is None or isinstance(value, str)
+
+
+def _new_file_id(file_name):
+    return str(uuid.uuid4()) + "_" + (file_name or "document") + ".pdf"
+
+
+def _presign_post(user_id, file_name):
+    file_id = _new_file_id(file_name)
+    # La policy del POST limita el tamaño: S3 rechaza el upload que supere MAX_PDF_BYTES
+    conditions = [["content-length-range", 1, MAX_PDF_BYTES]] if MAX_PDF_BYTES else None
+    presigned_url = s3.generate_presigned_post(
+        Bucket=BUCKET, Key=f"{user_id}/{file_id}", Conditions=conditions, ExpiresIn=URL_EXPIRATION
+    )
+    return {"upload_url": presigned_url, "file_key": file_id}
+
+
+def _batch(user_id, files):
+    """Un POST prefirmado por archivo: subir una carpeta cuesta una llamada a la API en lugar de una por archivo."""
+    if not isinstance(files, list) or not files:
+        return _response(400, {"error": "'files' tiene que ser una lista no vacía"})
+    if len(files) > MAX_BATCH_FILES:
+        return _response(400, {"error": f"Como máximo {MAX_BATCH_FILES} archivos por request"})
+    names = [(item.get("fileName") if isinstance(item, dict) else item) for item in files]
+    if not all(_is_file_name(name) for name in names):
+        return _response(400, {"error": "Cada 'fileName' tiene que ser un string"})
+    with metrics.stage("presign"):
+        uploads = [_presign_post(user_id, name) for name in names]
+    metrics.add("files", len(uploads))
+    return _response(200, {"uploads": uploads})
+
+
+def _owned_key(user_id, file_key):
+    """file_key es el id que devolvió action=start; el prefijo del usuario se agrega siempre acá."""
+    if not isinstance(file_key, str) or not file_key or "/" in file_key:
+        return None
+    return f"{user_id}/{file_key}"
+
+
+def _client_error(e):
+    return getattr(e, "response", {}).get("Error", {}).get("Code") in ("NoSuchUpload", "InvalidPart", "InvalidPartOrder", "EntityTooSmall")
+
+
+def _start_multipart(user_id, body):
+    try:
+        size = int(body.get("size"))
+    except (TypeError, ValueError):
+        return _response(400, {"error": "action=start requiere 'size' (en bytes)"})
+    if size <= 0 or (MAX_PDF_BYTES and size > MAX_PDF_BYTES):
+        return _response(400, {"error": f"'size' tiene que estar entre 1 y {MAX_PDF_BYTES} bytes"})
+    if not _is_file_name(body.get("fileName")):
+        return _response(400, {"error": "'fileName' tiene que ser un string"})
+
+    # Partes de MULTIPART_PART_SIZE_MB, más grandes sólo si el archivo necesitaría más de 10000
+    part_size = max(MULTIPART_PART_SIZE_MB * 1024 * 1024, MIN_PART_SIZE, math.ceil(size / MAX_PARTS))
+    part_count = math.ceil(size / part_size)
+    file_id = _new_file_id(body.get("fileName"))
+    key = f"{user_id}/{file_id}"
+    with metrics.stage("create"):
+        upload_id = s3.create_multipart_upload(Bucket=BUCKET, Key=key, ContentType="application/pdf")["UploadId"]
+    # Cada URL se firma con el largo exacto de su parte: no se puede subir más que el 'size' declarado
+    with metrics.stage("presign"):
+        parts = [
+            {
+                "part_number": number,
+                "url": s3.generate_presigned_url(
+                    "upload_part",
+                    Params={
+                        "Bucket": BUCKET,
+                        "Key": key,
+                        "UploadId": upload_id,
+                        "PartNumber": number,
+                        "ContentLength": min(part_size, size - (number - 1) * part_size),
+                    },
+                    ExpiresIn=URL_EXPIRATION,
+                ),
+            }
+            for number in range(1, part_count + 1)
+        ]
+    metrics.add("parts", part_count)
+    return _response(200, {"file_key": file_id, "upload_id": upload_id, "part_size": part_size, "parts": parts})
+
+
+def _complete_multipart(key, upload_id, parts):
+    if not isinstance(parts, list) or not parts:
+        return _response(400, {"error": "'parts' tiene que listar part_number y etag de cada parte subida"})
+    try:
+        completed = sorted(
+            ({"PartNumber": int(part["part_number"]), "ETag": str(part["etag"])} for part in parts),
+            key=lambda part: part["PartNumber"],
+        )
+    except (KeyError, TypeError, ValueError):
+        return _response(400, {"error": "Cada parte necesita 'part_number' y 'etag'"})
+    try:
+        with metrics.stage("complete"):
+            s3.complete_multipart_upload(Bucket=BUCKET, Key=key, UploadId=upload_id, MultipartUpload={"Parts": completed})
+    except Exception as e:
+        if _client_error(e):
+            return _response(400, {"error": str(e)})
+        raise
+    return _response(200, {"file_key": key.split("/", 1)[1], "completed": True})
+
+
+def _multipart(user_id, body):
+    """
+    action=start devuelve un URL prefirmado por parte para que el browser haga
+    los PUT en paralelo; action=complete (con el ETag de cada parte) arma el
+    objeto, que dispara el mismo evento de S3 que un upload con POST;
+    action=abort descarta las partes.
+    """
+    action = body.get("action")
+    if action == "start":
+        return _start_multipart(user_id, body)
+    if action not in ("complete", "abort"):
+        return _response(400, {"error": "'action' tiene que ser 'start', 'complete' o 'abort'"})
+    key = _owned_key(user_id, body.get("file_key"))
+    upload_id = body.get("upload_id")
+    if not key or not upload_id:
+        return _response(400, {"error": "Faltan 'file_key' y 'upload_id' de action=start"})
+    if action == "complete":
+        return _complete_multipart(key, upload_id, body.get("parts"))
+    try:
+        s3.abort_multipart_upload(Bucket=BUCKET, Key=key, UploadId=upload_id)
+    except Exception as e:
+        if not _client_error(e):
+            raise
+    return _response(200, {"file_key": body["file_key"], "aborted": True})
+
+
+@metrics.handler
 def handler(event, context):
     user_id = event["requestContext"]["authorizer"]["jwt"]["claims"]["sub"]
-    # API Gateway may forward the POST body as a JSON string in event['body']
-    file_name = None
-    if isinstance(event, dict):
-        file_name = event.get("fileName")
-        body = event.get("body")
-        if not file_name and body:
-            try:
-                parsed = json.loads(body)
-                file_name = parsed.get("fileName")
-            except Exception:
-                file_name = None
-    if not file_name:
-        file_name = "document"
-    file_id = str(uuid.uuid4()) + "_" + file_name + ".pdf"
-    key = f"{user_id}/{file_id}"
-    presigned_url = s3.generate_presigned_post(Bucket=BUCKET, Key=f"{key}", ExpiresIn=3000)
+    body = _parse_body(event) if isinstance(event, dict) else {}
+    if "files" in body:
+        return _batch(user_id, body["files"])
+    if "action" in body:
+        return _multipart(user_id, body)
+
+    file_name = body.get("fileName")
+    if not _is_file_name(file_name):
+        return _response(400, {"error": "'fileName' tiene que ser un string"})
+    with metrics.stage("presign"):
+        upload = _presign_post(user_id, file_name)
     return {
         "statusCode": 200,
-        "body": json.dumps({
-            "upload_url": presigned_url,
-            "file_key": file_id
-        })
-
-}
+        "body": json.dumps(upload)
+    }
@@ -1,34 +1,17 @@
 import json
 import os
-import boto3
-from boto3.dynamodb.conditions import Key
+import time
+from lambda_runtime import Metrics, aws, etags, extract_username, invoice_keys, responses
 from decimal import Decimal
 
-dynamodb = boto3.resource("dynamodb")
-
-
-def _convert_decimal(obj):
-    """Convert Decimal objects to string for JSON serialization"""
-    if isinstance(obj, Decimal):
-        return str(obj)
-    raise TypeError
+dynamodb = aws.resource("dynamodb")
+metrics = Metrics("report-generator")
 TABLE = os.environ.get("TABLE_NAME")
 INDEX_NAME = os.environ.get("INDEX_NAME", "GSI_User_Group")
-
-
-def _extract_username_from_event(event: dict):
-    if isinstance(event, dict) and event.get("username"):
-        return event.get("username")
-    qsp = event.get("queryStringParameters") if isinstance(event, dict) else None
-    if qsp and qsp.get("username"):
-        return qsp.get("username")
-    try:
-        claims = event.get("requestContext", {}).get("authorizer", {}).get("jwt", {}).get("claims", {})
-        if claims:
-            return claims.get("cognito:username") or claims.get("email") or claims.get("sub")
-    except Exception:
-        pass
-    return None
+# Sort key of invoice items, as written by database-writer
+META_SK = "META#1"
+BATCH_GET_CHUNK = 100  # DynamoDB limit per BatchGetItem call
+MAX_FILE_KEYS = int(os.environ.get("MAX_FILE_KEYS", "500"))
 
 
 def _get_file_key_from_event(event: dict):
@@ -39,39 +22,170 @@ def _get_file_key_from_event(event: dict):
     return None
 
 
+def _get_file_keys_from_event(event: dict):
+    """Extract a comma-separated list of file keys (`file_keys`) from query string parameters"""
+    qsp = event.get("queryStringParameters") if isinstance(event, dict) else None
+    if qsp and qsp.get("file_keys"):
+        keys = [key.strip() for key in qsp["file_keys"].split(",") if key.strip()]
+        return list(dict.fromkeys(keys))
+    return None
+
+
+def _get_view_from_event(event: dict):
+    qsp = event.get("queryStringParameters") if isinstance(event, dict) else None
+    return (qsp or {}).get("view")
+
+
+def _get_summary(table, username):
+    """
+    Aggregates kept by database-writer / invoice-updater (PK "AGG#<userId>").
+    A single query on the base table, independent of the number of invoices.
+    """
+    # Imported here: boto3 is only loaded with the first client (see lambda_runtime.aws)
+    from boto3.dynamodb.conditions import Key
+
+    summary = {"all": {"count": 0, "total": Decimal(0)}, "supplier": [], "month": [], "cuit": []}
+    query_kwargs = {"KeyConditionExpression": Key("PK").eq(f"AGG#{username}")}
+    while True:
+        response = table.query(**query_kwargs)
+        for item in response.get("Items", []):
+            entry = {"count": item.get("count", 0), "total": item.get("total", Decimal(0))}
+            if item["SK"] == "ALL":
+                summary["all"] = entry
+            elif entry["count"]:
+                dimension = item.get("dimension", item["SK"].split("#", 1)[0]).lower()
+                summary.setdefault(dimension, []).append({"value": item.get("value"), **entry})
+        if not response.get("LastEvaluatedKey"):
+            break
+        query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    summary["month"].sort(key=lambda entry: entry["value"])
+    summary["supplier"].sort(key=lambda entry: entry["total"], reverse=True)
+    summary["cuit"].sort(key=lambda entry: entry["total"], reverse=True)
+    return summary
+
+
+def _query_all(table, query_kwargs):
+    """Every page of the query: DynamoDB cuts each response at 1 MB."""
+    items = []
+    while True:
+        response = table.query(**query_kwargs)
+        items.extend(response.get("Items", []))
+        if not response.get("LastEvaluatedKey"):
+            return items
+        query_kwargs = {**query_kwargs, "ExclusiveStartKey": response["LastEvaluatedKey"]}
+
+
+def _get_invoice(table, file_key, username):
+    """Point lookup by primary key. Returns None if missing or owned by another user."""
+    response = table.get_item(
+        Key={"PK": file_key, "SK": META_SK},
+        ProjectionExpression="file_key, userId, #data",
+        ExpressionAttributeNames={"#data": "data"},
+    )
+    item = response.get("Item")
+    if not item or item.get("userId") != username:
+        return None
+    return item
+
+
+def _batch_get_invoices(file_keys, username, max_retries=5):
+    """BatchGetItem in chunks of 100, retrying UnprocessedKeys. Only the caller's items are returned."""
+    found = {}
+    for start in range(0, len(file_keys), BATCH_GET_CHUNK):
+        request_items = {
+            TABLE: {
+                "Keys": [{"PK": key, "SK": META_SK} for key in file_keys[start:start + BATCH_GET_CHUNK]],
+                "ProjectionExpression": "file_key, userId, #data",
+                "ExpressionAttributeNames": {"#data": "data"},
+            }
+        }
+        for attempt in range(max_retries + 1):
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response.get("Responses", {}).get(TABLE, []):
+                if item.get("userId") == username:
+                    found[item["file_key"]] = item
+            request_items = response.get("UnprocessedKeys") or {}
+            if not request_items:
+                break
+            time.sleep(min(0.05 * (2 ** attempt), 1.0))
+        if request_items:
+            raise RuntimeError("Could not read all requested invoices")
+    return found
+
+
+def _ok(event, payload, etag=None):
+    # Decimals as strings, compressed when the client sends Accept-Encoding
+    return etags.attach(responses.json_response(event, payload, metrics=metrics), etag)
+
+
+@metrics.handler
 def handler(event, context):
     if not TABLE:
         return {"statusCode": 500, "body": json.dumps({"error": "Missing TABLE_NAME env var"})}
 
-    username = _extract_username_from_event(event)
+    username = extract_username(event)
     if not username:
         return {"statusCode": 400, "body": json.dumps({"error": "Missing 'username' parameter or JWT claim"})}
 
     file_key = _get_file_key_from_event(event)
-    
+    file_keys = _get_file_keys_from_event(event)
+    if file_keys and len(file_keys) > MAX_FILE_KEYS:
+        return {"statusCode": 400, "body": json.dumps({"error": f"At most {MAX_FILE_KEYS} file_keys per request"})}
+
+    try:
+        filters = invoice_keys.parse_filters(event.get("queryStringParameters") if isinstance(event, dict) else None)
+    except ValueError as e:
+        return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
+
     table = dynamodb.Table(TABLE)
 
+    # Conditional GET: every view only depends on the user's invoices, so the
+    # user's version plus the request parameters identify the response
+    view = _get_view_from_event(event)
+    with metrics.stage("version"):
+        etag = etags.current(table, username, "report", view, file_key, file_keys, filters)
+    if etags.matches(event, etag):
+        metrics.add("not_modified", 1)
+        return etags.not_modified(etag)
+
     try:
-        response = table.query(
-            IndexName=INDEX_NAME,
-            KeyConditionExpression=Key("userId").eq(username)
-        )
-        items = response.get("Items", [])
+        # Per-supplier / per-month / per-CUIT totals from the precomputed aggregates
+        if view == "summary":
+            with metrics.stage("query"):
+                summary = _get_summary(table, username)
+            return _ok(event, {"username": username, "summary": summary}, etag)
 
-        # Filter by file_key if provided
+        # Single invoice: GetItem on the primary key instead of querying every invoice of the user
         if file_key:
-            items = [item for item in items if item.get("file_key") == file_key]
-            if not items:
-                return {"statusCode": 404, "body": json.dumps({"error": "Invoice not found"}, default=_convert_decimal)}
+            with metrics.stage("get_item"):
+                item = _get_invoice(table, file_key, username)
+            if not item:
+                return {"statusCode": 404, "body": json.dumps({"error": "Invoice not found"})}
             # Return single invoice data
-            item = items[0]
             data = item.get("data", {})
-            return {
-                "statusCode": 200,
-                "headers": {"Content-Type": "application/json"},
-                "body": json.dumps({"file_key": file_key, "data": data}, ensure_ascii=False, default=_convert_decimal)
-            }
-        
+            return _ok(event, {"file_key": file_key, "data": data}, etag)
+
+        # Several invoices: BatchGetItem, keeping the requested order
+        if file_keys:
+            with metrics.stage("batch_get"):
+                found = _batch_get_invoices(file_keys, username)
+            metrics.add("items", len(found))
+            facturas = [
+                {"file_key": key, "data": found[key].get("data", {})}
+                for key in file_keys if key in found
+            ]
+            return _ok(event, {
+                "username": username,
+                "facturas": facturas,
+                "not_found": [key for key in file_keys if key not in found]
+            }, etag)
+
+        # from/to, supplier and cuit are key conditions on the date-sorted GSIs (see invoice_keys)
+        query_kwargs = invoice_keys.query_kwargs(username, filters, user_index=INDEX_NAME)
+        with metrics.stage("query"):
+            items = _query_all(table, query_kwargs)
+        metrics.add("items", len(items))
+
         # Return all invoices (filtered only fields needed)
         facturas = []
         for item in items:
@@ -86,11 +200,7 @@ def handler(event, context):
             }
             facturas.append(factura)
 
-        return {
-            "statusCode": 200,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({"username": username, "facturas": facturas}, ensure_ascii=False, default=_convert_decimal),
-        }
+        return _ok(event, {"username": username, "facturas": facturas}, etag)
 
     except Exception as e:
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
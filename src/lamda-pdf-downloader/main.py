@@ -1,10 +1,210 @@
 import json
-import boto3
+from lambda_runtime import Metrics, aws, invoice_keys, jwt_username
+from lambda_runtime.s3_stream import MultipartUploadWriter
 import os
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-s3 = boto3.client("s3")
+s3 = aws.client("s3")
+dynamodb = aws.resource("dynamodb")
 BUCKET = os.environ["UPLOAD_BUCKET"]
+TABLE = os.environ.get("TABLE_NAME")
+INDEX_NAME = os.environ.get("INDEX_NAME", "GSI_User_Group")
+metrics = Metrics("pdf-downloader")
+URL_EXPIRATION = 3600  # segundos (1 hora)
+# Los bundles van junto a los exports: la regla de lifecycle de exports/ los borra al día
+BUNDLE_PREFIX = os.environ.get("BUNDLE_PREFIX", "exports/")
+MAX_BUNDLE_FILES = int(os.environ.get("MAX_BUNDLE_FILES", "1000"))
+BUNDLE_PART_SIZE_MB = int(os.environ.get("BUNDLE_PART_SIZE_MB", "8"))
+# PDFs que se descargan en paralelo mientras se escribe el ZIP. Los de hasta
+# BUNDLE_BUFFER_MB se leen enteros; los más grandes se copian por bloques.
+BUNDLE_PREFETCH = int(os.environ.get("BUNDLE_PREFETCH", "8"))
+BUNDLE_BUFFER_MB = int(os.environ.get("BUNDLE_BUFFER_MB", "8"))
+COPY_CHUNK = 1024 * 1024
+META_SK = "META#1"
+BATCH_GET_CHUNK = 100
+FILTER_FIELDS = ("from", "to", "supplier", "cuit")
 
+
+def _error(status_code, message, **extra):
+    return {"statusCode": status_code, "body": json.dumps({"error": message, **extra})}
+
+
+def _parse_body(event):
+    # API Gateway v2 usually forwards the JSON body as a string in event['body'].
+    # Accept both direct event top-level params (for local testing) and JSON body.
+    body = event.get("body")
+    if isinstance(body, str) and body:
+        try:
+            parsed = json.loads(body)
+        except Exception:
+            parsed = None
+        if isinstance(parsed, dict):
+            return {**event, **parsed}
+    return event
+
+
+def _owned_keys(file_keys, username, max_retries=5):
+    """Las facturas de `file_keys` que existen y son de `username` (BatchGetItem de a 100)."""
+    owned = set()
+    for start in range(0, len(file_keys), BATCH_GET_CHUNK):
+        request_items = {
+            TABLE: {
+                "Keys": [{"PK": key, "SK": META_SK} for key in file_keys[start:start + BATCH_GET_CHUNK]],
+                "ProjectionExpression": "PK, userId",
+            }
+        }
+        for attempt in range(max_retries + 1):
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response.get("Responses", {}).get(TABLE, []):
+                if item.get("userId") == username:
+                    owned.add(item["PK"])
+            request_items = response.get("UnprocessedKeys") or {}
+            if not request_items:
+                break
+            time.sleep(min(0.05 * (2 ** attempt), 1.0))
+        if request_items:
+            raise RuntimeError("Could not read all requested invoices")
+    return owned
+
+
+def _filtered_keys(username, filters):
+    """file_key de las facturas del usuario que cumplen los filtros, ordenadas por fecha (hasta MAX_BUNDLE_FILES + 1)."""
+    table = dynamodb.Table(TABLE)
+    query_kwargs = {
+        **invoice_keys.query_kwargs(username, filters, user_index=INDEX_NAME),
+        "ProjectionExpression": "PK",
+    }
+    keys = []
+    while len(keys) <= MAX_BUNDLE_FILES:
+        response = table.query(**query_kwargs)
+        keys.extend(item["PK"] for item in response.get("Items", []))
+        if not response.get("LastEvaluatedKey"):
+            break
+        query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    return keys
+
+
+def _fetch(key):
+    """(key, bytes o stream del body), o (key, None) si el PDF ya no está en S3."""
+    try:
+        response = s3.get_object(Bucket=BUCKET, Key=key)
+    except Exception as e:
+        if getattr(e, "response", {}).get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return key, None
+        raise
+    if response.get("ContentLength", 0) <= BUNDLE_BUFFER_MB * 1024 * 1024:
+        return key, response["Body"].read()
+    return key, response["Body"]
+
+
+def _write_bundle(keys, username):
+    """
+    Escribe el ZIP en S3 con multipart upload a medida que llegan los PDFs:
+    en memoria quedan una parte del upload y a lo sumo BUNDLE_PREFETCH PDFs.
+    Los PDFs ya vienen comprimidos, así que se guardan sin recomprimir.
+    Devuelve (key del ZIP, bytes, PDFs que faltaban en S3).
+    """
+    bundle_key = f"{BUNDLE_PREFIX}{username}/facturas_{int(time.time())}.zip"
+    upload = MultipartUploadWriter(
+        s3, BUCKET, bundle_key, content_type="application/zip", part_size=BUNDLE_PART_SIZE_MB * 1024 * 1024,
+    )
+    missing = []
+    remaining = iter(keys)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, BUNDLE_PREFETCH)) as pool, \
+                zipfile.ZipFile(upload, "w", compression=zipfile.ZIP_STORED) as archive:
+            pending = deque(pool.submit(_fetch, key) for _, key in zip(range(max(1, BUNDLE_PREFETCH)), remaining))
+            while pending:
+                key, content = pending.popleft().result()
+                next_key = next(remaining, None)
+                if next_key is not None:
+                    pending.append(pool.submit(_fetch, next_key))
+                if content is None:
+                    missing.append(key)
+                    continue
+                # Dentro del ZIP sin el prefijo del usuario
+                with archive.open(key.split("/", 1)[-1], "w") as entry:
+                    if isinstance(content, bytes):
+                        entry.write(content)
+                    else:
+                        for chunk in iter(lambda: content.read(COPY_CHUNK), b""):
+                            entry.write(chunk)
+        upload.close()
+    except Exception:
+        upload.abort()
+        raise
+    return bundle_key, upload.bytes_out, missing
+
+
+def _bundle(event, body):
+    """
+    {"file_keys": [...]} o filtros {"from", "to", "supplier", "cuit"} (como
+    report-generator y export). Sólo entran facturas del usuario autenticado:
+    el usuario sale de los claims del JWT, nunca del query string ni del body.
+    """
+    if not TABLE:
+        return _error(500, "Missing TABLE_NAME env var")
+    username = jwt_username(event)
+    if not username:
+        return _error(401, "Missing JWT claims")
+
+    file_keys = body.get("file_keys")
+    if file_keys is not None:
+        if not isinstance(file_keys, list) or not file_keys or not all(isinstance(key, str) and key for key in file_keys):
+            return _error(400, "'file_keys' must be a non-empty list of file keys")
+        keys = list(dict.fromkeys(file_keys))
+        if len(keys) > MAX_BUNDLE_FILES:
+            return _error(400, f"At most {MAX_BUNDLE_FILES} files per bundle")
+        with metrics.stage("ownership"):
+            owned = _owned_keys(keys, username)
+        # Ajenas e inexistentes responden igual: no revela qué claves existen
+        not_found = [key for key in keys if key not in owned]
+        if not_found:
+            return _error(404, "Invoices not found", file_keys=not_found)
+    else:
+        try:
+            filters = invoice_keys.parse_filters({name: body.get(name) for name in FILTER_FIELDS})
+        except ValueError as e:
+            return _error(400, str(e))
+        if not filters:
+            return _error(400, "Missing 'file_keys' or a filter (from, to, supplier, cuit)")
+        with metrics.stage("query"):
+            keys = _filtered_keys(username, filters)
+        if len(keys) > MAX_BUNDLE_FILES:
+            return _error(400, f"More than {MAX_BUNDLE_FILES} invoices match; narrow the filters")
+        if not keys:
+            return _error(404, "No invoices match the filters")
+
+    with metrics.stage("zip"):
+        bundle_key, size, missing = _write_bundle(keys, username)
+    metrics.add("files", len(keys) - len(missing))
+    metrics.add("bytes", size, unit="Bytes")
+
+    download_url = s3.generate_presigned_url(
+        "get_object",
+        Params={
+            "Bucket": BUCKET,
+            "Key": bundle_key,
+            "ResponseContentDisposition": f"attachment; filename={bundle_key.rsplit('/', 1)[-1]}",
+        },
+        ExpiresIn=URL_EXPIRATION,
+    )
+    return {
+        "statusCode": 200,
+        "body": json.dumps({
+            "download_url": download_url,
+            "file_key": bundle_key,
+            "files": len(keys) - len(missing),
+            "bytes": size,
+            "missing": missing,
+        })
+    }
+
+
+@metrics.handler
 def handler(event, context):
     """
     Espera un input JSON como:
@@ -12,19 +212,18 @@ def handler(event, context):
         "file_key": "a12b3c4d.pdf"
     }
     Devuelve un presigned URL de descarga válido 1 hora.
+
+    Con "file_keys" (lista) o con filtros de fecha/proveedor/CUIT arma un ZIP
+    con todos esos PDFs (POST /download/bundle) y devuelve un solo URL.
     """
-    # API Gateway v2 usually forwards the JSON body as a string in event['body'].
-    # Accept both direct event top-level param (for local testing) and JSON body.
-    key = event.get("file_key")
-    if not key:
-        body = event.get("body")
-        if body:
-            try:
-                parsed = json.loads(body)
-                key = parsed.get("file_key")
-            except Exception:
-                key = None
+    body = _parse_body(event) if isinstance(event, dict) else {}
+    if "file_keys" in body or any(body.get(name) for name in FILTER_FIELDS):
+        try:
+            return _bundle(event, body)
+        except Exception as e:
+            return _error(500, str(e))
 
+    key = body.get("file_key")
     if not key:
         return {
             "statusCode": 400,
@@ -33,11 +232,12 @@ def handler(event, context):
 
     try:
         # Generar URL de descarga
-        presigned_url = s3.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": BUCKET, "Key": key},
-            ExpiresIn=3600  # segundos (1 hora)
-        )
+        with metrics.stage("presign"):
+            presigned_url = s3.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": BUCKET, "Key": key},
+                ExpiresIn=URL_EXPIRATION
+            )
 
         return {
             "statusCode": 200,
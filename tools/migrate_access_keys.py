@@ -0,0 +1,152 @@
+"""
+Reescribe las facturas existentes con las claves de lambda_runtime.invoice_keys:
+fecha en ISO, groupKey "<fecha>#<file_key>", supplierKey y cuitKey. Las
+facturas escritas antes tienen groupKey "group_key" y la fecha como la
+encontró el parser, así que no aparecen en los filtros por fecha, proveedor
+ni CUIT de report-generator y export.
+
+    python tools/migrate_access_keys.py --table InvoiceJobs [--segments 8] [--apply]
+
+Recorre la tabla con un scan paralelo (--segments segmentos, un thread por
+segmento) y reescribe sólo las facturas que cambian. Sin --apply informa
+cuántas cambiarían. Cada update es condicional sobre la `version` leída: si
+invoice-data-updater edita la factura en el medio, la edición gana (ya
+escribe las claves nuevas) y la factura se cuenta como conflicto; volver a
+correr la herramienta es seguro. Cuando cambia la fecha se corrige el
+agregado por mes y se invalida el ETag de los usuarios afectados.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, os.path.join(SRC_DIR, "lambda-layer", "python"))
+
+from lambda_runtime import aggregates, etags, invoice_keys  # noqa: E402
+
+
+def planned_item(item):
+    """Factura con fecha y claves normalizadas, o None si ya está al día."""
+    if item.get("SK") != "META#1" or not item.get("userId"):
+        return None
+    data = dict(item.get("data") or {})
+    if data.get("fecha"):
+        # Una fecha que no se puede interpretar se deja como está (queda sin fecha en el índice)
+        data["fecha"] = invoice_keys.normalize_date(data["fecha"]) or data["fecha"]
+    keys = invoice_keys.access_keys(item["userId"], item.get("file_key") or item["PK"], data)
+    current = {name: item[name] for name in invoice_keys.KEY_FIELDS if name in item}
+    if keys == current and data.get("fecha") == (item.get("data") or {}).get("fecha"):
+        return None
+    migrated = {name: value for name, value in item.items() if name not in invoice_keys.KEY_FIELDS}
+    return {**migrated, **keys, "data": data}
+
+
+def _write(table, item, migrated):
+    """Update condicional a la versión leída. Devuelve False si hubo una edición en el medio."""
+    from boto3.dynamodb.conditions import Attr
+
+    names = {"#data": "data", "#fecha": "fecha"}
+    values = {}
+    sets, removes = [], []
+    if migrated["data"].get("fecha") != (item.get("data") or {}).get("fecha"):
+        sets.append("#data.#fecha = :fecha")
+        values[":fecha"] = migrated["data"]["fecha"]
+    for name in invoice_keys.KEY_FIELDS:
+        names[f"#{name}"] = name
+        if name in migrated:
+            sets.append(f"#{name} = :{name}")
+            values[f":{name}"] = migrated[name]
+        elif name in item:
+            removes.append(f"#{name}")
+    expression = "SET " + ", ".join(sets)
+    if removes:
+        expression += " REMOVE " + ", ".join(removes)
+    if "version" in item:
+        condition = Attr("version").eq(item["version"])
+    else:
+        condition = Attr("PK").exists() & Attr("version").not_exists()
+    try:
+        table.update_item(
+            Key={"PK": item["PK"], "SK": item["SK"]},
+            UpdateExpression=expression,
+            ConditionExpression=condition,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+    except Exception as e:
+        if getattr(e, "response", {}).get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        return False
+    return True
+
+
+def _migrate_segment(table, segment, segments, write, changes, counters, lock):
+    kwargs = {"Segment": segment, "TotalSegments": segments}
+    while True:
+        response = table.scan(**kwargs)
+        for item in response.get("Items", []):
+            migrated = planned_item(item)
+            with lock:
+                counters["scanned"] += 1
+                counters["invoices"] += item.get("SK") == "META#1"
+            if migrated is None:
+                continue
+            written = _write(table, item, migrated) if write else False
+            with lock:
+                counters["changed"] += 1
+                if write:
+                    counters["updated" if written else "conflicts"] += 1
+                if written:
+                    changes.append((item, migrated))
+        if not response.get("LastEvaluatedKey"):
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def migrate(table, segments=8, write=False):
+    """Devuelve un resumen con contadores e invoices_per_s."""
+    counters = {"scanned": 0, "invoices": 0, "changed": 0, "updated": 0, "conflicts": 0, "aggregate_errors": 0}
+    changes = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        futures = [
+            pool.submit(_migrate_segment, table, segment, segments, write, changes, counters, lock)
+            for segment in range(segments)
+        ]
+        for future in futures:
+            future.result()
+    if changes:
+        deltas = {}
+        for item, migrated in changes:
+            aggregates.delta(item, migrated, into=deltas)
+        counters["aggregate_errors"] = len(aggregates.apply_deltas(table, deltas))
+        etags.bump(table, (item["userId"] for item, _ in changes))
+    elapsed = time.perf_counter() - start
+    return {
+        **counters,
+        "applied": write,
+        "seconds": round(elapsed, 2),
+        "invoices_per_s": round(counters["invoices"] / elapsed, 1) if elapsed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--table", default=os.environ.get("TABLE_NAME"), required="TABLE_NAME" not in os.environ)
+    parser.add_argument("--segments", type=int, default=8)
+    parser.add_argument("--apply", action="store_true")
+    args = parser.parse_args()
+
+    import boto3
+
+    table = boto3.resource("dynamodb").Table(args.table)
+    print(json.dumps(migrate(table, args.segments, write=args.apply)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Recalcula desde cero los agregados por usuario (PK "AGG#<userId>") a partir de
+las facturas de la tabla y reporta las diferencias con los guardados.
+
+    python tools/rebuild_aggregates.py --table InvoiceJobs [--user <userId>] [--apply]
+
+Sin --apply sólo informa el desvío (sale con código 1 si hay). Con --apply
+reescribe los agregados que difieren y borra los que ya no tienen facturas.
+Conviene correrlo sin escrituras en curso: un update concurrente entre la
+lectura y la reescritura se perdería hasta el próximo rebuild.
+"""
+import argparse
+import json
+import os
+import sys
+from decimal import Decimal
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, os.path.join(SRC_DIR, "lambda-layer", "python"))
+
+from lambda_runtime import aggregates, etags  # noqa: E402
+
+INDEX_NAME = "GSI_User_Group"
+
+
+def _read_all(operation, **kwargs):
+    while True:
+        response = operation(**kwargs)
+        yield from response.get("Items", [])
+        if not response.get("LastEvaluatedKey"):
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def load(table, user_id=None):
+    """Devuelve (facturas, agregados guardados) de la tabla o de un solo usuario."""
+    from boto3.dynamodb.conditions import Key
+
+    if user_id is None:
+        items = list(_read_all(table.scan))
+        invoices = [item for item in items if item.get("SK") == "META#1" and item.get("userId")]
+        stored = [item for item in items if str(item.get("PK", "")).startswith(aggregates.AGG_PREFIX)]
+    else:
+        invoices = list(_read_all(table.query, IndexName=INDEX_NAME, KeyConditionExpression=Key("userId").eq(user_id)))
+        invoices = [item for item in invoices if item.get("SK") == "META#1"]
+        stored = list(_read_all(table.query, KeyConditionExpression=Key("PK").eq(aggregates.aggregate_pk(user_id))))
+    return invoices, stored
+
+
+def expected_aggregates(invoices):
+    expected = {}
+    for item in invoices:
+        aggregates.delta(None, item, into=expected)
+    return {key: value for key, value in expected.items() if value[0]}
+
+
+def drift(expected, stored):
+    """Lista de (PK, SK, guardado, esperado) para las claves que no coinciden."""
+    current = {
+        (item["PK"], item["SK"]): (int(item.get("count", 0)), Decimal(str(item.get("total", 0))))
+        for item in stored
+    }
+    differences = []
+    for key in sorted(set(expected) | set(current)):
+        want = expected.get(key, (0, Decimal(0)))
+        have = current.get(key, (0, Decimal(0)))
+        if want != have:
+            differences.append((key[0], key[1], have, want))
+    return differences
+
+
+def apply(table, differences):
+    for pk, sk, _, (count, total) in differences:
+        if count == 0:
+            table.delete_item(Key={"PK": pk, "SK": sk})
+            continue
+        dimension, _, value = sk.partition("#")
+        table.put_item(Item={
+            "PK": pk, "SK": sk, "dimension": dimension, "value": value, "count": count, "total": total,
+        })
+    # El resumen de estos usuarios cambió: invalida los ETags de report-generator
+    etags.bump(table, (aggregates.aggregate_user(pk) for pk, *_ in differences))
+
+
+def rebuild(table, user_id=None, write=False):
+    invoices, stored = load(table, user_id)
+    differences = drift(expected_aggregates(invoices), stored)
+    if write and differences:
+        apply(table, differences)
+    return len(invoices), differences
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--table", default=os.environ.get("TABLE_NAME"), required="TABLE_NAME" not in os.environ)
+    parser.add_argument("--user")
+    parser.add_argument("--apply", action="store_true")
+    args = parser.parse_args()
+
+    import boto3
+
+    table = boto3.resource("dynamodb").Table(args.table)
+    invoice_count, differences = rebuild(table, args.user, write=args.apply)
+    for pk, sk, have, want in differences:
+        print(json.dumps({
+            "PK": pk, "SK": sk,
+            "stored": {"count": have[0], "total": str(have[1])},
+            "expected": {"count": want[0], "total": str(want[1])},
+        }, ensure_ascii=False))
+    print(json.dumps({"invoices": invoice_count, "drifted": len(differences), "applied": args.apply}))
+    if differences and not args.apply:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Vuelve a extraer los datos de los PDFs ya subidos con el parser actual.
+database-writer sólo corre con los eventos de S3, así que cuando mejora el
+parser las facturas existentes quedan con los datos viejos hasta que se
+vuelven a subir.
+
+    python tools/reprocess_uploads.py --table InvoiceJobs --bucket <upload bucket> \\
+        [--user <userId>] [--since 2025-01-01] [--until 2025-06-30] \\
+        [--workers 8] [--batch-size 50] [--max-writes-per-second 200] \\
+        [--checkpoint reprocess.json] [--force] [--apply]
+
+Lista el bucket (sólo los .pdf con prefijo de usuario; --since/--until
+filtran por LastModified) y pasa cada batch al handler de database-writer
+con el mismo mensaje que arma invoice-processor, así que se reutilizan la
+escritura del índice de búsqueda, los agregados y la invalidación de ETags.
+La extracción corre en el pool de threads del writer (--workers). Sin
+--force se manda el ETag: los PDFs ya extraídos con esta versión del parser
+salen del cache de extracción, y los que el writer ya registró como
+procesados con esta versión se saltean. Los campos editados con
+invoice-data-updater se conservan (el writer no los pisa).
+
+Sin --apply no escribe nada: extrae y muestra, por factura, los campos que
+cambiarían. Con --apply las escrituras a DynamoDB se limitan a
+--max-writes-per-second items y el progreso se guarda en --checkpoint
+después de cada batch. Si la corrida se corta, volver a correrla con el
+mismo checkpoint sigue después de la última clave confirmada: a lo sumo se
+repite un batch, y reescribir una factura es idempotente.
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+WRITER_DIR = os.path.join(SRC_DIR, "lambda-database-writer")
+sys.path.insert(0, WRITER_DIR)
+sys.path.insert(0, os.path.join(SRC_DIR, "lambda-layer", "python"))
+
+# Campos de data que no vienen del parser (text_key depende de STORE_TEXT)
+IGNORED_FIELDS = {"text_key"}
+
+
+class RateLimiter:
+    """Reparte `rate` unidades por segundo; acquire(n) espera su turno."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.acquired = 0
+        self._next_free = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, units=1):
+        with self._lock:
+            self.acquired += units
+            if not self.rate:
+                return
+            now = time.monotonic()
+            start = max(now, self._next_free)
+            self._next_free = start + units / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+class _ThrottledTable:
+    def __init__(self, table, limiter):
+        self._table = table
+        self._limiter = limiter
+
+    def put_item(self, **kwargs):
+        self._limiter.acquire()
+        return self._table.put_item(**kwargs)
+
+    def update_item(self, **kwargs):
+        self._limiter.acquire()
+        return self._table.update_item(**kwargs)
+
+    def delete_item(self, **kwargs):
+        self._limiter.acquire()
+        return self._table.delete_item(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._table, name)
+
+
+class ThrottledDynamoDB:
+    """Resource de DynamoDB que pasa cada item escrito por el RateLimiter; las lecturas no se limitan."""
+
+    def __init__(self, resource, limiter):
+        self._resource = resource
+        self._limiter = limiter
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        self._limiter.acquire(sum(len(requests) for requests in RequestItems.values()))
+        return self._resource.batch_write_item(RequestItems=RequestItems, **kwargs)
+
+    def Table(self, name):
+        return _ThrottledTable(self._resource.Table(name), self._limiter)
+
+    def __getattr__(self, name):
+        return getattr(self._resource, name)
+
+
+def load_writer(table):
+    """Carga src/lambda-database-writer/main.py con TABLE_NAME=table y sin métricas EMF."""
+    os.environ["TABLE_NAME"] = table
+    os.environ.setdefault("METRICS_ENABLED", "false")
+    spec = importlib.util.spec_from_file_location("database_writer", os.path.join(WRITER_DIR, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def list_uploads(s3, bucket, user=None, since=None, until=None, start_after=None):
+    """
+    Genera los mensajes de database-writer de los PDFs del bucket, en orden de
+    clave. El userId es el primer segmento del path, como en invoice-processor.
+    """
+    kwargs = {"Bucket": bucket, "Prefix": f"{user}/" if user else ""}
+    if start_after:
+        kwargs["StartAfter"] = start_after
+    while True:
+        response = s3.list_objects_v2(**kwargs)
+        for obj in response.get("Contents", []):
+            key = obj["Key"]
+            user_id, separator, _ = key.partition("/")
+            if not separator or not key.lower().endswith(".pdf"):
+                continue
+            day = obj["LastModified"].date().isoformat()
+            if (since and day < since) or (until and day > until):
+                continue
+            yield {"bucket": bucket, "key": key, "userId": user_id, "etag": obj.get("ETag"), "size": obj.get("Size")}
+        if not response.get("IsTruncated"):
+            return
+        kwargs["ContinuationToken"] = response["NextContinuationToken"]
+
+
+def _batches(messages, size):
+    batch = []
+    for message in messages:
+        batch.append(message)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def diff(previous, data):
+    """{campo: [antes, después]} de los campos de data que cambian."""
+    previous = previous or {}
+    fields = sorted((set(previous) | set(data)) - IGNORED_FIELDS)
+    return {field: [previous.get(field), data.get(field)] for field in fields if previous.get(field) != data.get(field)}
+
+
+def _load_checkpoint(path, scope):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("scope") != scope:
+        raise ValueError(f"El checkpoint {path} es de otra corrida ({checkpoint.get('scope')}); usar otro archivo")
+    return checkpoint
+
+
+def _save_checkpoint(path, checkpoint):
+    if not path:
+        return
+    # Escritura atómica: un corte en el medio deja el checkpoint anterior
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+
+def _dry_run_batch(writer, batch, force, workers, out, counters):
+    keys = [message["key"] for message in batch]
+    cached = {}
+    if not force and writer.CACHE_ENABLED:
+        cache_keys = {message["key"]: writer.cache.key_for(message["etag"]) for message in batch}
+        found = writer.cache.get_many(writer.dynamodb, cache_keys.values())
+        cached = {key: found[cache_key] for key, cache_key in cache_keys.items() if cache_key in found}
+
+    def run(message):
+        try:
+            return writer._process_file(message["bucket"], message["key"], message["userId"], cached.get(message["key"]), message["size"])
+        except Exception as e:
+            print(f"Error procesando {message['key']}: {str(e)}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batch)))) as pool:
+        outcomes = list(pool.map(run, batch))
+    previous = writer._get_existing_invoices(keys)
+    for message, outcome in zip(batch, outcomes):
+        counters["invoices"] += 1
+        if outcome is None:
+            counters["failed"] += 1
+            continue
+        response, item, _postings = outcome
+        if item is None:
+            counters["rejected"] += 1
+            print(json.dumps({"file_key": message["key"], "rejected": json.loads(response["body"])["error"]}), file=out)
+            continue
+        existing = previous.get(message["key"])
+        changes = diff((existing or {}).get("data"), item["data"])
+        # Los campos editados por el usuario no se reescriben
+        for field in (existing or {}).get("editedFields") or ():
+            changes.pop(field, None)
+        if existing is None or changes:
+            counters["changed"] += 1
+            print(json.dumps({"file_key": message["key"], "new": existing is None, "changes": changes}, default=str), file=out)
+
+
+def reprocess(writer, bucket, user=None, since=None, until=None, workers=8, batch_size=50,
+              max_writes_per_second=None, checkpoint_path=None, force=False, apply=False,
+              out=sys.stdout, log=sys.stderr):
+    """
+    `writer` es el módulo de database-writer (load_writer) con sus clientes.
+    Los diffs de --dry-run van a `out` y los print del writer a `log`.
+    Devuelve el resumen de la corrida con invoices_per_s.
+    """
+    scope = {"bucket": bucket, "user": user, "since": since, "until": until}
+    checkpoint = (_load_checkpoint(checkpoint_path, scope) if apply else None) or {
+        "scope": scope, "last_key": None, "done": False, "invoices": 0, "failed_keys": [],
+    }
+    counters = {"invoices": 0, "failed": 0, "changed": 0, "rejected": 0}
+    limiter = RateLimiter(max_writes_per_second)
+    saved = {"dynamodb": writer.dynamodb, "MAX_WORKERS": writer.MAX_WORKERS, "STORE_TEXT": writer.STORE_TEXT,
+             "EXTRACTION_PROCESSES": writer.EXTRACTION_PROCESSES}
+    writer.dynamodb = ThrottledDynamoDB(writer.dynamodb, limiter)
+    writer.MAX_WORKERS = workers
+    if not apply:
+        # Sin texto guardado no se escribe nada en S3 y no se arman postings
+        writer.STORE_TEXT = False
+        # El dry-run extrae desde su propio pool de threads: sin fork (ver extraction.defer_parallel)
+        writer.EXTRACTION_PROCESSES = 1
+
+    start = time.perf_counter()
+    try:
+        messages = list_uploads(writer.s3, bucket, user, since, until, start_after=checkpoint["last_key"])
+        for batch in ([] if checkpoint["done"] else _batches(messages, batch_size)):
+            with contextlib.redirect_stdout(log):
+                if not apply:
+                    _dry_run_batch(writer, batch, force, workers, out, counters)
+                    continue
+                if force:
+                    batch = [{**message, "etag": None} for message in batch]
+                event = {"Records": [{"messageId": message["key"], "body": json.dumps(message)} for message in batch]}
+                failures = writer.handler(event, None)["batchItemFailures"]
+            failed = [failure["itemIdentifier"] for failure in failures]
+            counters["invoices"] += len(batch)
+            counters["failed"] += len(failed)
+            checkpoint["invoices"] += len(batch)
+            checkpoint["failed_keys"].extend(failed)
+            checkpoint["last_key"] = batch[-1]["key"]
+            _save_checkpoint(checkpoint_path, checkpoint)
+        if apply:
+            checkpoint["done"] = True
+            _save_checkpoint(checkpoint_path, checkpoint)
+    finally:
+        writer.dynamodb = saved["dynamodb"]
+        writer.MAX_WORKERS = saved["MAX_WORKERS"]
+        writer.STORE_TEXT = saved["STORE_TEXT"]
+        writer.EXTRACTION_PROCESSES = saved["EXTRACTION_PROCESSES"]
+    elapsed = time.perf_counter() - start
+
+    summary = {"applied": apply, **counters, "ddb_writes": limiter.acquired}
+    if apply:
+        del summary["changed"], summary["rejected"]  # el handler no los distingue de las escrituras
+        summary.update(total_invoices=checkpoint["invoices"], failed_keys=checkpoint["failed_keys"])
+    return {
+        **summary,
+        "seconds": round(elapsed, 2),
+        "invoices_per_s": round(counters["invoices"] / elapsed, 1) if elapsed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--table", default=os.environ.get("TABLE_NAME"), required="TABLE_NAME" not in os.environ)
+    parser.add_argument("--bucket", default=os.environ.get("UPLOAD_BUCKET"), required="UPLOAD_BUCKET" not in os.environ)
+    parser.add_argument("--user")
+    parser.add_argument("--since", help="LastModified desde (aaaa-mm-dd)")
+    parser.add_argument("--until", help="LastModified hasta (aaaa-mm-dd, inclusive)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--max-writes-per-second", type=float, help="items escritos por segundo (sin límite si falta)")
+    parser.add_argument("--checkpoint", default="reprocess_checkpoint.json")
+    parser.add_argument("--force", action="store_true", help="ignorar el cache de extracción")
+    parser.add_argument("--apply", action="store_true")
+    args = parser.parse_args()
+
+    writer = load_writer(args.table)
+    try:
+        summary = reprocess(
+            writer, args.bucket, args.user, args.since, args.until,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            max_writes_per_second=args.max_writes_per_second,
+            checkpoint_path=args.checkpoint,
+            force=args.force,
+            apply=args.apply,
+        )
+    except KeyboardInterrupt:
+        print(f"Interrumpido; el progreso quedó en {args.checkpoint}", file=sys.stderr)
+        sys.exit(130)
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()